@@ -29,6 +29,9 @@ echo.
 
 pyinstaller --onefile --windowed --name MajesticSorter --icon=icon.ico ^
     --hidden-import=PIL._tkinter_finder ^
+    --hidden-import=gui ^
+    --hidden-import=cli ^
+    --hidden-import=core ^
     --hidden-import=customtkinter ^
     --hidden-import=rapidocr_onnxruntime ^
     --hidden-import=onnxruntime ^
@@ -88,6 +91,9 @@ echo.
 
 pyinstaller --onefile --windowed --name MajesticSorter --icon=icon.ico ^
     --hidden-import=PIL._tkinter_finder ^
+    --hidden-import=gui ^
+    --hidden-import=cli ^
+    --hidden-import=core ^
     --hidden-import=customtkinter ^
     --hidden-import=rapidocr_onnxruntime ^
     --hidden-import=onnxruntime ^
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Majestic RP Screenshot Sorter — командная строка, без окон:
+    python main.py sort  ВХОД ВЫХОД [--workers N] [--dry-run] [--json] [--incremental] [--no-bodycam]
+                                    [--recursive] [--zip-out] [--mode copy|move|hardlink|reflink|symlink]
+                                    [--virtual] [--shard day|week|month]
+                                    [--full-frame never|fallback|always] [--chat-lines off|first|only]
+                                    [--chat-colors purple,green,...]
+    ВХОД для sort может быть ZIP-архивом — скрины читаются прямо из него.
+    python main.py tree ВЫХОД [ПАПКА] [--json]     — виртуальные папки (или файлы одной папки)
+    python main.py materialize ВЫХОД [--folder ПАПКА] [--mode ...] — разложить виртуальную сортировку
+    python main.py watch ВХОД ВЫХОД [те же ключи, кроме --recursive]   — следить за папкой до Ctrl+C
+С --json в stdout идёт по строке JSON на файл и итоговая строка, лог — в stderr.
+Код выхода: 0 — без ошибок, 1 — были ошибки, 130 — прервано.
+"""
+
+import sys
+import json
+import signal
+import argparse
+import threading
+
+
+def _parser():
+    ap = argparse.ArgumentParser(prog="main.py", description="Сортировка скриншотов Majestic RP без окон")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for nm, hp in (("sort", "отсортировать папку и выйти"),
+                   ("watch", "следить за папкой и сортировать новые скрины")):
+        p = sub.add_parser(nm, help=hp)
+        p.add_argument("inp", help="входная папка со скриншотами")
+        p.add_argument("out", help="выходная папка")
+        p.add_argument("-w", "--workers", type=int, default=2, help="потоков (по умолчанию 2)")
+        p.add_argument("--dry-run", action="store_true", help="только показать решения, файлы не копировать")
+        p.add_argument("--json", action="store_true", help="JSON-строка на файл и итог в stdout")
+        p.add_argument("--incremental", action="store_true", help="пропускать файлы из прошлых запусков")
+        p.add_argument("--no-bodycam", action="store_true", help="не требовать боди-кам")
+        p.add_argument("--zip-out", action="store_true", help="писать в архивы ВЫХОД/<папка>.zip (тома по 64 файла)")
+        p.add_argument("--mode", choices=_MODES, default="copy",
+                       help="как класть файлы в выход; если способ недоступен — копирование")
+        p.add_argument("--virtual", action="store_true",
+                       help="не писать файлы, только решения в ВЫХОД/.sorter.sqlite3")
+        p.add_argument("--shard", choices=("none", "day", "week", "month"), default="none",
+                       help="подпапки по дате съёмки внутри каждой категории")
+        p.add_argument("--full-frame", choices=("never", "fallback", "always"),
+                       help="OCR всего кадра: никогда / если в чате нет триггера (по умолчанию) / всегда")
+        p.add_argument("--chat-lines", choices=("off", "first", "only"),
+                       help="строки чата без детектора: нет / сначала строки, потом детектор / только строки (по умолчанию)")
+        p.add_argument("--chat-colors", type=_colors, metavar="ЦВЕТА",
+                       help="цвета строк чата, которые читать (через запятую): " + ",".join(_CHAT_COLORS)
+                            + "; по умолчанию purple,green")
+        if nm == "sort":
+            p.add_argument("-r", "--recursive", action="store_true", help="с подпапками (кроме выходной)")
+    p = sub.add_parser("tree", help="виртуальные папки из базы решений")
+    p.add_argument("out", help="выходная папка с базой")
+    p.add_argument("folder", nargs="?", help="показать файлы этой папки")
+    p.add_argument("--json", action="store_true", help="вывод в JSON")
+    p = sub.add_parser("materialize", help="разложить виртуальную сортировку по папкам")
+    p.add_argument("out", help="выходная папка с базой")
+    p.add_argument("--folder", help="только эта папка")
+    p.add_argument("--mode", choices=_MODES, default="copy", help="как класть файлы")
+    return ap
+
+
+_MODES = ("copy", "move", "hardlink", "reflink", "symlink")
+_CHAT_COLORS = ("purple", "green", "orange", "yellow", "white", "gray", "red")
+
+
+def _colors(v):
+    cs = [c.strip().lower() for c in v.split(",") if c.strip()]
+    bad = [c for c in cs if c not in _CHAT_COLORS]
+    if bad: raise argparse.ArgumentTypeError(f"неизвестные цвета: {', '.join(bad)}")
+    return cs
+
+
+def _index(a):
+    """tree / materialize: работа с базой решений виртуальной сортировки."""
+    from pathlib import Path
+    from core import ResultIndex, INDEX_FILE
+    if not (Path(a.out) / INDEX_FILE).exists():
+        print(f"Нет базы решений: {Path(a.out) / INDEX_FILE}", file=sys.stderr)
+        return 1
+    vx = ResultIndex(a.out)
+    try:
+        if a.cmd == "tree":
+            rows = vx.files(a.folder) if a.folder else sorted(vx.folders().items())
+            for row in rows:
+                if a.json:
+                    k = ("file", "placed") if a.folder else ("folder", "count")
+                    print(json.dumps(dict(zip(k, row)), ensure_ascii=False))
+                else:
+                    print(f"{row[0]}" + (f"  → {row[1]}" if a.folder and row[1] else "" if a.folder else f": {row[1]}"))
+            return 0
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        n, er = vx.materialize(a.mode, a.folder, stop,
+                               on_error=lambda src, e: print(f"{src}: {e}", file=sys.stderr))
+        print(f"Разложено: {n} | Ошибок: {er}")
+        if stop.is_set(): return 130
+        return 1 if er else 0
+    finally:
+        vx.close()
+
+
+def _rec(fp, r, exc):
+    if exc is not None:
+        return {"file": str(fp), "ok": False, "error": str(exc)}
+    return {"file": str(fp), "ok": r.ok, "folder": r.folder if r.ok else None,
+            "cat": r.cat.value, "hosp": r.hosp.value, "night": r.night, "conf": round(r.conf, 3),
+            "method": r.method, "err": r.err, "bodycam": r.bodycam, "inherited": r.bc_inherited,
+            "ms": round(r.dt * 1000, 1)}
+
+
+def main(argv=None):
+    a = _parser().parse_args(argv)
+    if a.cmd in ("tree", "materialize"): return _index(a)
+    out = sys.stdout
+    # Движок пишет отладку через print — с --json в stdout должен идти только JSON
+    if a.json: sys.stdout = sys.stderr
+    from core import Analyzer, Config, Sorter, chat_policy, _ocr_disk_cache, _ocr_crop_cache
+
+    def emit(obj):
+        out.write(json.dumps(obj, ensure_ascii=False) + "\n");
+        out.flush()
+
+    def log(m, tag="default"):
+        print(m, flush=True)
+
+    cfg = Config();
+    cfg.load_thresholds()
+    cfg.OUT_SHARD = "" if a.shard == "none" else a.shard
+    if a.full_frame: cfg.OCR_FULL_FRAME = a.full_frame
+    if a.chat_lines: cfg.OCR_CHAT_LINES = a.chat_lines
+    if a.chat_colors: cfg.CHAT_LINE_POLICY = chat_policy(a.chat_colors)
+    az = Analyzer(cfg, require_bodycam=not a.no_bodycam)
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    so = Sorter(az, a.inp, a.out, a.workers, a.dry_run, a.incremental, stop=stop, log=log,
+                on_file=(lambda fp, r, exc: emit(_rec(fp, r, exc))) if a.json else None,
+                recursive=getattr(a, "recursive", False), zip_out=a.zip_out,
+                mode=a.mode, virtual=a.virtual)
+    st = so.watch() if a.cmd == "watch" else so.run()
+    _ocr_disk_cache.save()
+    _ocr_crop_cache.save()
+
+    sm = {"summary": True, "total": st.total, "done": st.done, "ok": st.ok, "skipped": st.sk,
+          "bodycam": st.bc, "errors": st.er, "already": st.dup, "seconds": round(st.dur, 2),
+          "stopped": st.stopped and a.cmd == "sort", "cut": st.cut or None, "folders": st.hc}
+    if a.json:
+        emit(sm)
+    else:
+        print(f"Готово: ОК {st.ok} | Пропуск {st.sk} | БК {st.bc} | Ошибок {st.er} | Уже в выходе {st.dup} | "
+              f"Всего {st.total} ({st.dur:.1f}с)")
+        for h, c in sorted(st.hc.items(), key=lambda x: -x[1]): print(f"  {h}: {c}")
+    if st.stopped and a.cmd == "sort": return 130
+    return 1 if st.er else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4877 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Majestic RP Screenshot Sorter — движок без GUI.
+Анализ скриншотов, конвейер сортировки, журналы и слежение за папкой.
+Не импортирует customtkinter/mss: работает и на сервере без дисплея.
+"""
+
+import sys
+import os
+import re
+import cv2
+import json
+import time
+import errno
+import queue
+import shutil
+import hashlib
+import mmap
+import sqlite3
+import zipfile
+import zlib
+import threading
+import itertools
+from pathlib import Path
+from enum import Enum
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Generator
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+import datetime
+
+import numpy as np
+from loguru import logger
+
+def get_data_dir():
+    if sys.platform == 'win32':
+        base = Path(os.environ.get('APPDATA', Path.home()))
+    else:
+        base = Path.home()
+
+    data_dir = base / "MajesticSorter"
+    data_dir.mkdir(exist_ok=True)
+    return data_dir
+
+
+DATA_DIR = get_data_dir()
+OCR_CACHE_FILE = DATA_DIR / "ocr_cache.json"
+OCR_CROP_CACHE_FILE = DATA_DIR / "ocr_crops.json"
+OVERLAY_SETTINGS_FILE = DATA_DIR / "overlay_settings.json"
+
+APP_VERSION = "4.0.0"
+APP_AUTHOR = "create Orange"
+APP_DONATE = "https://www.donationalerts.com/r/orange91323"
+
+
+# ═══════════════════════════════════════════
+#  ПРОВЕРКА ДОСТУПНЫХ OCR ДВИЖКОВ
+# ═══════════════════════════════════════════
+
+# RapidOCR — лучший выбор (работает на AMD/Intel/NVIDIA)
+RAPIDOCR_OK = False
+RapidOCREngine = None
+try:
+    from rapidocr_onnxruntime import RapidOCR as RapidOCREngine
+    RAPIDOCR_OK = True
+    print("[DEBUG] RapidOCR загружен успешно")
+except ImportError:
+    try:
+        from rapidocr import RapidOCR as RapidOCREngine
+        RAPIDOCR_OK = True
+        print("[DEBUG] RapidOCR (альт) загружен успешно")
+    except ImportError:
+        print("[DEBUG] RapidOCR не найден")
+
+# PaddleOCR — опционально (только для NVIDIA)
+PADDLEOCR_OK = False
+PADDLE_HAS_CUDA = False
+PaddleOCR = None
+try:
+    from paddleocr import PaddleOCR
+    PADDLEOCR_OK = True
+    try:
+        import paddle
+        PADDLE_HAS_CUDA = paddle.is_compiled_with_cuda()
+    except:
+        pass
+    print(f"[DEBUG] PaddleOCR загружен, CUDA: {PADDLE_HAS_CUDA}")
+except ImportError:
+    print("[DEBUG] PaddleOCR не найден")
+except Exception as e:
+    print(f"[DEBUG] PaddleOCR ошибка: {e}")
+
+# EasyOCR — медленный fallback
+EASYOCR_OK = False
+try:
+    import easyocr
+    EASYOCR_OK = True
+    print("[DEBUG] EasyOCR загружен")
+except ImportError:
+    print("[DEBUG] EasyOCR не найден")
+
+# Tesseract — для таймера боди-камеры
+TESSERACT_OK = False
+try:
+    import pytesseract
+    pytesseract.get_tesseract_version()
+    TESSERACT_OK = True
+    print("[DEBUG] Tesseract загружен")
+except:
+    print("[DEBUG] Tesseract не найден")
+
+# xxhash — быстрый хеш содержимого; без него BLAKE2 из hashlib
+XXHASH_OK = False
+try:
+    import xxhash
+    XXHASH_OK = True
+except ImportError:
+    pass
+
+# ═══════════════════════════════════════════
+#  ОПРЕДЕЛЕНИЕ GPU
+# ═══════════════════════════════════════════
+
+def _detect_gpu_vendor() -> str:
+    """Определяет производителя GPU."""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "NVIDIA"
+    except ImportError:
+        pass
+
+    try:
+        import onnxruntime as ort
+        providers = ort.get_available_providers()
+        if 'DmlExecutionProvider' in providers:
+            return "AMD/Intel (DirectML)"
+        if 'ROCMExecutionProvider' in providers:
+            return "AMD (ROCm)"
+    except ImportError:
+        pass
+
+    return "CPU"
+
+GPU_VENDOR = _detect_gpu_vendor()
+print(f"[DEBUG] GPU: {GPU_VENDOR}")
+print(f"[DEBUG] OCR статус: RapidOCR={RAPIDOCR_OK}, PaddleOCR={PADDLEOCR_OK}, EasyOCR={EASYOCR_OK}")
+
+# Типы данных
+_U8 = np.uint8
+_U16 = np.uint16
+_F32 = np.float32
+
+
+EXTS = frozenset({".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp"})
+THR_VER = 41
+GROUP_BC_WINDOW = 30
+_U8 = np.uint8;
+_U16 = np.uint16;
+_F32 = np.float32
+_CACHE_MAX = 500
+_OCR_CROP_MAX = 20000
+_IMG_BUDGET = 256 << 20  # байт на предзагруженные картинки
+SCAN_CHUNK = 512  # файлов в порции потокового обхода: предпросмотр и порядок работы — в пределах порции
+
+SETTINGS_FILE = DATA_DIR / "settings.json"
+PRO_FEATURES = False
+
+def load_settings() -> dict:
+    if SETTINGS_FILE.exists():
+        try:
+            return json.loads(SETTINGS_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            pass
+    return {}
+
+
+def save_settings(data: dict):
+    SETTINGS_FILE.write_text(
+        json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+
+class OCRDiskCache:
+    def __init__(s):
+        super().__init__()
+        s._data = {};
+        s._lk = threading.Lock()
+        s._load()
+
+    def _load(s):
+        if OCR_CACHE_FILE.exists():
+            try:
+                s._data = json.loads(OCR_CACHE_FILE.read_text(encoding="utf-8"))
+            except Exception:
+                s._data = {}
+
+    def save(s):
+        with s._lk:
+            try:
+                OCR_CACHE_FILE.write_text(
+                    json.dumps(s._data, indent=1, ensure_ascii=False), encoding="utf-8")
+            except Exception:
+                pass
+
+    def get(s, file_hash):
+        with s._lk:
+            entry = s._data.get(file_hash)
+            if entry: return entry.get("texts", []), entry.get("cat", "")
+        return None, None
+
+    def put(s, file_hash, texts, cat):
+        with s._lk:
+            s._data[file_hash] = {
+                "texts": texts, "cat": cat,
+                "ts": datetime.datetime.now().isoformat()
+            }
+            if len(s._data) > 5000:
+                keys = sorted(s._data, key=lambda k: s._data[k].get("ts", ""))
+                for k in keys[:1000]: del s._data[k]
+
+
+_ocr_disk_cache = OCRDiskCache()
+
+# ═══════════════════════════════════════════
+#  ЛЕНТА БОДИ-КАМ
+# ═══════════════════════════════════════════
+BODYCAM_DIR = DATA_DIR / "bodycam"
+
+
+class BodycamTimeline:
+    """
+    Метки времени подтверждённых боди-кам для одной входной папки.
+    На диске — файл float64 только на дозапись, переживает перезапуск;
+    в памяти — отсортированный массив и короткий хвост свежих меток.
+    folder=None — лента только в памяти.
+    """
+    _MERGE = 256
+
+    def __init__(s, folder=None):
+        s.folder = Path(folder).resolve() if folder else None
+        s._fp = None
+        if s.folder is not None:
+            k = hashlib.md5(str(s.folder).lower().encode("utf-8")).hexdigest()
+            s._fp = BODYCAM_DIR / f"{k}.f64"
+        s._a = None
+        s._tail = []
+        s._lk = threading.Lock()
+
+    def _load(s):
+        if s._a is not None: return
+        a = np.empty(0, np.float64)
+        if s._fp is not None and s._fp.exists():
+            try:
+                b = s._fp.read_bytes()
+                a = np.unique(np.frombuffer(b[:len(b) // 8 * 8], dtype="<f8").astype(np.float64))
+            except OSError:
+                pass
+        s._a = a
+
+    def _merge(s):
+        if s._tail:
+            s._a = np.union1d(s._a, np.asarray(s._tail, np.float64))
+            s._tail = []
+
+    def _near(s, ts, w):
+        a = s._a
+        if a.size:
+            i = int(np.searchsorted(a, ts))
+            if i > 0 and ts - a[i - 1] <= w: return True
+            if i < a.size and a[i] - ts <= w: return True
+        return any(abs(t - ts) <= w for t in s._tail)
+
+    def add(s, ts):
+        if ts is None: return
+        with s._lk:
+            s._load()
+            if s._near(ts, 0): return  # уже записана (повторный прогон той же папки)
+            s._tail.append(ts)
+            if len(s._tail) >= s._MERGE: s._merge()
+            if s._fp is None: return
+            try:
+                BODYCAM_DIR.mkdir(parents=True, exist_ok=True)
+                with open(s._fp, "ab") as f:
+                    f.write(np.asarray([ts], dtype="<f8").tobytes())
+            except OSError:
+                pass
+
+    def near(s, ts, w=GROUP_BC_WINDOW):
+        """Есть ли подтверждённая боди-кам не дальше w секунд от ts. O(log n)."""
+        if ts is None: return False
+        with s._lk:
+            s._load()
+            return s._near(ts, w)
+
+    def join(s, tss, w=GROUP_BC_WINDOW):
+        """near() для всего списка меток сразу."""
+        with s._lk:
+            s._load();
+            s._merge()
+            b = s._a
+        t = np.asarray([np.nan if x is None else x for x in tss], dtype=np.float64)
+        if b.size == 0 or t.size == 0: return [False] * len(t)
+        i = np.searchsorted(b, t)
+        lo = b[np.clip(i - 1, 0, b.size - 1)];
+        hi = b[np.clip(i, 0, b.size - 1)]
+        return ((np.abs(t - lo) <= w) | (np.abs(hi - t) <= w)).tolist()
+
+    def __len__(s):
+        with s._lk:
+            s._load()
+            return int(s._a.size) + len(s._tail)
+
+
+# ═══════════════════════════════════════════
+#  ЖУРНАЛ ЗАПУСКА
+# ═══════════════════════════════════════════
+RUNS_DIR = DATA_DIR / "runs"
+
+
+class JsonlLog:
+    """
+    Файл JSON-строк только на дозапись. Каждая запись сразу уходит в ОС (flush),
+    fsync — пачками: раз в every записей или sec секунд, чтобы горячий цикл не ждал диск.
+    Оборванная последняя строка (падение посреди записи) при чтении пропускается.
+    """
+
+    def __init__(s, path, every=64, sec=1.):
+        s.path = Path(path)
+        s._every = every;
+        s._sec = sec
+        s._f = None;
+        s._n = 0;
+        s._t = time.monotonic()
+        s._lk = threading.Lock()
+
+    def read(s):
+        if not s.path.exists(): return
+        try:
+            with open(s.path, encoding="utf-8") as f:
+                for ln in f:
+                    try:
+                        yield json.loads(ln)
+                    except ValueError:
+                        continue
+        except OSError:
+            return
+
+    def append(s, rec):
+        with s._lk:
+            if s._f is None:
+                s.path.parent.mkdir(parents=True, exist_ok=True)
+                s._f = open(s.path, "a", encoding="utf-8")
+            s._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            s._f.flush()
+            s._n += 1
+            if s._n >= s._every or time.monotonic() - s._t >= s._sec: s._sync()
+
+    def _sync(s):
+        try:
+            os.fsync(s._f.fileno())
+        except OSError:
+            pass
+        s._n = 0;
+        s._t = time.monotonic()
+
+    def close(s):
+        with s._lk:
+            if s._f is None: return
+            s._sync();
+            s._f.close();
+            s._f = None
+
+    def remove(s):
+        s.close()
+        try:
+            s.path.unlink()
+        except OSError:
+            pass
+
+
+def _decision(fp, r):
+    """Решение по файлу для журналов: путь, размер, mtime и итог анализа."""
+    try:
+        st = fp.stat()
+    except OSError:
+        return None
+    return {"f": str(fp), "sz": st.st_size, "mt": st.st_mtime_ns, "ok": r.ok,
+            "fd": r.folder if r.ok else None, "err": r.err, "ts": r.ts}
+
+
+class RunJournal(JsonlLog):
+    """
+    Журнал сортировки inp → out: решение по каждому файлу и завершённые копии.
+    Файл узнаётся по пути, размеру и mtime — без хеша и повторного анализа.
+    Живёт, пока запуск не завершится чисто; остановленный или упавший запуск
+    продолжается со следующего старта с теми же папками и настройками.
+    """
+
+    def __init__(s, inp, out, opts=None):
+        k = hashlib.md5(f"{Path(inp).resolve()}|{Path(out).resolve()}".lower().encode("utf-8")).hexdigest()
+        super().__init__(RUNS_DIR / f"{k}.jsonl")
+        s.opts = opts or {}
+        s.done = {};
+        s.copied = set()
+
+    def load(s):
+        """Читает незавершённый запуск. False — журнала нет или он от других настроек."""
+        hdr = None
+        for rec in s.read():
+            k = rec.get("k")
+            if k == "h":
+                hdr = rec;
+                s.done.clear();
+                s.copied.clear()
+            elif k == "d":
+                s.done[rec.get("f")] = rec
+            elif k == "c":
+                s.copied.add(rec.get("f"))
+        if hdr is None or hdr.get("o") != s.opts or not s.done:
+            s.done.clear();
+            s.copied.clear()
+            s.remove()
+            return False
+        return True
+
+    def begin(s, resumed):
+        if not resumed: s.append({"k": "h", "o": s.opts, "t": time.time()})
+
+    @staticmethod
+    def _key(fp):
+        st = fp.stat()
+        return st.st_size, st.st_mtime_ns
+
+    def finished(s, fp):
+        """Решение прошлого запуска по файлу, если файл с тех пор не менялся."""
+        rec = s.done.get(str(fp))
+        if rec is None: return None
+        try:
+            sz, mt = s._key(fp)
+        except OSError:
+            return None
+        return rec if rec.get("sz") == sz and rec.get("mt") == mt else None
+
+    def was_copied(s, fp):
+        return str(fp) in s.copied
+
+    def decide(s, fp, r):
+        rec = _decision(fp, r)
+        if rec is not None: s.append(dict(rec, k="d"))
+
+    def copied_to(s, src, dst):
+        s.append({"k": "c", "f": str(src), "d": str(dst)})
+
+
+MANIFEST_DIR = DATA_DIR / "manifest"
+
+
+class SortManifest(JsonlLog):
+    """
+    Память между запусками для инкрементальной сортировки inp → out.
+    Решение по файлу ищется за O(1) по пути+размеру+mtime, при промахе —
+    по хешу всего содержимого (файл переименован или перенесён внутри папки).
+    Вид хеша записан в заголовке: записи с другим (частичный MD5 старых версий,
+    BLAKE2b вместо xxh3) по хешу не ищутся, только по пути.
+    Принятый файл попадает в манифест только после копирования.
+    """
+
+    def __init__(s, inp, out, opts=None):
+        k = hashlib.md5(f"{Path(inp).resolve()}|{Path(out).resolve()}".lower().encode("utf-8")).hexdigest()
+        super().__init__(MANIFEST_DIR / f"{k}.jsonl", every=256)
+        s.opts = opts or {}
+        s._by_path = {};
+        s._by_hash = {}
+        s._hs = {};
+        s._pend = {}
+
+    def load(s):
+        hdr = None;
+        n = 0
+        for rec in s.read():
+            n += 1
+            if rec.get("k") == "h": hdr = rec; continue
+            s._index(rec)
+        if hdr is None or hdr.get("o") != s.opts:
+            s._by_path.clear();
+            s._by_hash.clear()
+            s.remove()
+            s.append({"k": "h", "o": s.opts, "hk": _HASH_KIND, "t": time.time()})
+        elif hdr.get("hk") != _HASH_KIND:
+            s._by_hash.clear()
+            for rec in s._by_path.values(): rec.pop("h", None)
+            s._compact(dict(hdr, hk=_HASH_KIND))
+        elif n > 2 * len(s._by_path) + 1000:
+            s._compact(hdr)
+        return len(s._by_path)
+
+    def _index(s, rec):
+        s._by_path[rec.get("f")] = rec
+        if rec.get("h"): s._by_hash[rec["h"]] = rec
+
+    def _compact(s, hdr):
+        tmp = s.path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(hdr, ensure_ascii=False) + "\n")
+                for rec in s._by_path.values():
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            os.replace(tmp, s.path)
+        except OSError:
+            pass
+
+    def seen(s, fp):
+        """Прошлое решение по файлу или None. Хеш считается только для незнакомых путей."""
+        try:
+            st = fp.stat()
+        except OSError:
+            return None
+        k = str(fp)
+        rec = s._by_path.get(k)
+        if rec is not None and rec.get("sz") == st.st_size and rec.get("mt") == st.st_mtime_ns:
+            return rec
+        try:
+            h = _fh(fp)
+        except OSError:
+            return None
+        s._hs[k] = h
+        rec = s._by_hash.get(h)
+        if rec is None or rec.get("sz") != st.st_size: return None
+        rec = dict(rec, f=k, mt=st.st_mtime_ns)
+        s._put(rec)
+        return rec
+
+    def _put(s, rec):
+        s._index(rec)
+        s.append(rec)
+
+    def decide(s, fp, r):
+        rec = _decision(fp, r)
+        if rec is None: return
+        h = s._hs.pop(rec["f"], None) or r.fh or None
+        if h is None:
+            try:
+                h = _fh(fp)
+            except OSError:
+                pass
+        rec["h"] = h
+        if r.ok:
+            s.hold(fp, rec)
+        else:
+            s._put(rec)
+
+    def hold(s, fp, rec):
+        """Принятый файл ждёт копирования — до copied() в манифест не пишется."""
+        with s._lk: s._pend[str(fp)] = rec
+
+    def copied(s, fp):
+        with s._lk: rec = s._pend.pop(str(fp), None)
+        if rec is not None: s._put(rec)
+
+
+# ═══════════════════════════════════════════
+#  БАЗА ЗНАНИЙ ЛОКАЦИЙ
+# ═══════════════════════════════════════════
+LOCATION_DB_FILE = DATA_DIR / "location_knowledge.json"
+
+
+def load_location_db() -> dict:
+    if LOCATION_DB_FILE.exists():
+        try:
+            return json.loads(LOCATION_DB_FILE.read_text(encoding="utf-8"))
+        except:
+            pass
+    return {"samples": [], "feature_ranges": {}, "version": 1}
+
+
+def save_location_db(db: dict):
+    LOCATION_DB_FILE.write_text(
+        json.dumps(db, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def add_location_sample(db: dict, features: dict, location: str, filename: str = ""):
+    sample = {
+        "location": location,
+        "filename": filename,
+        "features": features,
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+    db["samples"].append(sample)
+    _update_feature_ranges(db, features, location)
+    save_location_db(db)
+
+
+def _update_feature_ranges(db: dict, features: dict, location: str):
+    if location not in db["feature_ranges"]:
+        db["feature_ranges"][location] = {}
+    ranges = db["feature_ranges"][location]
+    for key, val in features.items():
+        if not isinstance(val, (int, float)):
+            continue
+        if key not in ranges:
+            ranges[key] = {"min": val, "max": val, "sum": val, "count": 1, "mean": val}
+        else:
+            r = ranges[key]
+            r["min"] = min(r["min"], val)
+            r["max"] = max(r["max"], val)
+            r["sum"] = r.get("sum", r["mean"] * r["count"]) + val
+            r["count"] += 1
+            r["mean"] = r["sum"] / r["count"]
+
+
+def predict_location_from_db(db: dict, features: dict) -> Tuple[str, float, dict]:
+    if not db.get("feature_ranges"):
+        return "Unsorted", 0.0, {}
+    FEATURE_WEIGHTS = {
+        "elsh_beds": 7.0, "elsh_clothes": 5.0, "elsh_floor": 4.0,
+        "elsh_lamp": 10.0, "elsh_wall_or": 3.0,
+        "paleto_floor": 9.0, "paleto_wall_dark": 8.0,
+        "paleto_wall_blue": 4.0, "paleto_sky": 2.0,
+        "sandy_floor": 9.0, "sandy_door": 8.0,
+        "sandy_wall": 3.0, "sandy_floor_br": 3.0, "sandy_mm": 5.0,
+        "floor_h": 4.0, "floor_s": 3.0, "floor_v": 5.0,
+    }
+    scores = {};
+    details = {}
+    for location, ranges in db["feature_ranges"].items():
+        score = 0.0;
+        total_weight = 0.0;
+        loc_details = {}
+        for key, val in features.items():
+            if not isinstance(val, (int, float)) or key not in ranges:
+                continue
+            r = ranges[key]
+            weight = FEATURE_WEIGHTS.get(key, 1.0)
+            mean = r["mean"]
+            rng = max(r["max"] - r["min"], 0.001)
+            dist = abs(val - mean) / rng
+            similarity = max(0.0, 1.0 - dist)
+            if r["min"] <= val <= r["max"]:
+                similarity = min(1.0, similarity * 1.3)
+            feature_score = similarity * weight
+            score += feature_score;
+            total_weight += weight
+            loc_details[key] = {
+                "val": round(val, 4), "mean": round(mean, 4),
+                "sim": round(similarity, 3), "score": round(feature_score, 3)
+            }
+        scores[location] = score / total_weight if total_weight > 0 else 0.0
+        details[location] = loc_details
+    if not scores:
+        return "Unsorted", 0.0, {}
+    best = max(scores, key=scores.get)
+    sorted_scores = sorted(scores.values(), reverse=True)
+    conf = sorted_scores[0] - sorted_scores[1] if len(sorted_scores) > 1 else sorted_scores[0]
+    return best, min(conf, 1.0), {"scores": scores, "details": details.get(best, {})}
+
+
+# ═══════════════════════════════════════════
+#  БАЗА ЗНАНИЙ ЛОКАЦИЙ
+# ═══════════════════════════════════════════
+TRIGGER_DB_FILE = DATA_DIR / "trigger_knowledge.json"
+
+
+def load_trigger_db() -> dict:
+    if TRIGGER_DB_FILE.exists():
+        try:
+            return json.loads(TRIGGER_DB_FILE.read_text(encoding="utf-8"))
+        except:
+            pass
+    return {
+        "labeled": [],
+        "cat_keywords": {"TAB": [], "VAC": [], "PMP": []},
+        "version": 1
+    }
+
+
+def save_trigger_db(db: dict):
+    TRIGGER_DB_FILE.write_text(
+        json.dumps(db, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def add_trigger_sample(db: dict, filename: str, cat: str,
+                       ocr_texts: list, features: dict):
+    """Добавляет размеченный пример в базу."""
+    sample = {
+        "file": filename,
+        "cat": cat,  # TAB / VAC / PMP
+        "ocr_texts": ocr_texts,
+        "features": features
+    }
+    # Убираем дубликат если есть
+    db["labeled"] = [s for s in db["labeled"] if s["file"] != filename]
+    db["labeled"].append(sample)
+
+    # Извлекаем ключевые слова из OCR текстов
+    _extract_keywords_from_sample(db, cat, ocr_texts)
+    save_trigger_db(db)
+
+
+def _extract_keywords_from_sample(db: dict, cat: str, ocr_texts: list):
+    """Извлекает уникальные слова из OCR и добавляет в словарь категории."""
+    if cat not in db["cat_keywords"]:
+        db["cat_keywords"][cat] = []
+
+    existing = set(db["cat_keywords"][cat])
+
+    for text in ocr_texts:
+        # Разбиваем на слова длиннее 4 символов
+        words = [w.strip(".,!?:;()[]") for w in text.split() if len(w.strip(".,!?:;()[]")) >= 4]
+        for word in words:
+            word = word.lower()
+            if word not in existing:
+                existing.add(word)
+                db["cat_keywords"][cat].append(word)
+
+
+def predict_cat_from_db(db: dict, ocr_texts: list) -> tuple:
+    """
+    Предсказывает категорию на основе базы триггеров.
+    Возвращает (cat_code, confidence, matched_words)
+    """
+    if not db["labeled"]:
+        return "", 0.0, []
+
+    combined = " ".join(ocr_texts).lower()
+    scores = {"TAB": 0, "VAC": 0, "PMP": 0}
+    matched = {"TAB": [], "VAC": [], "PMP": []}
+
+    # Считаем совпадения ключевых слов
+    for cat, keywords in db["cat_keywords"].items():
+        for kw in keywords:
+            if len(kw) >= 4 and kw in combined:
+                scores[cat] += 1
+                matched[cat].append(kw)
+
+    if all(v == 0 for v in scores.values()):
+        return "", 0.0, []
+
+    best_cat = max(scores, key=scores.get)
+    best_score = scores[best_cat]
+    total = sum(scores.values())
+    confidence = best_score / total if total > 0 else 0.0
+
+    # Минимальный порог — хотя бы 2 совпадения
+    if best_score < 2:
+        return "", 0.0, matched[best_cat]
+
+    return best_cat, confidence, matched[best_cat]
+
+
+# ═══════════════════════════════════════════
+#  LRU КЭШ
+# ═══════════════════════════════════════════
+class LRUCache:
+    def __init__(self, maxsize=_CACHE_MAX):
+        self._d = OrderedDict();
+        self._m = maxsize;
+        self._lk = threading.Lock()
+
+    def get(self, k):
+        with self._lk:
+            if k in self._d: self._d.move_to_end(k); return self._d[k]
+        return None
+
+    def put(self, k, v):
+        with self._lk:
+            if k in self._d: self._d.move_to_end(k)
+            self._d[k] = v
+            while len(self._d) > self._m: self._d.popitem(last=False)
+
+    def pop(self, k):
+        with self._lk: return self._d.pop(k, None)
+
+
+# ═══════════════════════════════════════════
+#  КОНФИГ
+# ═══════════════════════════════════════════
+@dataclass
+class Config:
+    BASE: Tuple[int, int] = (1920, 1080)
+
+    CHAT_SCAN_ROIS: List[Tuple[int, int, int, int]] = field(default_factory=lambda: [
+        # Для 1920x1080
+        (0, 700, 800, 380),
+        (0, 800, 650, 280),
+        (400, 780, 1120, 280),
+        (300, 700, 1320, 360),
+        (0, 650, 960, 430),
+        # Для меньших разрешений (1558x871 и подобных)
+        (0, 500, 600, 350),
+        (0, 550, 500, 300),
+        (0, 450, 700, 400),
+        (0, 400, 800, 450),
+    ])
+    # OCR всего кадра — самый дорогой вызов. "never" — только области чата,
+    # "fallback" — если в областях есть текст, но триггера нет, "always" — первым делом (медленно).
+    # Замер find_trigger на 1920x1080, заглушка движка ~400 мс на полный кадр (RapidOCR на CPU):
+    #   триггер в чате:         never 86 мс ✓, fallback 89 мс ✓, always 400 мс ✓
+    #   триггер вне областей:   never 580 мс ✗, fallback 967 мс ✓, always 400 мс ✓
+    #   текста нет:             never 49 мс,    fallback 49 мс,    always 439 мс
+    # fallback стоит как never в частых случаях и не теряет триггер вне чата. Полнота
+    # на размеченном наборе не мерилась (нет ни движка, ни набора) — сверить перед сменой
+    OCR_FULL_FRAME: str = "fallback"
+    # Строки чата режутся по проекции цветной маски и идут в распознавание без детектора.
+    # "only" — область, разрезанная на строки, детектором уже не читается (быстро; строку,
+    # которую нарезка пропустила, не найти), "first" — детектор, если в строках триггера нет
+    # (надёжнее, но скрин без триггера стоит дороже, чем "off"), "off" — только детектор.
+    # Высота строки — в пикселях кадра 1920x1080
+    OCR_CHAT_LINES: str = "only"
+    CHAT_LINE_H: Tuple[int, int] = (8, 40)
+    # Цвет строки чата -> категории, которые она может дать; пустой список — строку не читать.
+    # Лечение пишется фиолетовым (/me) и зелёным (/do); белый чат, серый спам, красные админы — мимо
+    CHAT_LINE_POLICY: Dict[str, List[str]] = field(default_factory=lambda: {
+        "purple": ["TAB", "VAC", "PMP"], "green": ["TAB", "VAC", "PMP"],
+        "orange": [], "yellow": [], "white": [], "gray": [], "red": [],
+    })
+
+    TEXT_PURPLE_LO: Tuple[int, int, int] = (120, 30, 120);
+    TEXT_PURPLE_HI: Tuple[int, int, int] = (160, 200, 255)
+    TEXT_GREEN_LO: Tuple[int, int, int] = (35, 60, 120);
+    TEXT_GREEN_HI: Tuple[int, int, int] = (85, 255, 255)
+    TEXT_ORANGE_LO: Tuple[int, int, int] = (10, 80, 140);
+    TEXT_ORANGE_HI: Tuple[int, int, int] = (30, 255, 255)
+    TEXT_WHITE_LO: Tuple[int, int, int] = (0, 0, 160);
+    TEXT_WHITE_HI: Tuple[int, int, int] = (180, 45, 255)
+    TEXT_YELLOW_LO: Tuple[int, int, int] = (20, 80, 160);
+    TEXT_YELLOW_HI: Tuple[int, int, int] = (40, 255, 255)
+    TEXT_GRAY_LO: Tuple[int, int, int] = (0, 0, 120);
+    TEXT_GRAY_HI: Tuple[int, int, int] = (180, 30, 200)
+    TEXT_RED_LO: Tuple[int, int, int] = (0, 60, 120);
+    TEXT_RED_HI: Tuple[int, int, int] = (10, 255, 255)
+    TEXT_RED2_LO: Tuple[int, int, int] = (170, 60, 120);
+    TEXT_RED2_HI: Tuple[int, int, int] = (180, 255, 255)
+
+    KW_TABLETS: List[str] = field(default_factory=lambda: [
+        "вылечил", "вылечен", "вылечили", "лечили", "лечил", "лечен",
+        "таблетк", "таблет", "выдал", "получил", "вылечипи", "вылечипм",
+        "вылечмим", "вылечмям", "еылечипи", "еылечмим", "еылечмям", "еыленмям",
+        "кылечипм", "вылециям", "вылеиим", "вылечиям", "вылениям", "оглечения",
+        "излечения", "излечил", "таблегк", "таблегки", "таблетик", "таблетни",
+        "вылечипа", "вылечнли", "вылечнил", "еылечили", "еылечил", "леченмя",
+        "печения", "печенмя", "лененмя", "купить таблет", "купивь таблет",
+        "вьілечил", "вьілечили", "вілечив", "виличив", "таблетки", "табпетки",
+    ])
+    KW_VACCINES: List[str] = field(default_factory=lambda: [
+        "вакцинировал", "вакцинировали", "вакцинир", "вакцин", "ваксин",
+        "вакцинировамия", "вакщинировали", "вакциннровали", "вакмнровали",
+        "вакынровали", "вакцинмровали", "вакцынировали", "вакцінував",
+        "вакцинирован", "вакцинировап", "еакциниpовали", "еакцинировали",
+        "вакц", "привив", "прививк", "привит", "шприц",
+    ])
+    KW_PMP: List[str] = field(default_factory=lambda: [
+        "реанимировал", "реанимировали", "реанимир", "реаним",
+        "реанімировал", "реанимировап",
+    ])
+    PMP_CONFIRM: List[str] = field(default_factory=lambda: [
+        "750", "спасен", "спасён", "награда",
+    ])
+    KW_REJECT: List[str] = field(default_factory=lambda: [
+        "транспорт", "семейный", "удалён", "секунд",
+    ])
+    KW_REFUSE: List[str] = field(default_factory=lambda: [
+        "отказался от", "оказался от", "отказал", "отказался от лечения",
+        "оказался от лечения", "отказался от печения", "отказался от леченмя",
+        "отказался от ленения", "отказапся от",
+    ])
+    FUZZY_CORE_TABLETS: List[str] = field(default_factory=lambda: [
+        "вылечил", "вылечили", "вылечен", "таблетки", "таблетк", "лечили", "лечил",
+    ])
+    FUZZY_CORE_VACCINES: List[str] = field(default_factory=lambda: [
+        "вакцинировал", "вакцинировали", "вакцинир",
+    ])
+    FUZZY_CORE_PMP: List[str] = field(default_factory=lambda: [
+        "реанимировал", "реанимировали",
+    ])
+
+    TESS_CFG: str = "--psm 6 --oem 1 -l rus"
+
+    # Зоны
+    MINIMAP = (40, 900, 260, 130)
+    HORIZON = (300, 60, 1320, 280)
+    CEILING = (400, 20, 1120, 180)
+    WALL_L = (30, 180, 200, 520)
+    WALL_R = (1690, 180, 200, 520)
+    FLOOR = (350, 730, 1220, 220)
+    FLOOR_CENTER = (600, 780, 720, 150)
+    WALL_CENTER = (500, 200, 920, 400)
+    BED_AREA = (400, 300, 1120, 450)
+
+    # ELSH цвета HSV
+    ELSH_FLOOR_LO: Tuple[int, int, int] = (50, 3, 150)
+    ELSH_FLOOR_HI: Tuple[int, int, int] = (100, 40, 220)
+    ELSH_WALL_ORANGE_LO: Tuple[int, int, int] = (15, 100, 80)
+    ELSH_WALL_ORANGE_HI: Tuple[int, int, int] = (35, 255, 210)
+    ELSH_BED_LO: Tuple[int, int, int] = (85, 60, 80)
+    ELSH_BED_HI: Tuple[int, int, int] = (110, 255, 230)
+    ELSH_CLOTHES_LO: Tuple[int, int, int] = (100, 20, 140)
+    ELSH_CLOTHES_HI: Tuple[int, int, int] = (125, 100, 230)
+
+    # PALETO цвета HSV
+    PALETO_FLOOR_LO: Tuple[int, int, int] = (0, 0, 45)
+    PALETO_FLOOR_HI: Tuple[int, int, int] = (180, 20, 90)
+    PALETO_WALL_GRAY_LO: Tuple[int, int, int] = (0, 0, 75)
+    PALETO_WALL_GRAY_HI: Tuple[int, int, int] = (180, 20, 130)
+    PALETO_WALL_DARK_LO: Tuple[int, int, int] = (60, 10, 50)
+    PALETO_WALL_DARK_HI: Tuple[int, int, int] = (130, 60, 115)
+    PALETO_WALL_BLUE_LO: Tuple[int, int, int] = (80, 8, 60)
+    PALETO_WALL_BLUE_HI: Tuple[int, int, int] = (120, 80, 130)
+
+    # SANDY цвета HSV
+    SANDY_FLOOR_LO: Tuple[int, int, int] = (18, 25, 120)
+    SANDY_FLOOR_HI: Tuple[int, int, int] = (42, 255, 230)
+    SANDY_WALL_LO: Tuple[int, int, int] = (20, 10, 120)
+    SANDY_WALL_HI: Tuple[int, int, int] = (40, 60, 210)
+    SANDY_FLOOR_BROWN_LO: Tuple[int, int, int] = (20, 40, 70)
+    SANDY_FLOOR_BROWN_HI: Tuple[int, int, int] = (38, 130, 175)
+    SANDY_DOOR_LO: Tuple[int, int, int] = (10, 120, 15)
+    SANDY_DOOR_HI: Tuple[int, int, int] = (30, 255, 50)
+
+    # Пороги
+    THR_ELSH_FLOOR: float = 0.001
+    THR_ELSH_WALL_ORANGE: float = 0.05
+    THR_ELSH_BED: float = 0.002
+    THR_PALETO_FLOOR_DARK: float = 0.15
+    THR_PALETO_WALL_DARK: float = 0.15
+    THR_SANDY_FLOOR_SAND: float = 0.30
+    THR_SANDY_WALL_BEIGE: float = 0.06
+    THR_SANDY_DOOR: float = 0.10
+
+    ELSH_LAMP = ((0, 0, 230), (180, 25, 255))
+    SANDY_MAP = ((14, 80, 90), (32, 210, 195))
+    PALETO_SKY = ((88, 12, 50), (155, 130, 200))
+
+    THR_ELSH_LAMP: float = 0.005
+    THR_SANDY_MAP: float = 0.06
+    THR_PALETO_SKY: float = 0.50
+    THR_SKIP_OCR: float = 0.02
+    W_MM: float = 4.0;
+    W_CT: float = 3.0
+
+    THR_DB_CONFIDENCE: float = 0.05
+    MIN_DB_SAMPLES: int = 3
+
+    HOSPITALS_OCR: Dict[str, List[str]] = field(default_factory=lambda: {
+        "ELSH": ["alta", "pillbox", "strawberry", "textile", "mission", "chamberlain",
+                 "integrity", "rockford", "davis", "vespucci", "vinewood"],
+        "Sandy Shores": ["sandy", "shores", "desert", "grand", "senora", "harmony"],
+        "Paleto Bay": ["paleto", "bay", "procopio", "blaine", "grapeseed"],
+    })
+    NIGHT_START: int = 22;
+    NIGHT_END: int = 12
+    F_SANDY: str = "Sandy"
+    F_PALETO: str = "Paleto"
+    F_ELSH: str = "ELSH"
+    F_UNK: str = "Unsorted"
+    # Раскладка выхода: "" — одна папка на категорию, "day"/"week"/"month" — подпапки по дате съёмки
+    OUT_SHARD: str = ""
+
+    # Боди-кам
+    BODYCAM_TIMER_ROI: Tuple[int, int, int, int] = (68, 836, 70, 19)
+    BODYCAM_ROIS: List[Tuple[int, int, int, int]] = field(default_factory=lambda: [
+        (0, 790, 90, 70), (0, 810, 70, 60), (0, 830, 60, 50), (0, 760, 130, 110), (10, 800, 80, 70),
+        (0, 850, 80, 50), (0, 870, 100, 40), (0, 20, 90, 70), (0, 40, 80, 60), (0, 10, 110, 90),
+        (1830, 20, 90, 70), (1820, 10, 100, 90), (1830, 790, 90, 70), (1820, 810, 100, 60),
+    ])
+    BODYCAM_SCAN_STRIPS: List[Tuple[int, int, int, int]] = field(default_factory=lambda: [
+        (0, 400, 300, 50), (0, 450, 300, 50), (0, 500, 300, 50), (0, 550, 300, 50), (0, 600, 300, 50),
+        (0, 650, 300, 50), (0, 700, 300, 50), (0, 750, 300, 50), (0, 800, 300, 50), (0, 850, 300, 50),
+        (0, 900, 300, 50), (0, 0, 300, 50), (0, 50, 300, 50),
+    ])
+    BODYCAM_RED_STRICT_LO: Tuple[int, int, int] = (0, 100, 80)
+    BODYCAM_RED_STRICT_HI: Tuple[int, int, int] = (10, 255, 255)
+    BODYCAM_RED2_STRICT_LO: Tuple[int, int, int] = (170, 100, 80)
+    BODYCAM_RED2_STRICT_HI: Tuple[int, int, int] = (180, 255, 255)
+    BODYCAM_RED_DIM_LO: Tuple[int, int, int] = (0, 60, 50)
+    BODYCAM_RED_DIM_HI: Tuple[int, int, int] = (15, 255, 220)
+    BODYCAM_RED2_DIM_LO: Tuple[int, int, int] = (165, 60, 50)
+    BODYCAM_RED2_DIM_HI: Tuple[int, int, int] = (180, 255, 220)
+    BODYCAM_RED_SOFT_LO: Tuple[int, int, int] = (0, 40, 40)
+    BODYCAM_RED_SOFT_HI: Tuple[int, int, int] = (20, 255, 255)
+    BODYCAM_RED2_SOFT_LO: Tuple[int, int, int] = (160, 40, 40)
+    BODYCAM_RED2_SOFT_HI: Tuple[int, int, int] = (180, 255, 255)
+    BODYCAM_BGR_R_MIN: int = 100;
+    BODYCAM_BGR_BG_MAX: int = 95
+    BODYCAM_BGR_DOMINANCE: float = 1.3
+    BODYCAM_BGR_DIM_R_MIN: int = 80;
+    BODYCAM_BGR_DIM_R_MAX: int = 220
+    BODYCAM_BGR_DIM_G_MAX: int = 90;
+    BODYCAM_BGR_DIM_B_MAX: int = 85
+    BODYCAM_BGR_DIM_DOMINANCE: float = 1.2;
+    BODYCAM_BGR_DIM_MIN_CONFIRM: int = 3
+    BODYCAM_RED_THR: float = 0.002;
+    BODYCAM_RED_THR_SOFT: float = 0.003
+    BODYCAM_MAX_RED_RATIO: float = 0.25
+    BODYCAM_BLOB_STRICT_R_MIN: float = 140.0;
+    BODYCAM_BLOB_STRICT_G_MAX: float = 90.0
+    BODYCAM_BLOB_STRICT_B_MAX: float = 90.0;
+    BODYCAM_BLOB_STRICT_DOM: float = 1.5
+    BODYCAM_BLOB_STRICT_CIRC: float = 0.35
+    BODYCAM_BLOB_STRICT_AREA_MIN: int = 10;
+    BODYCAM_BLOB_STRICT_AREA_MAX: int = 800
+    BODYCAM_BLOB_DIM_R_MIN: float = 90.0;
+    BODYCAM_BLOB_DIM_R_MAX: float = 220.0
+    BODYCAM_BLOB_DIM_G_MAX: float = 95.0;
+    BODYCAM_BLOB_DIM_B_MAX: float = 95.0
+    BODYCAM_BLOB_DIM_DOM: float = 1.2;
+    BODYCAM_BLOB_DIM_CIRC: float = 0.30
+    BODYCAM_BLOB_DIM_AREA_MIN: int = 10;
+    BODYCAM_BLOB_DIM_AREA_MAX: int = 800
+    BODYCAM_BLOB_SOFT_R_MIN: float = 70.0;
+    BODYCAM_BLOB_SOFT_G_MAX: float = 110.0
+    BODYCAM_BLOB_SOFT_B_MAX: float = 110.0;
+    BODYCAM_BLOB_SOFT_DOM: float = 1.1
+    BODYCAM_BLOB_SOFT_CIRC: float = 0.25
+    BODYCAM_BLOB_SOFT_AREA_MIN: int = 8;
+    BODYCAM_BLOB_SOFT_AREA_MAX: int = 1000
+    BODYCAM_BLOB_MAX_X: int = 400
+    WARM_CORNER_HUE_MAX: int = 25;
+    WARM_CORNER_HUE_MIN2: int = 170
+    WARM_CORNER_SAT_MIN: int = 40;
+    WARM_CORNER_VAL_MIN: int = 40
+    WARM_CORNER_STRONG_RATIO: float = 0.3;
+    WARM_CORNER_STRONG_RDOM: float = 0.3
+    WARM_CORNER_WEAK_RATIO: float = 0.15;
+    WARM_CORNER_WEAK_RDOM: float = 0.15
+    BC_TINT_SAT_MIN: int = 25;
+    BC_TINT_CORNER_RATIO: float = 0.4
+    BC_TINT_CORNERS_NEEDED: int = 3;
+    BC_VIGNETTE_VAL_MAX: int = 100
+    # JPEG: сначала проба боди-кам на декоде 1/2 — явный отказ не разжимает полный кадр
+    BC_PROBE_REDUCED: bool = True
+
+    def save_thresholds(self, p=None):
+        if p is None:
+            p = DATA_DIR / "thresholds.json"
+        d = {"_version": THR_VER}
+        for k in dir(self):
+            if k.startswith(("THR_", "BODYCAM_", "ELSH_", "PALETO_", "WARM_", "BC_", "TEXT_", "SANDY_",
+                             "OCR_", "CHAT_LINE_")):
+                if not callable(getattr(self, k)):
+                    try:
+                        d[k] = getattr(self, k)
+                    except:
+                        pass
+        p.write_text(json.dumps(d, indent=2, default=str), encoding="utf-8")
+
+    def load_thresholds(self, p=None):
+        if p is None:
+            p = DATA_DIR / "thresholds.json"
+        if not p.exists(): return
+        if not p.exists(): return
+        try:
+            d = json.loads(p.read_text(encoding="utf-8"))
+            if d.get("_version", 0) < THR_VER: p.unlink(); return
+            for k, v in d.items():
+                if hasattr(self, k) and k != "_version":
+                    try:
+                        cur = getattr(self, k)
+                        if isinstance(cur, tuple):
+                            setattr(self, k, tuple(v))
+                        elif isinstance(cur, float):
+                            setattr(self, k, float(v))
+                        elif isinstance(cur, int):
+                            setattr(self, k, int(v))
+                        else:
+                            setattr(self, k, v)
+                    except:
+                        pass
+        except:
+            try:
+                p.unlink()
+            except:
+                pass
+
+
+# ═══════════════════════════════════════════
+#  УТИЛИТЫ
+# ═══════════════════════════════════════════
+_TS1 = re.compile(r'(\d{4})-(\d{2})-(\d{2})\s+(\d{2})(\d{2})(\d{2})')
+_TS2 = re.compile(r'(\d{4})-(\d{2})-(\d{2})\s+(\d{2})-(\d{2})-(\d{2})')
+
+
+def _extract_ts(fp, mt=None):
+    """Время съёмки из имени файла, иначе mtime (mt — уже известный, без лишнего stat)."""
+    n = fp.stem
+    for pat in (_TS1, _TS2):
+        m = pat.search(n)
+        if m:
+            try:
+                return datetime.datetime(
+                    int(m.group(1)), int(m.group(2)), int(m.group(3)),
+                    int(m.group(4)), int(m.group(5)), int(m.group(6))
+                ).timestamp()
+            except:
+                pass
+    if mt is not None: return mt
+    try:
+        return fp.stat().st_mtime
+    except:
+        return None
+
+
+OUT_SHARDS = ("", "day", "week", "month")
+
+
+def _shard(ts, how):
+    """
+    Подпапка даты для раскладки по дням/неделям/месяцам; "" — без деления.
+    Зачем: за несколько месяцев в одной категории («Таблетки - ELSH») копятся десятки тысяч
+    PNG, и scandir DestIndex, проверка имён и просмотр в проводнике платят за всю историю.
+    С делением каждая папка — только свой день (2024-01-05), неделя ISO (2024-W01) или
+    месяц (2024-01); метка — из имени файла (_extract_ts), без неё — «Без даты».
+    Счётчики и статистика идут по Result.base_folder (категория), отмена хранит полные
+    пути; раскладка входит в опции журнала и манифеста — продолжение не смешивает две.
+    """
+    if not how: return ""
+    if ts is None: return "Без даты"
+    d = datetime.datetime.fromtimestamp(ts)
+    if how == "day": return d.strftime("%Y-%m-%d")
+    if how == "week":
+        y, w, _ = d.isocalendar()
+        return f"{y}-W{w:02d}"
+    return d.strftime("%Y-%m")
+
+
+_MMAP_MIN = 16 << 20  # файлы крупнее читаем через mmap, без копии в память процесса
+
+
+def _rd(fp):
+    """Содержимое файла за одно чтение: bytes или mmap для больших файлов."""
+    if isinstance(fp, ArchiveMember): return fp.read_bytes()
+    with open(str(fp), 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= _MMAP_MIN:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return f.read()
+
+
+def _free(buf):
+    if isinstance(buf, mmap.mmap): buf.close()
+
+
+def _fhb(buf):
+    """Хеш всего содержимого: xxh3-128, если есть xxhash, иначе BLAKE2b-128."""
+    if XXHASH_OK: return xxhash.xxh3_128_hexdigest(buf)
+    return hashlib.blake2b(buf, digest_size=16).hexdigest()
+
+
+_HASH_KIND = "xxh3-128" if XXHASH_OK else "b2b-128"  # хеши разного вида между собой не сравнимы
+
+
+_REDUCED_EXTS = (".jpg", ".jpeg")  # уменьшаются прямо при декодировании (по блокам DCT)
+_RDF = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4}
+
+
+def _dec(buf, reduce=1):
+    # imdecode не держит ссылку на буфер — mmap после него можно закрывать
+    return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), _RDF[reduce])
+
+
+def _ld(fp):
+    """Загружает изображение, поддерживает пути с кириллицей."""
+    try:
+        buf = _rd(fp)
+        try:
+            return _dec(buf)
+        finally:
+            _free(buf)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки {fp}: {e}")
+        return None
+
+
+def _ldh(fp, skip=None, probe=None):
+    """
+    Одно чтение — и хеш, и картинка из того же буфера: (хеш, img).
+    skip(хеш) → True — картинка не нужна (результат уже известен), декод пропускается.
+    probe(хеш, img 1/2) → False — у JPEG по уменьшенному декоду ясно, что полный кадр
+    не нужен; он не разжимается, img is None.
+    """
+    try:
+        buf = _rd(fp)
+    except OSError as e:
+        logger.error(f"Ошибка загрузки {fp}: {e}")
+        return None, None
+    try:
+        fv = _fhb(buf)
+        if skip is not None and skip(fv): return fv, None
+        try:
+            if probe is not None and fp.suffix.lower() in _REDUCED_EXTS:
+                th = _dec(buf, 2)
+                if th is not None and not probe(fv, th): return fv, None
+            return fv, _dec(buf)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки {fp}: {e}")
+            return fv, None
+    finally:
+        _free(buf)
+
+
+def _fh(fp):
+    """Хеш всего содержимого файла (_fhb) — одно чтение, без декода."""
+    buf = _rd(fp)
+    try:
+        return _fhb(buf)
+    finally:
+        _free(buf)
+
+
+# ═══════════════════════════════════════════
+#  КОНТЕКСТ ИЗОБРАЖЕНИЯ
+# ═══════════════════════════════════════════
+class ImageContext:
+    """
+    Картинка и всё, что из неё считается лениво (HSV, серое, уменьшенная копия, маски).
+    Координаты областей заданы для BASE и масштабируются по sx/sy, так что контекст
+    строится из кадра любого размера. Какой масштаб где:
+      полный кадр — OCR (чат, таймер), маски и пороги боди-кам, признаки локаций;
+      img_small — всегда INTER_AREA 1/4 из полного кадра: на ней обучена база локаций,
+        и при сортировке, обучении и аналитике признаки должны считаться одинаково;
+      JPEG 1/2 (IMREAD_REDUCED_COLOR_2) — только проба-отказ bodycam_probe в конвейере;
+      JPEG 1/4 (IMREAD_REDUCED_COLOR_4) — только предпросмотр планировщика (prescan).
+    """
+    __slots__ = ('img', 'cfg', 'h', 'w', 'sx', 'sy', '_hsv', '_gray', '_ism', '_hsm',
+                 '_masks', '_pcd', '_pcr', '_cc', '_chat_detected', '_chat_roi')
+
+    def __init__(s, img, cfg):
+        s.img = img;
+        s.cfg = cfg;
+        s.h, s.w = img.shape[:2]
+        s.sx = s.w / cfg.BASE[0];
+        s.sy = s.h / cfg.BASE[1]
+        s._hsv = None;
+        s._gray = None;
+        s._ism = None;
+        s._hsm = None
+        s._masks = {};
+        s._pcd = False;
+        s._pcr = True;
+        s._cc = {}
+        s._chat_detected = False;
+        s._chat_roi = None
+
+    @classmethod
+    def from_file(cls, fp, cfg, images=None):
+        """Контекст по файлу (полный кадр). images — ImageProvider: чтение через общий бюджет и кеш."""
+        img = images.get(fp) if images is not None else _ld(fp)
+        return cls(img, cfg) if img is not None else None
+
+    @property
+    def hsv(s):
+        if s._hsv is None: s._hsv = cv2.cvtColor(s.img, cv2.COLOR_BGR2HSV)
+        return s._hsv
+
+    @property
+    def gray(s):
+        if s._gray is None: s._gray = cv2.cvtColor(s.img, cv2.COLOR_BGR2GRAY)
+        return s._gray
+
+    @property
+    def img_small(s):
+        if s._ism is None:
+            s._ism = cv2.resize(s.img, (s.w >> 2, s.h >> 2), interpolation=cv2.INTER_AREA)
+        return s._ism
+
+    @property
+    def hsv_small(s):
+        if s._hsm is None:
+            s._hsm = cv2.cvtColor(s.img_small, cv2.COLOR_BGR2HSV)
+        return s._hsm
+
+    def _bnd(s, x, y, w, h, sm=False):
+        if sm:
+            s4, s5 = s.sx * .25, s.sy * .25
+            a, b = max(0, int(x * s4)), max(0, int(y * s5))
+            src = s._hsm if s._hsm is not None else s.img_small
+            mh, mw = src.shape[:2]
+            c, d = min(mw, int((x + w) * s4)), min(mh, int((y + h) * s5))
+        else:
+            a, b = max(0, int(x * s.sx)), max(0, int(y * s.sy))
+            c, d = min(s.w, int((x + w) * s.sx)), min(s.h, int((y + h) * s.sy))
+        return (a, b, c, d) if c > a and d > b else None
+
+    def crop(s, x, y, w, h):
+        k = ('i', x, y, w, h);
+        v = s._cc.get(k)
+        if v is not None: return v
+        bn = s._bnd(x, y, w, h)
+        if bn is None: return None
+        a, b, c, d = bn;
+        r = s.img[b:d, a:c]
+        res = r if r.size > 0 else None;
+        s._cc[k] = res;
+        return res
+
+    def crop_hsv(s, x, y, w, h):
+        # Полный HSV не строим ради пары углов — переводим только вырезку
+        if s._hsv is None:
+            k = ('h', x, y, w, h);
+            v = s._cc.get(k)
+            if v is not None: return v
+            r = s.crop(x, y, w, h)
+            res = cv2.cvtColor(r, cv2.COLOR_BGR2HSV) if r is not None else None
+            s._cc[k] = res;
+            return res
+        bn = s._bnd(x, y, w, h)
+        if bn is None: return None
+        a, b, c, d = bn;
+        r = s.hsv[b:d, a:c]
+        return r if r.size > 0 else None
+
+    def crop_hsv_small(s, x, y, w, h):
+        bn = s._bnd(x, y, w, h, sm=True)
+        if bn is None: return None
+        a, b, c, d = bn;
+        r = s.hsv_small[b:d, a:c]
+        return r if r.size > 0 else None
+
+    def get_mask(s, lo, hi, sm=False):
+        k = (lo, hi, sm);
+        v = s._masks.get(k)
+        if v is not None: return v
+        src = s.hsv_small if sm else s.hsv
+        m = cv2.inRange(src, np.array(lo, _U8), np.array(hi, _U8))
+        s._masks[k] = m;
+        return m
+
+    def crop_mask(s, mask, x, y, w, h, sm=False):
+        bn = s._bnd(x, y, w, h, sm)
+        if bn is None: return None
+        a, b, c, d = bn;
+        r = mask[b:d, a:c]
+        return r if r.size > 0 else None
+
+    def detect_chat_area(s, diag=None):
+        if s._chat_detected: return s._chat_roi
+        s._chat_detected = True
+        gray = s.gray;
+        best_score = 0;
+        best_roi = None
+        strip_h = max(1, int(60 * s.sy))
+        for y_start in range(s.h - strip_h, max(0, s.h // 2), -strip_h // 2):
+            for x_start in [0, int(s.w * 0.1)]:
+                x_end = min(s.w, x_start + int(700 * s.sx))
+                strip = gray[y_start:y_start + strip_h, x_start:x_end]
+                if strip.size == 0: continue
+                std = float(np.std(strip))
+                if std < 15: continue
+                _, bn = cv2.threshold(strip, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                cnt, _ = cv2.findContours(bn, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                score = len(cnt) * std
+                if score > best_score:
+                    best_score = score
+                    roi_y = max(0, y_start - strip_h * 3)
+                    roi_h = min(s.h - roi_y, strip_h * 8)
+                    best_roi = (x_start, roi_y, x_end - x_start, roi_h)
+        if best_roi and best_score > 500:
+            s._chat_roi = best_roi
+            if diag: diag.append(f"  [чат] обнаружен в {best_roi}")
+        return s._chat_roi
+
+    def quick_red_precheck(s, diag=None):
+        if s._pcd: return s._pcr
+        s._pcd = True
+        if s.w < 400 or s.h < 200: s._pcr = True; return True
+        lw = max(1, int(150 * s.sx));
+        th = max(1, int(110 * s.sy));
+        bh = max(1, int(150 * s.sy))
+        zones = [("НЛ", slice(s.h - bh, s.h), slice(0, lw)), ("ВЛ", slice(0, th), slice(0, lw)),
+                 ("ВП", slice(0, th), slice(s.w - lw, s.w)), ("НП", slice(s.h - bh, s.h), slice(s.w - lw, s.w))]
+        for nm, sy, sx in zones:
+            z = s.img[sy, sx]
+            if z.size == 0: continue
+            r = z[:, :, 2].astype(_F32);
+            g = z[:, :, 1].astype(_F32);
+            b = z[:, :, 0].astype(_F32)
+            rm = (r > 35) & (r > g * 1.05) & (r > b * 1.05)
+            rt = float(np.count_nonzero(rm)) / max(1, z.shape[0] * z.shape[1])
+            if rt > 0.0005: s._pcr = True; return True
+            zh = cv2.cvtColor(z, cv2.COLOR_BGR2HSV)
+            sm = float(zh[:, :, 1].mean())
+            if sm > 20: s._pcr = True; return True
+        tx, ty, tw, tth = s.cfg.BODYCAM_TIMER_ROI;
+        tr = s.crop(tx, ty, tw, tth)
+        if tr is not None:
+            g2 = cv2.cvtColor(tr, cv2.COLOR_BGR2GRAY)
+            if float(np.std(g2)) > 15: s._pcr = True; return True
+        hs = s.hsv_small
+        m1 = cv2.inRange(hs, np.array([0, 30, 30], _U8), np.array([20, 255, 255], _U8))
+        m2 = cv2.inRange(hs, np.array([160, 30, 30], _U8), np.array([180, 255, 255], _U8))
+        tr2 = cv2.countNonZero(m1) + cv2.countNonZero(m2)
+        tp = hs.shape[0] * hs.shape[1]
+        if tr2 / max(1, tp) > 0.0002: s._pcr = True; return True
+        s._pcr = False;
+        return False
+
+
+# ═══════════════════════════════════════════
+#  OCR
+# ═══════════════════════════════════════════
+def _crop_box(img, box):
+    """Строка текста по четырём точкам детектора, выпрямленная в прямоугольник."""
+    pts = np.array(box, np.float32)
+    w = int(max(np.linalg.norm(pts[0] - pts[1]), np.linalg.norm(pts[2] - pts[3])))
+    h = int(max(np.linalg.norm(pts[0] - pts[3]), np.linalg.norm(pts[1] - pts[2])))
+    if w < 1 or h < 1: return None
+    m = cv2.getPerspectiveTransform(pts, np.float32([[0, 0], [w, 0], [w, h], [0, h]]))
+    c = cv2.warpPerspective(img, m, (w, h), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    return np.rot90(c) if h / w >= 1.5 else c
+
+
+class OCRCropCache(LRUCache):
+    """
+    Результаты OCR по содержимому вырезки: ключ — хеш байтов и форма картинки,
+    движок и параметры чтения. Одинаковые пиксели (тот же чат в другом варианте,
+    на втором проходе или в следующем запуске) в модель второй раз не идут.
+    path — файл на диске: читается при создании, пишется save(); None — только в памяти.
+    """
+
+    def __init__(s, path=None, maxsize=_OCR_CROP_MAX):
+        super().__init__(maxsize)
+        s.path = Path(path) if path else None
+        s.hits = s.misses = 0
+        s._dirty = False
+        if s.path is not None and s.path.exists():
+            try:
+                for k, v in json.loads(s.path.read_text(encoding="utf-8")).items():
+                    super().put(k, (v[0], float(v[1])))
+            except Exception as e:
+                logger.warning(f"Кеш OCR вырезок не прочитан ({s.path.name}): {e}")
+
+    @staticmethod
+    def key(img, *params):
+        return f"{_fhb(np.ascontiguousarray(img))}|{'x'.join(map(str, img.shape))}|{'|'.join(map(str, params))}"
+
+    def get(s, k):
+        v = super().get(k)
+        if v is None:
+            s.misses += 1
+        else:
+            s.hits += 1
+        return v
+
+    def put(s, k, v):
+        super().put(k, v);
+        s._dirty = True
+
+    def save(s):
+        if s.path is None or not s._dirty: return
+        with s._lk:
+            d = {k: [t, round(c, 4)] for k, (t, c) in s._d.items()}
+            s._dirty = False
+        # Через временный файл: обрыв посреди записи не портит прежний кеш
+        tmp = s.path.with_name(s.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(d, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, s.path)
+        except Exception as e:
+            logger.warning(f"Кеш OCR вырезок не сохранён: {e}")
+
+
+_ocr_crop_cache = OCRCropCache(OCR_CROP_CACHE_FILE)
+
+
+class OCRBatcher:
+    """
+    Общий распознаватель строк для всех потоков анализа.
+    Каждый поток сам ищет строки на своём кадре, а вырезки сдаёт сюда. Первый сдавший
+    становится ведущим: ждёт до wait секунд, пока сдадут остальные потоки, что сейчас
+    внутри OCR (или пока не наберётся пачка batch строк), и прогоняет всё одним вызовом
+    rec — тот сам режет на пачки по rec_batch_num. Результаты расходятся владельцам.
+    Один поток в OCR — ведущий не ждёт никого, задержки нет. Если общий вызов упал,
+    вырезки каждого владельца распознаются заново отдельно: чужая плохая вырезка
+    не роняет OCR соседних кадров.
+    """
+
+    def __init__(s, rec, batch=6, wait=.01):
+        s._rec = rec
+        s._batch = batch;
+        s._wait = wait
+        s._q = []  # [(вырезки, ячейка результата)]
+        s._cv = threading.Condition()
+        s._busy = False
+        s._inflight = 0
+        s.calls = s.lines = 0
+
+    def enter(s):
+        with s._cv: s._inflight += 1
+
+    def leave(s):
+        with s._cv:
+            s._inflight -= 1;
+            s._cv.notify_all()
+
+    def recognize(s, crops):
+        """[(текст, conf)] на каждую вырезку, в том же порядке."""
+        if not crops: return []
+        slot = {}
+        with s._cv:
+            s._q.append((crops, slot))
+            s._cv.notify_all()
+            while "res" not in slot and "err" not in slot:
+                if s._busy:
+                    s._cv.wait();
+                    continue
+                s._busy = True
+                end = time.monotonic() + s._wait
+                while len(s._q) < s._inflight and sum(len(c) for c, _ in s._q) < s._batch:
+                    left = end - time.monotonic()
+                    if left <= 0: break
+                    s._cv.wait(left)
+                q, s._q = s._q, []
+                s._cv.release()
+                try:
+                    s._run(q)
+                finally:
+                    s._cv.acquire()
+                    s._busy = False
+                    s._cv.notify_all()
+        if "err" in slot: raise slot["err"]
+        return slot["res"]
+
+    def _call(s, crops):
+        out = s._rec(crops)[0]
+        s.calls += 1;
+        s.lines += len(crops)
+        return [(r[0], float(r[1])) for r in out]
+
+    def _run(s, q):
+        try:
+            out = s._call([c for cs, _ in q for c in cs])
+        except Exception as e:
+            if len(q) > 1: return s._alone(q)
+            q[0][1]["err"] = e;
+            return
+        i = 0
+        for cs, sl in q:
+            sl["res"] = out[i:i + len(cs)]
+            i += len(cs)
+
+    def _alone(s, q):
+        for cs, sl in q:
+            try:
+                sl["res"] = s._call(cs)
+            except Exception as e:
+                sl["err"] = e
+
+
+class OCR:
+    _instance = None
+    _lock = threading.Lock()
+    _init_lock = threading.Lock()
+
+    _engine = None
+    _engine_name = "none"
+    _initialized = False
+    _bat = None  # OCRBatcher поверх text_rec RapidOCR
+    _REC_BATCH = 6  # rec_batch_num, с которым создаётся движок
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def init(self, callback=None) -> bool:
+        """Инициализирует OCR с оптимизированными настройками."""
+        with self._init_lock:
+            if self._initialized:
+                return self._engine is not None
+
+            def log(msg, level="info"):
+                print(f"[OCR] {msg}")
+                if callback:
+                    callback(msg, level)
+
+            log(f"GPU: {GPU_VENDOR}")
+
+            # RapidOCR с оптимизацией
+            if RAPIDOCR_OK:
+                try:
+                    log("Загрузка RapidOCR (оптимизированный)...")
+
+                    # Оптимизированные параметры для скорости
+                    self._engine = RapidOCREngine(
+                        det_use_cuda=False,
+                        rec_use_cuda=False,
+                        # Уменьшаем размер для быстрой обработки
+                        det_limit_side_len=960,  # было 1920
+                        det_limit_type="max",
+                        # Меньше итераций
+                        det_db_thresh=0.3,
+                        det_db_box_thresh=0.5,
+                        det_db_unclip_ratio=1.6,
+                        # Быстрый режим
+                        rec_batch_num=self._REC_BATCH,
+                    )
+
+                    self._engine_name = f"RapidOCR Fast ({GPU_VENDOR})"
+                    log(f"✓ {self._engine_name}")
+                    self._batched()
+                    self._initialized = True
+                    return True
+                except TypeError:
+                    # Если параметры не поддерживаются - используем базовые
+                    try:
+                        self._engine = RapidOCREngine()
+                        self._engine_name = f"RapidOCR ({GPU_VENDOR})"
+                        log(f"✓ {self._engine_name}")
+                        self._batched()
+                        self._initialized = True
+                        return True
+                    except Exception as e:
+                        log(f"RapidOCR ошибка: {e}")
+                except Exception as e:
+                    log(f"RapidOCR ошибка: {e}")
+
+            # PaddleOCR fallback
+            if PADDLEOCR_OK:
+                try:
+                    log("Загрузка PaddleOCR...")
+                    self._engine = PaddleOCR(
+                        use_angle_cls=False,
+                        lang="ru",
+                        use_gpu=PADDLE_HAS_CUDA,
+                        show_log=False
+                    )
+                    self._engine_name = "PaddleOCR"
+                    log(f"✓ {self._engine_name}")
+                    self._initialized = True
+                    return True
+                except Exception as e:
+                    log(f"PaddleOCR ошибка: {e}")
+
+            # EasyOCR fallback
+            if EASYOCR_OK:
+                try:
+                    log("Загрузка EasyOCR...")
+                    self._engine = easyocr.Reader(["ru", "en"], gpu=False, verbose=False)
+                    self._engine_name = "EasyOCR"
+                    log(f"✓ {self._engine_name}")
+                    self._initialized = True
+                    return True
+                except Exception as e:
+                    log(f"EasyOCR ошибка: {e}")
+
+            log("❌ Нет доступных OCR движков!")
+            self._initialized = True
+            self._engine_name = "none"
+            return False
+
+    def _batched(self):
+        """
+        Распознавание строк общими пачками — если эта версия RapidOCR даёт вызвать поиск
+        строк и text_rec по отдельности. Проверяется один раз, здесь, на пустых картинках.
+        """
+        self._bat = None
+        rec = getattr(self._engine, "text_rec", None)
+        if not callable(rec): return
+        try:
+            boxes, _ = self._engine(np.full((32, 96, 3), 255, np.uint8), use_det=True, use_cls=False, use_rec=False)
+            r = rec([np.full((48, 160, 3), 255, np.uint8)])[0]
+            str(r[0][0]), float(r[0][1])
+        except Exception as e:
+            print(f"[OCR] Пакетное распознавание недоступно: {e}");
+            return
+        self._bat = OCRBatcher(rec, batch=getattr(rec, "rec_batch_num", None) or self._REC_BATCH)
+
+    @property
+    def name(self) -> str:
+        return self._engine_name
+
+    @property
+    def is_ready(self) -> bool:
+        return self._initialized and self._engine is not None
+
+    @property
+    def _n(self) -> str:
+        return self._engine_name
+
+    @property
+    def _ok(self) -> bool:
+        return self._initialized
+
+    @property
+    def _r(self):
+        return self._engine
+
+    def warm(self):
+        """Прогрев: первый вызов движка заметно медленнее остальных — делаем его заранее."""
+        if not self.init(): return
+        try:
+            self.read(np.full((48, 160, 3), 255, np.uint8))
+        except Exception:
+            pass
+
+    def read(self, img, mc=0.15, mh=5, ml=2):
+        """Читает текст с изображения. Те же пиксели с теми же параметрами — из _ocr_crop_cache."""
+        if not self._initialized:
+            self.init()
+        if self._engine is None:
+            return "", 0.
+
+        k = OCRCropCache.key(img, self._engine_name, mc, mh, ml)
+        hit = _ocr_crop_cache.get(k)
+        if hit is not None:
+            return hit
+        res = self._engine_read(img, mc, mh, ml)
+        # Сбой движка — не «текста нет»: в кеш не кладём, в следующий раз прочитаем заново
+        if res is None:
+            return "", 0.
+        _ocr_crop_cache.put(k, res)
+        return res
+
+    def _engine_read(self, img, mc, mh, ml):
+        """Чтение выбранным движком; None — движок упал (результата нет)."""
+        if "RapidOCR" in self._engine_name:
+            return self._read_rapid(img, mc, mh, ml)
+        elif "Paddle" in self._engine_name:
+            return self._read_paddle(img, mc, mh, ml)
+        elif "EasyOCR" in self._engine_name:
+            return self._read_easy(img, mc, mh, ml)
+        return None
+
+    def read_fast(self, img, mc=0.10, mh=3, ml=2):
+        """Быстрое чтение с пониженными требованиями к качеству."""
+        if not self._initialized:
+            self.init()
+        if self._engine is None:
+            return "", 0.
+
+        # Уменьшаем изображение для скорости
+        h, w = img.shape[:2]
+        if w > 800:
+            scale = 800 / w
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        return self._engine_read(img, mc, mh, ml) or ("", 0.)
+
+    def _read_rapid(self, img, mc, mh, ml):
+        bat = self._bat
+        if bat is not None:
+            bat.enter()
+            try:
+                return self._read_rapid_batched(bat, img, mc, mh, ml)
+            except Exception:
+                return None
+            finally:
+                bat.leave()
+        try:
+            result, _ = self._engine(img)
+            if not result:
+                return "", 0.
+
+            lines, confidences = [], []
+            for item in result:
+                if len(item) < 3:
+                    continue
+                box, text, conf = item[0], item[1], item[2]
+
+                if conf < mc or len(text.strip()) < ml:
+                    continue
+
+                if box:
+                    try:
+                        ys = [p[1] for p in box]
+                        if max(ys) - min(ys) < mh:
+                            continue
+                    except:
+                        pass
+
+                lines.append(text.strip())
+                confidences.append(conf)
+
+            if not lines:
+                return "", 0.
+
+            return " ".join(lines).lower(), sum(confidences) / len(confidences)
+        except Exception as e:
+            return None
+
+    def rec_lines(self, crops, mc=0.10, ml=2):
+        """[(текст, conf)] по уже вырезанным строкам, без детектора. None — движок так не умеет.
+        Строки ниже mc или короче ml символов — ("", 0.), как у read().
+        Строки, уже читанные раньше, берутся из _ocr_crop_cache — в модель идут только новые."""
+        if not self._initialized:
+            self.init()
+        bat = self._bat
+        if bat is None or not crops:
+            return None
+        ks = [OCRCropCache.key(c, self._engine_name, "rec") for c in crops]
+        out = [_ocr_crop_cache.get(k) for k in ks]
+        miss = [i for i, v in enumerate(out) if v is None]
+        if miss:
+            res = self._rec_miss(bat, [crops[i] for i in miss])
+            if res is None:
+                return None
+            for i, v in zip(miss, res):
+                out[i] = v;
+                _ocr_crop_cache.put(ks[i], v)
+        return [(t.strip(), c) if c >= mc and len(t.strip()) >= ml else ("", 0.) for t, c in out]
+
+    @staticmethod
+    def _rec_miss(bat, crops):
+        bat.enter()
+        try:
+            return bat.recognize(crops)
+        except Exception:
+            return None
+        finally:
+            bat.leave()
+
+    def _read_rapid_batched(self, bat, img, mc, mh, ml):
+        """Поиск строк — в своём потоке, распознавание — общей пачкой через OCRBatcher."""
+        if img.ndim == 2: img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        boxes, _ = self._engine(img, use_det=True, use_cls=False, use_rec=False)
+        if not boxes: return "", 0.
+        crops = []
+        for box in boxes:
+            ys = [p[1] for p in box]
+            if max(ys) - min(ys) < mh: continue
+            c = _crop_box(img, box)
+            if c is not None: crops.append(c)
+        lines, confidences = [], []
+        for text, conf in bat.recognize(crops):
+            if conf < mc or len(text.strip()) < ml: continue
+            lines.append(text.strip())
+            confidences.append(conf)
+        if not lines: return "", 0.
+        return " ".join(lines).lower(), sum(confidences) / len(confidences)
+
+    def _read_paddle(self, img, mc, mh, ml):
+        try:
+            r = self._engine.ocr(img, cls=False)
+            if not r or not r[0]:
+                return "", 0.
+            ln, cf = [], []
+            for l in r[0]:
+                if not l:
+                    continue
+                bx, (tx, c) = l
+                if c < mc or len(tx.strip()) < ml:
+                    continue
+                if bx:
+                    ys = [p[1] for p in bx]
+                    if max(ys) - min(ys) < mh:
+                        continue
+                ln.append(tx.strip())
+                cf.append(c)
+            return (" ".join(ln).lower(), sum(cf) / len(cf)) if ln else ("", 0.)
+        except:
+            return None
+
+    def _read_easy(self, img, mc, mh, ml):
+        try:
+            r = self._engine.readtext(img, detail=1, paragraph=False)
+            if not r:
+                return "", 0.
+            ln, cf = [], []
+            for bx, tx, c in r:
+                if c < mc or len(tx.strip()) < ml:
+                    continue
+                if bx:
+                    ys = [p[1] for p in bx]
+                    if max(ys) - min(ys) < mh:
+                        continue
+                ln.append(tx.strip())
+                cf.append(c)
+            return (" ".join(ln).lower(), sum(cf) / len(cf)) if ln else ("", 0.)
+        except:
+            return None
+
+    def has_text_region(self, gray, min_contours=2):
+        """Быстрая проверка наличия текста без OCR."""
+        if gray is None or gray.size == 0:
+            return False
+        if float(np.std(gray)) < 10:
+            return False
+        _, bn = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        cnt, _ = cv2.findContours(bn, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return len(cnt) >= min_contours
+
+
+_ocr = OCR()
+
+# ═══════════════════════════════════════════
+#  ПРЕДЗАГРУЗЧИК
+# ═══════════════════════════════════════════
+class ImageProvider:
+    """
+    Единый источник декодированных картинок: анализ, аналитика и оверлей читают через get().
+    prefetch() читает и декодирует вперёд в фоне — порядок задаёт тот, кто планирует работу.
+    Файл читается один раз: из того же буфера считается хеш содержимого (frame()).
+    Если skip(хеш) говорит, что результат уже известен, картинка не декодируется;
+    probe(хеш, img 1/2) может отказаться от полного декода JPEG (см. _ldh).
+    Память ограничена budget байт: считаются и готовые кадры, и те, что ещё читаются.
+    Картинка отдаётся один раз — get()/frame() забирает её из кеша.
+    keep() придерживает уже декодированный кадр на второй проход; такие кадры живут
+    в том же budget и первыми уступают место предзагрузке.
+    """
+
+    def __init__(s, budget=_IMG_BUDGET, workers=2):
+        s._c = OrderedDict()  # путь -> (хеш, img)
+        s._kp = OrderedDict()  # придержанные keep(): путь -> (хеш, img)
+        s._ksz = 0
+        s._fut = {}
+        s._sz = 0;
+        s._est = 0
+        s._budget = budget
+        s._lk = threading.Lock()
+        s._p = ThreadPoolExecutor(workers, thread_name_prefix="pf")
+        s.hits = s.misses = 0
+
+    @staticmethod
+    def _nb(fr):
+        return fr[1].nbytes if fr[1] is not None else 0
+
+    def prefetch(s, fps, skip=None, probe=None):
+        for fp in fps:
+            k = str(fp)
+            with s._lk:
+                if k in s._c or k in s._kp or k in s._fut: continue
+                while s._kp and s._sz + s._ksz + len(s._fut) * s._est >= s._budget: s._drop()
+                if s._sz + len(s._fut) * s._est >= s._budget: return
+                s._fut[k] = s._p.submit(s._load, fp, skip, probe)
+
+    def _drop(s):
+        _, old = s._kp.popitem(last=False);
+        s._ksz -= s._nb(old)
+
+    def _load(s, fp, skip=None, probe=None):
+        k = str(fp);
+        fr = _ldh(fp, skip, probe)
+        with s._lk:
+            if s._fut.pop(k, None) is not None and fr[0] is not None:
+                s._c[k] = fr;
+                nb = s._nb(fr);
+                s._sz += nb
+                if nb: s._est = nb
+                while s._kp and s._sz + s._ksz > s._budget: s._drop()
+                while s._sz > s._budget and s._c:
+                    _, old = s._c.popitem(last=False);
+                    s._sz -= s._nb(old)
+        return fr
+
+    def _take(s, k):
+        fr = s._c.pop(k, None)
+        if fr is not None:
+            s._sz -= s._nb(fr)
+        else:
+            fr = s._kp.pop(k, None)
+            if fr is not None: s._ksz -= s._nb(fr)
+        return fr
+
+    def keep(s, fp, fv, img):
+        """Кадр, скорее всего, понадобится ещё раз (второй проход после bc_join) — не декодировать заново."""
+        if fv is None or img is None: return
+        k = str(fp)
+        with s._lk:
+            s._take(k)
+            s._kp[k] = (fv, img);
+            s._ksz += img.nbytes
+            while s._kp and s._sz + s._ksz > s._budget: s._drop()
+
+    def frame(s, fp, skip=None, probe=None):
+        """(хеш содержимого, img) за одно чтение; img is None — решено skip/probe или файл не читается."""
+        k = str(fp)
+        with s._lk:
+            fr = s._take(k)
+            f = s._fut.get(k) if fr is None else None
+        if fr is None and f is not None:
+            fr = f.result()
+            with s._lk: s._take(k)
+        if fr is not None and fr[0] is not None:
+            s.hits += 1;
+            return fr
+        s.misses += 1
+        return _ldh(fp, skip, probe)
+
+    def get(s, fp):
+        fv, img = s.frame(fp)
+        # Декод был пропущен по skip, а картинка всё же нужна — дочитываем
+        return img if img is not None or fv is None else _ld(fp)
+
+    def discard(s, fp):
+        """Картинка не понадобится (результат взят из кеша) — освобождаем место."""
+        k = str(fp)
+        with s._lk:
+            s._take(k)
+            f = s._fut.pop(k, None)
+        if f is not None: f.cancel()
+
+    def shutdown(s):
+        s._p.shutdown(wait=False)
+
+
+# ═══════════════════════════════════════════
+#  БОДИ-КАМЕРА
+# ═══════════════════════════════════════════
+_TRE = re.compile(r'(\d{1,2}[:\.]?\d{2}[:\.]?\d{0,2})')
+
+
+def _crbv(roi, rm, bm, d):
+    if roi is None or roi.size == 0: return 0, 0
+    b, g, r = roi[:, :, 0], roi[:, :, 1], roi[:, :, 2];
+    t = roi.shape[0] * roi.shape[1]
+    ds = int(d * 10);
+    r16, g16, b16 = r.astype(_U16), g.astype(_U16), b.astype(_U16)
+    m = (r >= rm) & (g <= bm) & (b <= bm) & (r16 * 10 > g16 * ds) & (r16 * 10 > b16 * ds)
+    return int(np.count_nonzero(m)), t
+
+
+def _crdv(roi, rn, rx, gx, bx, d):
+    if roi is None or roi.size == 0: return 0, 0
+    b, g, r = roi[:, :, 0], roi[:, :, 1], roi[:, :, 2];
+    t = roi.shape[0] * roi.shape[1]
+    ds = int(d * 10);
+    r16, g16, b16 = r.astype(_U16), g.astype(_U16), b.astype(_U16)
+    m = (r >= rn) & (r <= rx) & (g <= gx) & (b <= bx) & (r16 * 10 > g16 * ds) & (r16 * 10 > b16 * ds)
+    return int(np.count_nonzero(m)), t
+
+
+def _rdom(roi):
+    if roi is None or roi.size == 0: return 0.
+    r = roi[:, :, 2].astype(_F32);
+    g = roi[:, :, 1].astype(_F32);
+    b = roi[:, :, 0].astype(_F32)
+    t = roi.shape[0] * roi.shape[1]
+    return float(np.count_nonzero((r > g * 1.1) & (r > b * 1.1) & (r > 50))) / t if t else 0.
+
+
+def _wc(ctx, cfg):
+    cz = [(0, 780, 100, 80), (0, 800, 80, 70), (0, 830, 70, 60), (0, 10, 100, 80),
+          (0, 20, 80, 70), (1820, 780, 100, 80), (1820, 10, 100, 80)]
+    ws = wc = 0
+    for zx, zy, zw, zh in cz:
+        roi = ctx.crop(zx, zy, zw, zh);
+        hr = ctx.crop_hsv(zx, zy, zw, zh)
+        if roi is None or hr is None: continue
+        t = roi.shape[0] * roi.shape[1]
+        if t == 0: continue
+        h_ch, s_ch, v_ch = hr[:, :, 0], hr[:, :, 1], hr[:, :, 2]
+        wm = ((h_ch <= cfg.WARM_CORNER_HUE_MAX) | (h_ch >= cfg.WARM_CORNER_HUE_MIN2)) & \
+             (s_ch > cfg.WARM_CORNER_SAT_MIN) & (v_ch > cfg.WARM_CORNER_VAL_MIN)
+        wr = float(np.count_nonzero(wm)) / t;
+        rd = _rdom(roi)
+        rm_m = float(roi[:, :, 2].mean());
+        gm_m = float(roi[:, :, 1].mean());
+        bm_m = float(roi[:, :, 0].mean())
+        mg = max(gm_m, bm_m)
+        if wr > cfg.WARM_CORNER_STRONG_RATIO and rd > cfg.WARM_CORNER_STRONG_RDOM and rm_m > mg:
+            ws += 1
+        elif wr > cfg.WARM_CORNER_WEAK_RATIO and rd > cfg.WARM_CORNER_WEAK_RDOM and rm_m > mg * .95:
+            wc += 1
+    return ws >= 1 or wc >= 2
+
+
+def _tv(ctx, cfg, diag=None):
+    cr = ctx.crop(600, 300, 720, 480)
+    if cr is None: return False
+    ch = cv2.cvtColor(cr, cv2.COLOR_BGR2HSV)
+    cs = float(ch[:, :, 1].mean());
+    cv_ = float(ch[:, :, 2].mean())
+    cz = [("НЛ", 0, 780, 120, 100), ("НЛ2", 0, 840, 80, 60), ("ВЛ", 0, 10, 120, 100),
+          ("ВЛ2", 0, 30, 80, 70), ("ВП", 1800, 10, 120, 100), ("НП", 1800, 780, 120, 100)]
+    ti = dk = 0
+    for nm, zx, zy, zw, zh in cz:
+        roi = ctx.crop(zx, zy, zw, zh);
+        hr = ctx.crop_hsv(zx, zy, zw, zh)
+        if roi is None or hr is None: continue
+        t = roi.shape[0] * roi.shape[1]
+        if t == 0: continue
+        s2 = float(hr[:, :, 1].mean());
+        v2 = float(hr[:, :, 2].mean())
+        if s2 - cs > 10 and s2 > cfg.BC_TINT_SAT_MIN: ti += 1
+        if cv_ - v2 > 30 and v2 < cfg.BC_VIGNETTE_VAL_MAX: dk += 1
+        if float(np.count_nonzero(hr[:, :, 1] > 40)) / t > cfg.BC_TINT_CORNER_RATIO: ti += 1
+    return ti >= cfg.BC_TINT_CORNERS_NEEDED or dk >= 3 or (ti >= 2 and dk >= 1)
+
+
+def check_bc_timer(ctx, diag=None):
+    cfg = ctx.cfg;
+    tx, ty, tw, th = cfg.BODYCAM_TIMER_ROI
+    roi = ctx.crop(tx, ty, tw, th)
+    if roi is None: return False, ""
+    g = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    if float(np.std(g)) < 10: return False, ""
+    big = cv2.resize(g, None, fx=4, fy=4, interpolation=cv2.INTER_LINEAR)
+    _, bn1 = cv2.threshold(big, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    bn2 = cv2.bitwise_not(bn1)
+    for bi in (bn1, bn2):
+        t, _ = _ocr.read(cv2.cvtColor(bi, cv2.COLOR_GRAY2BGR), mc=0.15, mh=3, ml=1)
+        if t:
+            tc = t.strip().replace(" ", "");
+            m = _TRE.search(tc)
+            if m:
+                tv = m.group(1);
+                dg = re.sub(r'[^0-9]', '', tv)
+                if dg and not all(c == '0' for c in dg): return True, tv
+    if TESSERACT_OK:
+        for bi in (bn1, bn2):
+            try:
+                t = pytesseract.image_to_string(
+                    bi, config="--psm 7 --oem 1 -c tessedit_char_whitelist=0123456789:").strip()
+                if t:
+                    m = _TRE.search(t.replace(" ", ""))
+                    if m:
+                        tv = m.group(1);
+                        dg = re.sub(r'[^0-9]', '', tv)
+                        if dg and not all(c == '0' for c in dg): return True, tv
+            except:
+                pass
+    return False, ""
+
+
+def _bis(a, c, ox, rm, gm, bm, cfg):
+    return (cfg.BODYCAM_BLOB_STRICT_AREA_MIN <= a <= cfg.BODYCAM_BLOB_STRICT_AREA_MAX
+            and c >= cfg.BODYCAM_BLOB_STRICT_CIRC and rm >= cfg.BODYCAM_BLOB_STRICT_R_MIN
+            and gm <= cfg.BODYCAM_BLOB_STRICT_G_MAX and bm <= cfg.BODYCAM_BLOB_STRICT_B_MAX
+            and rm > gm * cfg.BODYCAM_BLOB_STRICT_DOM and rm > bm * cfg.BODYCAM_BLOB_STRICT_DOM
+            and ox <= cfg.BODYCAM_BLOB_MAX_X)
+
+
+def _bid(a, c, ox, rm, gm, bm, cfg):
+    return (cfg.BODYCAM_BLOB_DIM_AREA_MIN <= a <= cfg.BODYCAM_BLOB_DIM_AREA_MAX
+            and c >= cfg.BODYCAM_BLOB_DIM_CIRC
+            and cfg.BODYCAM_BLOB_DIM_R_MIN <= rm <= cfg.BODYCAM_BLOB_DIM_R_MAX
+            and gm <= cfg.BODYCAM_BLOB_DIM_G_MAX and bm <= cfg.BODYCAM_BLOB_DIM_B_MAX
+            and rm > gm * cfg.BODYCAM_BLOB_DIM_DOM and rm > bm * cfg.BODYCAM_BLOB_DIM_DOM
+            and ox <= cfg.BODYCAM_BLOB_MAX_X)
+
+
+def _biso(a, c, ox, rm, gm, bm, cfg):
+    return (cfg.BODYCAM_BLOB_SOFT_AREA_MIN <= a <= cfg.BODYCAM_BLOB_SOFT_AREA_MAX
+            and c >= cfg.BODYCAM_BLOB_SOFT_CIRC and rm >= cfg.BODYCAM_BLOB_SOFT_R_MIN
+            and gm <= cfg.BODYCAM_BLOB_SOFT_G_MAX and bm <= cfg.BODYCAM_BLOB_SOFT_B_MAX
+            and rm > gm * cfg.BODYCAM_BLOB_SOFT_DOM and rm > bm * cfg.BODYCAM_BLOB_SOFT_DOM
+            and ox <= cfg.BODYCAM_BLOB_MAX_X)
+
+
+_BC_PROBE_STD = 8.  # σ зоны таймера: check_bc_timer читает от 10, уменьшение сглаживает — с запасом
+
+
+def bodycam_probe(ctx):
+    """
+    Проба на уменьшенном кадре: False — боди-кам точно нет, полный кадр не нужен.
+    Повторяет только ветку отказа check_bodycam и только на признаках, не зависящих от
+    масштаба: ни красного и насыщенного в углах (quick_red_precheck), ни тонировки и
+    виньетки (_tv), зона таймера однородна. Всё остальное решает check_bodycam по полному кадру.
+    """
+    if ctx.quick_red_precheck() or _tv(ctx, ctx.cfg): return True
+    tr = ctx.crop(*ctx.cfg.BODYCAM_TIMER_ROI)
+    return tr is not None and float(np.std(cv2.cvtColor(tr, cv2.COLOR_BGR2GRAY))) >= _BC_PROBE_STD
+
+
+def check_bodycam(ctx, diag=None):
+    cfg = ctx.cfg
+    if not ctx.quick_red_precheck(diag):
+        if _tv(ctx, cfg, diag): return True, .002
+        tf, tt = check_bc_timer(ctx, diag)
+        if tf: return True, .5
+        return False, 0.
+    ms1 = ctx.get_mask(cfg.BODYCAM_RED_STRICT_LO, cfg.BODYCAM_RED_STRICT_HI)
+    ms2 = ctx.get_mask(cfg.BODYCAM_RED2_STRICT_LO, cfg.BODYCAM_RED2_STRICT_HI)
+    md1 = ctx.get_mask(cfg.BODYCAM_RED_DIM_LO, cfg.BODYCAM_RED_DIM_HI)
+    md2 = ctx.get_mask(cfg.BODYCAM_RED2_DIM_LO, cfg.BODYCAM_RED2_DIM_HI)
+    mf1 = ctx.get_mask(cfg.BODYCAM_RED_SOFT_LO, cfg.BODYCAM_RED_SOFT_HI)
+    mf2 = ctx.get_mask(cfg.BODYCAM_RED2_SOFT_LO, cfg.BODYCAM_RED2_SOFT_HI)
+    ms = cv2.bitwise_or(ms1, ms2);
+    md = cv2.bitwise_or(md1, md2);
+    mf = cv2.bitwise_or(mf1, mf2)
+    br = 0.;
+    sc = []
+    for i, (rx, ry, rw, rh) in enumerate(cfg.BODYCAM_ROIS):
+        roi = ctx.crop(rx, ry, rw, rh)
+        if roi is None: continue
+        t = roi.shape[0] * roi.shape[1]
+        if t == 0: continue
+        cs_m = ctx.crop_mask(ms, rx, ry, rw, rh);
+        cd_m = ctx.crop_mask(md, rx, ry, rw, rh)
+        if cs_m is None or cd_m is None: continue
+        rs = cv2.countNonZero(cs_m);
+        rd = cv2.countNonZero(cd_m)
+        if (rs / t + rd / t) > cfg.BODYCAM_MAX_RED_RATIO: continue
+        rb, _ = _crbv(roi, cfg.BODYCAM_BGR_R_MIN, cfg.BODYCAM_BGR_BG_MAX, cfg.BODYCAM_BGR_DOMINANCE)
+        rbd, _ = _crdv(roi, cfg.BODYCAM_BGR_DIM_R_MIN, cfg.BODYCAM_BGR_DIM_R_MAX,
+                       cfg.BODYCAM_BGR_DIM_G_MAX, cfg.BODYCAM_BGR_DIM_B_MAX, cfg.BODYCAM_BGR_DIM_DOMINANCE)
+        rdm = _rdom(roi);
+        ef = 0.
+        if rb / t >= cfg.BODYCAM_RED_THR:
+            ef = rb / t
+        elif rs / t >= cfg.BODYCAM_RED_THR and rb > 0:
+            ef = rs / t
+        elif rbd / t >= cfg.BODYCAM_RED_THR and rbd >= cfg.BODYCAM_BGR_DIM_MIN_CONFIRM:
+            ef = rbd / t
+        elif rd / t >= cfg.BODYCAM_RED_THR and rbd >= cfg.BODYCAM_BGR_DIM_MIN_CONFIRM:
+            ef = rd / t
+        elif rdm >= .15 and rd / t >= .001:
+            ef = rdm * .02
+        elif rd / t >= cfg.BODYCAM_RED_THR * .5 and rdm >= .05:
+            ef = rd / t
+        if ef > br: br = ef
+        if ef < cfg.BODYCAM_RED_THR:
+            cf_m = ctx.crop_mask(mf, rx, ry, rw, rh)
+            if cf_m is not None:
+                rsf = cv2.countNonZero(cf_m);
+                rf = rsf / t
+                if cfg.BODYCAM_RED_THR_SOFT <= rf <= cfg.BODYCAM_MAX_RED_RATIO:
+                    if rb >= 1 or rbd >= cfg.BODYCAM_BGR_DIM_MIN_CONFIRM or rdm >= .05:
+                        rm2 = float(roi[:, :, 2].mean());
+                        gm2 = float(roi[:, :, 1].mean());
+                        bm2 = float(roi[:, :, 0].mean())
+                        if rm2 > max(gm2, bm2) * 1.05: sc.append((rf, i))
+    if br >= cfg.BODYCAM_RED_THR: return True, br
+    if sc: sc.sort(reverse=True); return True, sc[0][0] * .8
+    if _wc(ctx, cfg): return True, .003
+    if _tv(ctx, cfg, diag): return True, .002
+    tf, tt = check_bc_timer(ctx, diag)
+    if tf: return True, .5
+    ma = cv2.bitwise_or(cv2.bitwise_or(ms, md), mf)
+    sb2 = [];
+    db2 = [];
+    sb3 = []
+    for si, (sx2, sy2, sw2, sh2) in enumerate(cfg.BODYCAM_SCAN_STRIPS):
+        sm = ctx.crop_mask(ma, sx2, sy2, sw2, sh2)
+        if sm is None or cv2.countNonZero(sm) == 0: continue
+        cnt, _ = cv2.findContours(sm, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not cnt: continue
+        st = ctx.crop(sx2, sy2, sw2, sh2)
+        if st is None: continue
+        ix = 1. / ctx.sx
+        for c in cnt:
+            a = cv2.contourArea(c)
+            if a < 5: continue
+            p_arc = cv2.arcLength(c, True)
+            if p_arc == 0: continue
+            ci = 4. * np.pi * a / (p_arc * p_arc)
+            x1, y1, bw, bh = cv2.boundingRect(c)
+            br2 = st[y1:y1 + bh, x1:x1 + bw]
+            if br2.size == 0: continue
+            rm_b = float(br2[:, :, 2].mean());
+            gm_b = float(br2[:, :, 1].mean());
+            bm3 = float(br2[:, :, 0].mean())
+            ox = int(x1 * ix) + sx2
+            if ox > cfg.BODYCAM_BLOB_MAX_X: continue
+            if _bis(a, ci, ox, rm_b, gm_b, bm3, cfg):
+                sb2.append(1)
+            elif _bid(a, ci, ox, rm_b, gm_b, bm3, cfg):
+                db2.append(1)
+            elif _biso(a, ci, ox, rm_b, gm_b, bm3, cfg):
+                sb3.append(1)
+    if sb2: return True, .005
+    if db2: return True, .004
+    if len(sb3) >= 2: return True, .003
+    return False, br
+
+
+# ═══════════════════════════════════════════
+#  OCR + ТРИГГЕР
+# ═══════════════════════════════════════════
+def _text_color_masks(roi_bgr, cfg):
+    """Маски цветов текста чата: имя цвета -> маска (красный — оба края оттенка)."""
+    hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
+
+    def rng(lo, hi):
+        return cv2.inRange(hsv, np.array(lo, _U8), np.array(hi, _U8))
+
+    return {"purple": rng(cfg.TEXT_PURPLE_LO, cfg.TEXT_PURPLE_HI),
+            "green": rng(cfg.TEXT_GREEN_LO, cfg.TEXT_GREEN_HI),
+            "orange": rng(cfg.TEXT_ORANGE_LO, cfg.TEXT_ORANGE_HI),
+            "white": rng(cfg.TEXT_WHITE_LO, cfg.TEXT_WHITE_HI),
+            "yellow": rng(cfg.TEXT_YELLOW_LO, cfg.TEXT_YELLOW_HI),
+            "gray": rng(cfg.TEXT_GRAY_LO, cfg.TEXT_GRAY_HI),
+            "red": cv2.bitwise_or(rng(cfg.TEXT_RED_LO, cfg.TEXT_RED_HI), rng(cfg.TEXT_RED2_LO, cfg.TEXT_RED2_HI))}
+
+
+def _extract_colored_text_mask(roi_bgr, cfg, masks=None):
+    masks = list((masks or _text_color_masks(roi_bgr, cfg)).values())
+    combined = masks[0]
+    for m in masks[1:]: combined = cv2.bitwise_or(combined, m)
+    combined = cv2.morphologyEx(combined, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 1)))
+    combined = cv2.morphologyEx(combined, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2)))
+    return combined
+
+
+OCR_CHAT_LINES_MODES = ("off", "first", "only")
+CHAT_COLORS = ("purple", "green", "orange", "yellow", "white", "gray", "red")
+
+
+def chat_policy(colors, cats=("TAB", "VAC", "PMP")):
+    """CHAT_LINE_POLICY, в которой строки цветов colors дают любые cats, остальные не читаются."""
+    return {c: list(cats) if c in colors else [] for c in CHAT_COLORS}
+
+
+def _chat_lines(roi_bgr, cfg, sy=1.):
+    """
+    Строки чата по горизонтальной проекции цветной маски текста: [(вырезка, цвет)] сверху вниз.
+    Цвет строки — тот, чьих пикселей в ней больше всего.
+    None — область не похожа на чат (полоса выше строки, сплошной фон): пусть работает детектор.
+    """
+    cms = _text_color_masks(roi_bgr, cfg)
+    m = _extract_colored_text_mask(roi_bgr, cfg, cms)
+    h, w = m.shape[:2]
+    lo, hi = cfg.CHAT_LINE_H[0] * sy, cfg.CHAT_LINE_H[1] * sy
+    rows = np.count_nonzero(m, axis=1) >= max(3, w // 200)
+    # Пропуски в 1-2 строки пикселей внутри буквы не делят строку
+    ink = np.flatnonzero(rows)
+    if ink.size == 0: return None
+    bands = [];
+    y0 = yp = int(ink[0])
+    for y in ink[1:]:
+        y = int(y)
+        if y - yp > 2: bands.append((y0, yp + 1)); y0 = y
+        yp = y
+    bands.append((y0, yp + 1))
+    out = []
+    for b0, b1 in bands:
+        bh = b1 - b0
+        if bh > hi: return None
+        if bh < lo: continue
+        cols = np.flatnonzero(np.count_nonzero(m[b0:b1], axis=0))
+        pad = max(2, bh // 4)
+        x0, x1 = max(0, int(cols[0]) - pad), min(w, int(cols[-1]) + 1 + pad)
+        col = max(cms, key=lambda k: cv2.countNonZero(cms[k][b0:b1, x0:x1]))
+        out.append((roi_bgr[max(0, b0 - pad):min(h, b1 + pad), x0:x1], col))
+    return out or None
+
+
+def _generate_ocr_variants_fast(roi_bgr, cfg) -> Generator:
+    g = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2GRAY);
+    scale = 1.8
+    yield roi_bgr
+    color_mask = _extract_colored_text_mask(roi_bgr, cfg)
+    if cv2.countNonZero(color_mask) > 50:
+        cm_big = cv2.resize(color_mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        yield cv2.cvtColor(cm_big, cv2.COLOR_GRAY2BGR)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    cl = clahe.apply(g)
+    cl_big = cv2.resize(cl, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    _, cl_bn = cv2.threshold(cl_big, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    yield cv2.cvtColor(cl_bn, cv2.COLOR_GRAY2BGR)
+    g_big = cv2.resize(g, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    _, bn2 = cv2.threshold(g_big, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    yield cv2.cvtColor(bn2, cv2.COLOR_GRAY2BGR)
+    hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
+    white = cv2.inRange(hsv, np.array([0, 0, 150], _U8), np.array([180, 50, 255], _U8))
+    purple = cv2.inRange(hsv, np.array([120, 25, 110], _U8), np.array([165, 220, 255], _U8))
+    wp = cv2.bitwise_or(white, purple)
+    if cv2.countNonZero(wp) > 30:
+        wp_big = cv2.resize(wp, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        yield cv2.cvtColor(wp_big, cv2.COLOR_GRAY2BGR)
+
+
+def _levenshtein(s1, s2):
+    if abs(len(s1) - len(s2)) > 3: return 99
+    if len(s1) > len(s2): s1, s2 = s2, s1
+    prev = list(range(len(s1) + 1))
+    for j in range(1, len(s2) + 1):
+        curr = [j] + [0] * len(s1)
+        for i in range(1, len(s1) + 1):
+            cost = 0 if s1[i - 1] == s2[j - 1] else 1
+            curr[i] = min(curr[i - 1] + 1, prev[i] + 1, prev[i - 1] + cost)
+        prev = curr
+    return prev[len(s1)]
+
+
+def _fuzzy_find(text, keywords, max_dist=2):
+    for kw in keywords:
+        kw_len = len(kw)
+        if kw_len < 4:
+            if kw in text: return True
+            continue
+        if kw in text: return True
+        for start in range(len(text) - kw_len + max_dist + 1):
+            if start < 0: continue
+            for win_len in range(max(kw_len - max_dist, 3), kw_len + max_dist + 1):
+                end = start + win_len
+                if end > len(text): break
+                if _levenshtein(text[start:end], kw) <= max_dist: return True
+    return False
+
+
+def _check_trigger_exact(text, cfg):
+    has_pmp = any(k in text for k in cfg.KW_PMP) and any(c in text for c in cfg.PMP_CONFIRM)
+    if has_pmp: return True, "PMP"
+    if any(k in text for k in cfg.KW_VACCINES): return True, "VAC"
+    if any(k in text for k in cfg.KW_TABLETS): return True, "TAB"
+    return False, ""
+
+
+def _check_trigger_fuzzy(text, cfg):
+    if _fuzzy_find(text, cfg.FUZZY_CORE_PMP, 2):
+        for c in cfg.PMP_CONFIRM:
+            if c in text: return True, "PMP"
+    if _fuzzy_find(text, cfg.FUZZY_CORE_VACCINES, 2): return True, "VAC"
+    if _fuzzy_find(text, cfg.FUZZY_CORE_TABLETS, 2): return True, "TAB"
+    return False, ""
+
+
+TRANSLIT_MAP = {
+    # Вакцины
+    "baklnh": "вакцин",
+    "bakuih": "вакцин",
+    "vakc": "вакцин",
+    "baklnhy": "вакцину",
+    "baknhy": "вакцину",
+    "vaktsn": "вакцин",
+    "вакц": "вакцин",
+
+    # Таблетки
+    "tabletk": "таблетк",
+    "tablet": "таблет",
+    "ta6teleok": "таблеток",
+    "ta6let": "таблет",
+
+    # Лекарства/Препараты
+    "lekarst": "лекарств",
+    "nekapctb": "лекарств",
+    "npenapat": "препарат",
+    "preparat": "препарат",
+    "nekapctbehhbi": "лекарственны",
+    "medukami": "медикам",
+    "medikament": "медикамент",
+
+    # ПМП
+    "пмп": "пмп",
+    "pmp": "пмп",
+    "nмn": "пмп",
+    "pmп": "пмп",
+    "пмn": "пмп",
+
+    # Выдал/Получил
+    "vydal": "выдал",
+    "poluchil": "получил",
+    "bыдaл": "выдал",
+    "пoлyчил": "получил",
+    "b3an": "взял",
+    "b3ял": "взял",
+
+    # Аптечка
+    "aptechk": "аптечк",
+    "anteчk": "аптечк",
+
+    # Больницы
+    "elsh": "elsh",
+    "sandy": "sandy",
+    "paleto": "paleto",
+    "3nш": "элш",
+    "caнди": "санди",
+    "naneto": "палето",
+}
+
+
+def _check_trigger_with_translit(text, cfg):
+    """Проверяет текст на наличие ключевых слов с учётом транслита."""
+    text = text.lower()
+
+    # Сначала проверяем обычные ключевые слова
+    if any(kw in text for kw in cfg.KW_VACCINES):
+        return True, "VAC"
+    if any(kw in text for kw in cfg.KW_TABLETS):
+        return True, "TAB"
+    if any(kw in text for kw in cfg.KW_PMP):
+        if any(c in text for c in cfg.PMP_CONFIRM):
+            return True, "PMP"
+
+    # Проверяем транслит
+    for translit, original in TRANSLIT_MAP.items():
+        if translit in text:
+            # Определяем категорию по оригиналу
+            if original in ["вакцин", "вакцину"]:
+                return True, "VAC"
+            elif original in ["таблетк", "таблет"]:
+                return True, "TAB"
+            elif original in ["пмп"]:
+                # Проверяем подтверждение для ПМП
+                pmp_confirms = ["выдал", "получил", "взял", "vydal", "poluchil", "b3an"]
+                if any(c in text for c in pmp_confirms):
+                    return True, "PMP"
+            elif original in ["лекарств", "препарат", "медикамент", "аптечк"]:
+                return True, "TAB"  # Лекарства = таблетки
+
+    return False, ""
+
+
+OCR_FULL_FRAME_MODES = ("never", "fallback", "always")
+
+_FULL_FRAME_KW = (
+    (("лекарств", "препарат", "nekapctb", "npenapat", "lekarst", "preparat"), "TAB", "лекарство/препарат"),
+    (("вакцин", "vakc", "bakuih", "прививк"), "VAC", "вакцина"),
+    (("реаним", "reanim", "resuscitat", "спасен", "спасён"), "PMP", "реанимация"),
+    (("вылечил", "вылечен", "лечил", "лечен", "вылеч"), "TAB", "вылечил"),
+    (("таблетк", "таблет", "tabletk", "tablet"), "TAB", "таблетки"),
+)
+
+
+def _full_frame_trigger(ctx, lg):
+    """OCR всего кадра и поиск ключевых слов. (True, кат, [текст]) или None."""
+    lg(f"  [кадр] OCR всего изображения {ctx.w}x{ctx.h}")
+    try:
+        t_full, _ = _ocr.read(ctx.img, mc=0.05, mh=3, ml=2)
+    except Exception as e:
+        lg(f"  [кадр] Ошибка OCR: {e}");
+        return None
+    lg(f"  [кадр] OCR результат: '{t_full[:200] if t_full else 'ПУСТО'}'")
+    if not t_full: return None
+    t_lower = t_full.lower()
+    for kws, cat, nm in _FULL_FRAME_KW:
+        if any(kw in t_lower for kw in kws):
+            lg(f"  [кадр] ✓ Найдено: {nm} → {cat}")
+            return True, cat, [t_full]
+    return None
+
+
+def find_trigger(ctx, diag=None, trigger_db=None):
+    def lg(m):
+        if diag: diag.append(m)
+        print(m)
+
+    cfg = ctx.cfg
+
+    if cfg.OCR_FULL_FRAME == "always":
+        hit = _full_frame_trigger(ctx, lg)
+        if hit: return hit
+
+    all_texts = []
+    seen_texts = set()
+    trigger_found = False
+    trigger_cat = ""
+    MAX_OCR_ROIS = 3
+
+    scan_rois = list(cfg.CHAT_SCAN_ROIS)
+    chat_roi = ctx.detect_chat_area(diag)
+    if chat_roi:
+        scan_rois.insert(0, chat_roi)
+
+    lg(f"  [триг] Размер изображения: {ctx.w}x{ctx.h}")
+    lg(f"  [триг] Масштаб: sx={ctx.sx:.2f} sy={ctx.sy:.2f}")
+    lg(f"  [триг] Проверяю {len(scan_rois)} областей")
+
+    def check(rd, tag, allow=None):
+        """Новый текст в общий список и проверка на триггер: категория или "".
+        allow — категории, которые этот текст может дать (политика цвета строки)."""
+        cat = _check(rd, tag)
+        if cat and allow is not None and cat not in allow:
+            lg(f"  [триг] {tag}: {cat} не из этого цвета — пропуск")
+            all_texts.pop()
+            return ""
+        return cat
+
+    def _check(rd, tag):
+        t, conf = rd
+        if not t or len(t) < 3:
+            return ""
+        t_clean = re.sub(r'\s+', ' ', t.lower().strip())
+        if t_clean in seen_texts:
+            return ""
+        seen_texts.add(t_clean)
+        all_texts.append(t_clean)
+
+        lg(f"  [триг] {tag} conf={conf:.2f}: '{t_clean[:60]}'")
+
+        found, cat = _check_trigger_with_translit(t_clean, cfg)
+        if found:
+            lg(f"  [триг] ✓ найден через транслит: {cat}")
+            return cat
+        found, cat = _check_trigger_exact(t_clean, cfg)
+        if found:
+            return cat
+        found_f, cat_f = _check_trigger_fuzzy(t_clean, cfg)
+        return cat_f if found_f else ""
+
+    rois_with_ocr = 0
+    for i, (rx, ry, rw, rh) in enumerate(scan_rois):
+        if trigger_found or rois_with_ocr >= MAX_OCR_ROIS:
+            break
+
+        roi = ctx.crop(rx, ry, rw, rh)
+        if roi is None:
+            continue
+
+        lg(f"  [триг] roi{i} ({rx},{ry},{rw},{rh}) размер={roi.shape}")
+
+        gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        if float(np.std(gray_roi)) < 8:
+            continue
+        if not _ocr.has_text_region(gray_roi, 1):
+            continue
+
+        rois_with_ocr += 1
+        lg(f"  [триг] roi{i} - запускаю OCR...")
+
+        # Строки чата — сразу в распознавание, и только нужных цветов (CHAT_LINE_POLICY).
+        # "only": если область разрезалась на строки, детектор по ней уже не нужен
+        if cfg.OCR_CHAT_LINES in ("first", "only"):
+            lines = _chat_lines(roi, cfg, ctx.sy)
+            pol = cfg.CHAT_LINE_POLICY
+            keep = [(c, col) for c, col in lines or () if pol.get(col)]
+            res = _ocr.rec_lines([c for c, _ in keep], mc=0.10, ml=2) if keep else None
+            if lines and not keep:
+                # Ни одной строки нужного цвета — возможно, цвет определился неверно
+                # (диапазоны HSV пересекаются): область читает детектор
+                lg(f"  [триг] roi{i}: строк чата {len(lines)}, нужных цветов нет — детектор")
+            elif res is not None:
+                lg(f"  [триг] roi{i}: строк чата {len(lines)}, читаю {len(keep)} "
+                   f"({', '.join(col for _, col in keep)})")
+                for (_, col), rd in zip(keep, res):
+                    cat = check(rd, f"roi{i}/{col}", pol[col])
+                    if cat:
+                        trigger_found = True
+                        trigger_cat = cat
+                        break
+                if trigger_found or cfg.OCR_CHAT_LINES == "only": continue
+
+        h, w = roi.shape[:2]
+        if w > 600:
+            scale = 600 / w
+            roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        for vi, var in enumerate(_generate_ocr_variants_fast(roi, cfg)):
+            if trigger_found or vi >= 2:
+                break
+
+            cat = check(_ocr.read(var, mc=0.10, mh=3, ml=2), f"roi{i}/v{vi}")
+            if cat:
+                trigger_found = True
+                trigger_cat = cat
+                break
+
+    if not all_texts:
+        if trigger_db:
+            db_cat, db_conf, db_words = predict_cat_from_db(trigger_db, [])
+            if db_cat and db_conf >= 0.6:
+                lg(f"  [триг_бд] пусто но БД: {db_cat} ({db_conf:.2f})")
+        return False, "", all_texts
+
+    comb = " ".join(all_texts)
+    if any(r in comb for r in cfg.KW_REJECT):
+        return False, "", all_texts
+    if trigger_found:
+        return True, trigger_cat, all_texts
+
+    found_tr, cat_tr = _check_trigger_with_translit(comb, cfg)
+    if found_tr:
+        return True, cat_tr, all_texts
+
+    found2, cat2 = _check_trigger_exact(comb, cfg)
+    if found2:
+        return True, cat2, all_texts
+    found3, cat3 = _check_trigger_fuzzy(comb, cfg)
+    if found3:
+        return True, cat3, all_texts
+
+    if trigger_db and all_texts:
+        db_cat, db_conf, db_words = predict_cat_from_db(trigger_db, all_texts)
+        if db_cat and db_conf >= 0.5:
+            lg(f"  [триг_бд] {db_cat} conf={db_conf:.2f}")
+            return True, db_cat, all_texts
+
+    if any(r in comb for r in cfg.KW_REFUSE):
+        return False, "", all_texts
+
+    # Текст в чате есть, а триггера нет — возможно, строка за пределами областей
+    if cfg.OCR_FULL_FRAME == "fallback":
+        hit = _full_frame_trigger(ctx, lg)
+        if hit: return True, hit[1], all_texts + hit[2]
+
+    return False, "", all_texts
+
+# ═══════════════════════════════════════════
+#  ИЗВЛЕЧЕНИЕ ПРИЗНАКОВ
+# ═══════════════════════════════════════════
+def extract_features(ctx, diag=None) -> dict:
+    def lg(m):
+        if diag: diag.append(m)
+
+    cfg = ctx.cfg
+
+    fl = ctx.crop_hsv_small(*cfg.FLOOR)
+    wl = ctx.crop_hsv_small(*cfg.WALL_L)
+    wr_h = ctx.crop_hsv_small(*cfg.WALL_R)
+    ct = ctx.crop_hsv_small(*cfg.CEILING)
+    hz = ctx.crop_hsv_small(*cfg.HORIZON)
+    mm = ctx.crop_hsv_small(*cfg.MINIMAP)
+    fl_c = ctx.crop_hsv_small(*cfg.FLOOR_CENTER)
+    wc = ctx.crop_hsv_small(*cfg.WALL_CENTER)
+    bed = ctx.crop_hsv_small(*cfg.BED_AREA)
+
+    upper_l = ctx.crop_hsv_small(30, 50, 300, 300)
+    upper_r = ctx.crop_hsv_small(1590, 50, 300, 300)
+    lower_l = ctx.crop_hsv_small(30, 650, 300, 300)
+    lower_r = ctx.crop_hsv_small(1590, 650, 300, 300)
+    center = ctx.crop_hsv_small(600, 300, 720, 480)
+
+    def rs(z, lo, hi):
+        if z is None or z.size == 0: return 0.
+        m = cv2.inRange(z, np.array(lo, _U8), np.array(hi, _U8))
+        t = z.shape[0] * z.shape[1]
+        return cv2.countNonZero(m) / t if t else 0.
+
+    def rs_multi(zones, lo, hi):
+        vals = [rs(z, lo, hi) for z in zones if z is not None]
+        return sum(vals) / len(vals) if vals else 0.
+
+    def mean_hsv(z):
+        if z is None or z.size == 0: return 0., 0., 0.
+        return float(z[:, :, 0].mean()), float(z[:, :, 1].mean()), float(z[:, :, 2].mean())
+
+    def std_hsv(z):
+        if z is None or z.size == 0: return 0., 0., 0.
+        return float(z[:, :, 0].std()), float(z[:, :, 1].std()), float(z[:, :, 2].std())
+
+    elsh_floor = rs_multi([fl, fl_c], cfg.ELSH_FLOOR_LO, cfg.ELSH_FLOOR_HI)
+    elsh_wall_or = rs_multi([wl, wr_h, wc], cfg.ELSH_WALL_ORANGE_LO, cfg.ELSH_WALL_ORANGE_HI)
+    elsh_beds = rs(bed, cfg.ELSH_BED_LO, cfg.ELSH_BED_HI) if bed is not None else 0.
+    elsh_clothes = rs(bed, cfg.ELSH_CLOTHES_LO, cfg.ELSH_CLOTHES_HI) if bed is not None else 0.
+    elsh_lamp = rs(ct, *cfg.ELSH_LAMP)
+
+    paleto_floor = rs_multi([fl, fl_c], cfg.PALETO_FLOOR_LO, cfg.PALETO_FLOOR_HI)
+    paleto_wall_gray = rs_multi([wl, wr_h, wc], cfg.PALETO_WALL_GRAY_LO, cfg.PALETO_WALL_GRAY_HI)
+    paleto_wall_dark = rs_multi([wl, wr_h, wc], cfg.PALETO_WALL_DARK_LO, cfg.PALETO_WALL_DARK_HI)
+    paleto_wall_blue = rs_multi([wl, wr_h, wc], cfg.PALETO_WALL_BLUE_LO, cfg.PALETO_WALL_BLUE_HI)
+    paleto_sky = rs(hz, *cfg.PALETO_SKY)
+
+    sandy_floor = rs_multi([fl, fl_c], cfg.SANDY_FLOOR_LO, cfg.SANDY_FLOOR_HI)
+    sandy_wall = rs_multi([wl, wr_h, wc], cfg.SANDY_WALL_LO, cfg.SANDY_WALL_HI)
+    sandy_floor_br = rs_multi([fl, fl_c], cfg.SANDY_FLOOR_BROWN_LO, cfg.SANDY_FLOOR_BROWN_HI)
+    sandy_door = rs_multi([wl, wr_h], cfg.SANDY_DOOR_LO, cfg.SANDY_DOOR_HI)
+    sandy_mm = rs(mm, *cfg.SANDY_MAP)
+
+    fh, fs, fv = mean_hsv(fl)
+    wlh, wls, wlv = mean_hsv(wl)
+    wrh, wrs, wrv = mean_hsv(wr_h)
+    cth, cts, ctv = mean_hsv(ct)
+    ceh, ces, cev = mean_hsv(center)
+    mmh, mms, mmv = mean_hsv(mm)
+    fsh, fss, fsv = std_hsv(fl)
+    wsh, wss, wsv = std_hsv(wl)
+    ul_h, ul_s, ul_v = mean_hsv(upper_l)
+    ur_h, ur_s, ur_v = mean_hsv(upper_r)
+    ll_h, ll_s, ll_v = mean_hsv(lower_l)
+    lr_h, lr_s, lr_v = mean_hsv(lower_r)
+
+    feats = {
+        "elsh_floor": round(elsh_floor, 6), "elsh_wall_or": round(elsh_wall_or, 6),
+        "elsh_beds": round(elsh_beds, 6), "elsh_clothes": round(elsh_clothes, 6),
+        "elsh_lamp": round(elsh_lamp, 6),
+        "paleto_floor": round(paleto_floor, 6), "paleto_wall_gray": round(paleto_wall_gray, 6),
+        "paleto_wall_dark": round(paleto_wall_dark, 6), "paleto_wall_blue": round(paleto_wall_blue, 6),
+        "paleto_sky": round(paleto_sky, 6),
+        "sandy_floor": round(sandy_floor, 6), "sandy_wall": round(sandy_wall, 6),
+        "sandy_floor_br": round(sandy_floor_br, 6), "sandy_door": round(sandy_door, 6),
+        "sandy_mm": round(sandy_mm, 6),
+        "floor_h": round(fh, 2), "floor_s": round(fs, 2), "floor_v": round(fv, 2),
+        "wall_l_h": round(wlh, 2), "wall_l_s": round(wls, 2), "wall_l_v": round(wlv, 2),
+        "wall_r_h": round(wrh, 2), "wall_r_s": round(wrs, 2), "wall_r_v": round(wrv, 2),
+        "ceiling_h": round(cth, 2), "ceiling_s": round(cts, 2), "ceiling_v": round(ctv, 2),
+        "center_h": round(ceh, 2), "center_s": round(ces, 2), "center_v": round(cev, 2),
+        "minimap_h": round(mmh, 2), "minimap_s": round(mms, 2), "minimap_v": round(mmv, 2),
+        "floor_std_h": round(fsh, 2), "floor_std_s": round(fss, 2), "floor_std_v": round(fsv, 2),
+        "wall_std_h": round(wsh, 2), "wall_std_s": round(wss, 2), "wall_std_v": round(wsv, 2),
+        "corner_ul_h": round(ul_h, 2), "corner_ul_s": round(ul_s, 2), "corner_ul_v": round(ul_v, 2),
+        "corner_ur_h": round(ur_h, 2), "corner_ur_s": round(ur_s, 2), "corner_ur_v": round(ur_v, 2),
+        "corner_ll_h": round(ll_h, 2), "corner_ll_s": round(ll_s, 2), "corner_ll_v": round(ll_v, 2),
+        "corner_lr_h": round(lr_h, 2), "corner_lr_s": round(lr_s, 2), "corner_lr_v": round(lr_v, 2),
+        "img_w": ctx.w, "img_h": ctx.h,
+    }
+
+    lg(f"  [признаки] ELSH: пол={elsh_floor:.4f} ст_ор={elsh_wall_or:.4f} кров={elsh_beds:.4f} "
+       f"одеж={elsh_clothes:.4f} ламп={elsh_lamp:.4f}")
+    lg(f"  [признаки] PALETO: пол={paleto_floor:.4f} ст_тём={paleto_wall_dark:.4f} "
+       f"ст_син={paleto_wall_blue:.4f} небо={paleto_sky:.4f}")
+    lg(f"  [признаки] SANDY: пол={sandy_floor:.4f} ст={sandy_wall:.4f} "
+       f"дверь={sandy_door:.4f} карта={sandy_mm:.4f}")
+    return feats
+
+
+# ═══════════════════════════════════════════
+#  КЛАССИЧЕСКИЙ ЦВЕТОВОЙ АНАЛИЗ
+#  (обновлён по реальным данным ELSH/Paleto/Sandy)
+# ═══════════════════════════════════════════
+@dataclass
+class CR:
+    elsh: float = 0.;
+    sandy: float = 0.;
+    paleto: float = 0.
+    winner: str = "Unsorted";
+    conf: float = 0.
+    d: Dict[str, float] = field(default_factory=dict)
+
+
+def color_analyze_classic(ctx, features: dict, diag=None) -> CR:
+    """
+    Правила по реальным данным:
+
+    ELSH:
+      - elsh_beds=0.0004–0.54, elsh_clothes=0.001–0.078
+      - elsh_lamp=0–0.238 (сильный сигнал)
+      - floor_h=40–105, floor_v>90
+      - paleto_wall_dark/blue могут быть высокими — это АРТЕФАКТ у ELSH!
+      - ГЛАВНЫЙ признак: elsh_beds или elsh_lamp высокие
+
+    PALETO:
+      - paleto_floor=0.19–0.72 (ГЛАВНЫЙ)
+      - paleto_wall_dark=0.20–0.36 (ГЛАВНЫЙ)
+      - floor_v=70–110 (тёмный пол)
+      - elsh_beds < 0.01 (отличие от ELSH)
+
+    SANDY:
+      - sandy_floor=0.45–0.76 (ГЛАВНЫЙ)
+      - sandy_door=0.15–0.33 (уникальный)
+      - floor_h=18–48, floor_s>60
+    """
+
+    def lg(m):
+        if diag: diag.append(m)
+
+    cfg = ctx.cfg;
+    r = CR()
+    ef = features
+
+    elsh_floor = ef["elsh_floor"]
+    elsh_wall_or = ef["elsh_wall_or"]
+    elsh_beds = ef["elsh_beds"]
+    elsh_clothes = ef["elsh_clothes"]
+    lamp = ef["elsh_lamp"]
+
+    paleto_floor = ef["paleto_floor"]
+    paleto_wall_dark = ef["paleto_wall_dark"]
+    paleto_wall_blue = ef["paleto_wall_blue"]
+    psky = ef["paleto_sky"]
+
+    sandy_floor = ef["sandy_floor"]
+    sandy_wall = ef["sandy_wall"]
+    sandy_floor_br = ef["sandy_floor_br"]
+    sandy_door = ef["sandy_door"]
+    smm = ef["sandy_mm"]
+
+    floor_h = ef.get("floor_h", 0)
+    floor_s = ef.get("floor_s", 0)
+    floor_v = ef.get("floor_v", 0)
+    center_s = ef.get("center_s", 0)
+    wall_l_s = ef.get("wall_l_s", 0)
+
+    e_score = 0.
+    s_score = 0.
+    p_score = 0.
+
+    # ════════════════════════════════════════
+    #  ШАГ 1: Вычисляем "сырые" ELSH очки
+    #  (до применения подавления)
+    # ════════════════════════════════════════
+    elsh_raw = 0.
+
+    # Кровати — самый надёжный признак ELSH
+    # Видели: 0.0004–0.54 у ELSH, <0.07 у Paleto/Sandy
+    if elsh_beds >= 0.002:
+        elsh_raw += elsh_beds * 8.0
+        lg(f"  [E] кровати={elsh_beds:.4f} +{elsh_beds * 8:.4f}")
+
+    # Лампа — редкий но очень сильный
+    # Видели: 0.070576 у ELSH, ~0 у Paleto/Sandy
+    if lamp >= 0.005:
+        elsh_raw += lamp * 10.0 + 0.3
+        lg(f"  [E] лампа={lamp:.4f} +{lamp * 10 + 0.3:.4f}")
+
+    # Одежда
+    if elsh_clothes >= 0.001:
+        elsh_raw += elsh_clothes * 6.0
+        lg(f"  [E] одежда={elsh_clothes:.4f} +{elsh_clothes * 6:.4f}")
+
+    # Пол ELSH
+    if elsh_floor >= 0.001:
+        elsh_raw += elsh_floor * 3.0
+
+    # Оранжевые стены — только если нет Sandy пола
+    if elsh_wall_or >= 0.05 and sandy_floor < 0.20:
+        elsh_raw += elsh_wall_or * 3.0
+        if elsh_wall_or >= 0.10:
+            elsh_raw += 0.2
+
+    # HSV пол: ELSH зелёный H=40–105, V>90
+    if 40 <= floor_h <= 110 and floor_v >= 90:
+        elsh_raw += 0.06
+
+    # Насыщенность центра
+    if center_s >= 30:
+        elsh_raw += center_s / 1000.0
+
+    # ════════════════════════════════════════
+    #  ШАГ 2: Вычисляем "сырые" PALETO очки
+    # ════════════════════════════════════════
+    paleto_raw = 0.
+
+    if paleto_floor >= 0.04:
+        paleto_raw += paleto_floor * 10.0
+        lg(f"  [P] пол={paleto_floor:.4f} +{paleto_floor * 10:.4f}")
+
+    if paleto_wall_dark >= 0.03 and paleto_floor >= 0.03:
+        paleto_raw += paleto_wall_dark * 9.0
+        lg(f"  [P] ст_тём={paleto_wall_dark:.4f} +{paleto_wall_dark * 9:.4f}")
+
+    if paleto_wall_blue >= 0.02 and paleto_floor >= 0.03:
+        paleto_raw += paleto_wall_blue * 4.0
+        lg(f"  [P] ст_синий={paleto_wall_blue:.4f} +{paleto_wall_blue * 4:.4f}")
+
+    if 55 <= floor_h <= 110 and floor_v <= 115 and paleto_floor >= 0.03:
+        paleto_raw += 0.15
+        lg(f"  [P] HSV пол тёмный H={floor_h:.0f} V={floor_v:.0f} +0.15")
+
+    # ════════════════════════════════════════
+    #  ШАГ 3: Вычисляем "сырые" SANDY очки
+    # ════════════════════════════════════════
+    sandy_raw = 0.
+
+    if sandy_floor >= 0.03:
+        sandy_raw += sandy_floor * 10.0
+        lg(f"  [S] пол={sandy_floor:.4f} +{sandy_floor * 10:.4f}")
+
+    if sandy_door >= 0.01:
+        sandy_raw += sandy_door * 12.0
+        lg(f"  [S] дверь={sandy_door:.4f} +{sandy_door * 12:.4f}")
+
+    if floor_s >= 45:
+        sandy_raw += 0.30
+        lg(f"  [S] высокая насыщенность пола S={floor_s:.0f} +0.30")
+
+    if 18 <= floor_h <= 48 and floor_s >= 45:
+        sandy_raw += 0.20
+        lg(f"  [S] HSV пол тёплый H={floor_h:.0f} S={floor_s:.0f} +0.20")
+
+    if sandy_floor_br >= 0.015:
+        sandy_raw += sandy_floor_br * 3.0
+
+    if smm >= cfg.THR_SANDY_MAP:
+        sandy_raw += smm * cfg.W_MM
+
+    # sandy_wall — только если нет Paleto/ELSH кроватей
+    if sandy_wall >= cfg.THR_SANDY_WALL_BEIGE and paleto_floor < 0.05 and elsh_beds < 0.002:
+        sandy_raw += sandy_wall * 0.5
+
+    # ════════════════════════════════════════
+    #  ШАГ 4: Применяем логику приоритетов
+    # ════════════════════════════════════════
+
+    # КЛЮЧЕВОЕ ПРАВИЛО:
+    # Если elsh_beds высокий (>0.01) — это ТОЧНО ELSH, игнорируем Paleto/Sandy
+    # Видели: ELSH с elsh_beds=0.54 определялось как Paleto — это баг!
+    ELSH_BEDS_STRONG = 0.100  # порог "сильного" сигнала кроватей
+    ELSH_LAMP_STRONG = 0.050  # порог "сильного" сигнала лампы
+
+    is_elsh_strong = (
+            (elsh_beds >= ELSH_BEDS_STRONG or lamp >= ELSH_LAMP_STRONG)
+            and sandy_floor < 0.03
+            and sandy_door < 0.01
+    )
+
+    if is_elsh_strong:
+        # ELSH доминирует — подавляем Paleto и Sandy
+        e_score = elsh_raw
+        p_score = paleto_raw * 0.05  # почти обнуляем Paleto
+        s_score = sandy_raw * 0.05  # почти обнуляем Sandy
+        lg(f"  [логика] ELSH доминирует (beds={elsh_beds:.4f} lamp={lamp:.4f})")
+    else:
+        # Обычная логика — Paleto и Sandy могут выиграть
+        e_score = elsh_raw
+
+        if paleto_floor >= 0.04:
+            e_score = elsh_raw * 0.1
+            lg(f"  [логика] Paleto подавляет ELSH (pFloor={paleto_floor:.4f})")
+
+        if sandy_floor >= 0.03:
+            e_score = elsh_raw * 0.2
+            lg(f"  [логика] Sandy подавляет ELSH (sFloor={sandy_floor:.4f})")
+
+        p_score = paleto_raw
+        s_score = sandy_raw
+
+    # Минимум для ELSH если хоть что-то нашли
+    if e_score > 0 and e_score < 0.02:
+        e_score = 0.02
+
+    r.elsh = min(e_score, 1.0)
+    r.sandy = max(s_score, 0.0)
+    r.paleto = max(p_score, 0.0)
+    r.d = dict(features)
+
+    lg(f"  [скоры] E={r.elsh:.4f} S={r.sandy:.4f} P={r.paleto:.4f}")
+
+    sc2 = {cfg.F_ELSH: r.elsh, cfg.F_SANDY: r.sandy, cfg.F_PALETO: r.paleto}
+    b_key = max(sc2, key=sc2.get)
+    bv = sc2[b_key]
+    vs = sorted(sc2.values(), reverse=True)
+    s2v = vs[1] if len(vs) > 1 else 0
+
+    if bv >= 0.003:
+        r.winner = b_key
+        r.conf = bv - s2v
+    else:
+        r.winner = cfg.F_UNK
+        r.conf = 0
+
+    lg(f"  [классика] → {r.winner} (уверенность={r.conf:.4f})")
+    return r
+
+
+# ═══════════════════════════════════════════
+#  КЛАССЫ РЕЗУЛЬТАТОВ
+# ═══════════════════════════════════════════
+class Cat(str, Enum):
+    TAB = "Таблетки";
+    VAC = "Вакцины";
+    PMP = "ПМП";
+    UNK = "Неизвестно"
+
+
+class Hosp(str, Enum):
+    ELSH = "ELSH";
+    SANDY = "Sandy Shores";
+    PALETO = "Paleto Bay";
+    UNK = "Неизвестно"
+
+
+@dataclass
+class Result:
+    fp: Path;
+    cat: Cat = Cat.UNK;
+    hosp: Hosp = Hosp.UNK;
+    night: bool = False
+    conf: float = 0.;
+    method: str = "";
+    err: Optional[str] = None;
+    ok: bool = False
+    bodycam: bool = False;
+    bodycam_ratio: float = 0.;
+    bc_inherited: bool = False
+    ts: Optional[float] = None
+    dt: float = 0.
+    fh: str = ""  # хеш содержимого файла (_fhb)
+    shard: str = ""  # Config.OUT_SHARD: деление папки по дате съёмки
+    diag: List[str] = field(default_factory=list)
+    color_detail: Dict[str, float] = field(default_factory=dict)
+    ocr_texts: List[str] = field(default_factory=list)
+    features: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def folder(s):
+        """Папка в выходе: категория и, если включено деление, подпапка даты («Таблетки - ELSH/2024-W03»)."""
+        sub = _shard(s.ts, s.shard)
+        return f"{s.base_folder}/{sub}" if sub else s.base_folder
+
+    @property
+    def base_folder(s):
+        if s.cat == Cat.PMP:
+            # ПМП — определяем город/пригород
+            if s.hosp == Hosp.ELSH:
+                district = "Город"
+            elif s.hosp in (Hosp.SANDY, Hosp.PALETO):
+                district = "Пригород"
+            else:
+                district = "Неизвестно"
+            base = f"ПМП - {district}"
+            return base + (" [НОЧЬ]" if s.night else "")
+
+        cat_names = {Cat.TAB: "Таблетки", Cat.VAC: "Вакцины"}
+        cn = cat_names.get(s.cat, "Неизвестно")
+        if s.hosp != Hosp.UNK:
+            b = f"{cn} - {s.hosp.value}"
+        else:
+            b = cn
+        return b + (" [НОЧЬ]" if s.night else "")
+
+
+# ═══════════════════════════════════════════
+#  КОНВЕЙЕР
+# ═══════════════════════════════════════════
+@dataclass
+class Job:
+    fp: Path
+    r: Result
+    seq: int = 0
+    fv: Optional[str] = None
+    ctx: Optional[ImageContext] = None
+    ts: Optional[float] = None
+    diag: Optional[List[str]] = None
+    hit: bool = False
+    inherit: bool = False
+    park: bool = False  # проход по папке: без боди-кам — в отложенные, решит bc_join
+    exc: Optional[BaseException] = None
+    dt: float = 0.
+
+
+class Pipeline:
+    """
+    Конвейер из стадий с ограниченными очередями.
+    Стадия — (имя, fn(job) -> bool, потоков): True передаёт задание дальше,
+    False — результат готов. Полная очередь тормозит предыдущую стадию.
+    """
+
+    def __init__(s, stages, qsize=None):
+        s._st = stages
+        s._qs = [queue.Queue(qsize or max(2, n * 2)) for _, _, n in stages]
+        s._out = queue.Queue()
+        s._closed = threading.Event()
+        for i, (nm, _, n) in enumerate(stages):
+            for k in range(n):
+                threading.Thread(target=s._work, args=(i,), name=f"pl-{nm}-{k}", daemon=True).start()
+
+    def _put(s, q, j):
+        while not s._closed.is_set():
+            try:
+                q.put(j, timeout=.2);
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _work(s, i):
+        fn = s._st[i][1];
+        q = s._qs[i]
+        nxt = s._qs[i + 1] if i + 1 < len(s._qs) else s._out
+        while not s._closed.is_set():
+            try:
+                j = q.get(timeout=.2)
+            except queue.Empty:
+                continue
+            t0 = time.perf_counter()
+            try:
+                go = fn(j)
+            except Exception as e:
+                j.exc = e;
+                go = False
+            j.dt += time.perf_counter() - t0
+            if not go or nxt is s._out:
+                j.ctx = None  # картинка больше не нужна — не держим её в буфере порядка
+                s._put(s._out, j)
+            else:
+                s._put(nxt, j)
+
+    def run(s, jobs, stop=None):
+        """
+        Подаёт задания в первую стадию и отдаёт готовые строго по порядку подачи.
+        Ошибка источника заданий (jobs читается в потоке подачи) поднимается отсюда,
+        после того как отданы все задания, поданные до неё.
+        """
+        fed = [0];
+        fdone = threading.Event()
+        ferr = []
+
+        def feed():
+            try:
+                for j in jobs:
+                    if stop is not None and stop.is_set(): break
+                    j.seq = fed[0]
+                    if not s._put(s._qs[0], j): break
+                    fed[0] += 1
+            except Exception as e:
+                ferr.append(e)
+            finally:
+                fdone.set()
+
+        threading.Thread(target=feed, name="pl-scan", daemon=True).start()
+        buf = {};
+        nx = 0
+        try:
+            while not (fdone.is_set() and nx >= fed[0]):
+                if stop is not None and stop.is_set(): return
+                try:
+                    j = s._out.get(timeout=.2)
+                except queue.Empty:
+                    continue
+                buf[j.seq] = j
+                while nx in buf:
+                    yield buf.pop(nx);
+                    nx += 1
+            if ferr: raise ferr[0]
+        finally:
+            s.close()
+
+    def depths(s):
+        return [(nm, q.qsize()) for (nm, _, _), q in zip(s._st, s._qs)]
+
+    def close(s):
+        s._closed.set()
+
+
+# ═══════════════════════════════════════════
+#  ЗАПИСЬ РЕЗУЛЬТАТОВ
+# ═══════════════════════════════════════════
+OUT_MODES = ("copy", "move", "hardlink", "reflink", "symlink")
+
+
+def _reflink(src, dst):
+    """Копия без копирования данных (copy-on-write): Btrfs/XFS — FICLONE, APFS — clonefile."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        # "xb": чужой файл с тем же именем не перезаписываем и при неудаче не удаляем
+        with open(src, "rb") as fi, open(dst, "xb") as fo:
+            ok = False
+            try:
+                fcntl.ioctl(fo.fileno(), 0x40049409, fi.fileno())  # FICLONE
+                ok = True
+            finally:
+                if not ok:
+                    try:
+                        os.unlink(dst)
+                    except OSError:
+                        pass
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(str(src)), os.fsencode(str(dst)), 0) != 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+    else:
+        raise OSError(errno.ENOTSUP, "reflink недоступен на этой системе")
+    shutil.copystat(src, dst)
+
+
+class DestIndex:
+    """
+    Занятые имена в выходных папках. Каждая папка читается одним scandir при первом
+    обращении (заодно создаётся), дальше имена выдаются из памяти: для «имя.расш»
+    помнится следующий номер _N, так что сотня одноимённых скринов не перебирает
+    _1, _2, ... на диске. reserve() сразу занимает имя — два потока не получат одно.
+    Индекс живёт один запуск: чужие файлы, появившиеся за это время, он не видит.
+    """
+
+    def __init__(s, root):
+        s.root = Path(root)
+        s._names = {}  # папка -> {normcase(имя)}
+        s._next = {}  # (папка, основа, расширение) -> следующий номер
+        s._lk = threading.Lock()
+
+    def _folder(s, folder):
+        ns = s._names.get(folder)
+        if ns is None:
+            dd = s.root / folder
+            dd.mkdir(parents=True, exist_ok=True)
+            with os.scandir(dd) as it:
+                ns = s._names[folder] = {os.path.normcase(e.name) for e in it}
+        return ns
+
+    @staticmethod
+    def _var(stem, suffix, n):
+        return f"{stem}_{n}{suffix}" if n else f"{stem}{suffix}"
+
+    def existing(s, folder, name):
+        """Уже лежащие в папке name, name_1, ... подряд, до первого свободного номера."""
+        p = Path(name);
+        out = []
+        with s._lk:
+            ns = s._folder(folder)
+            n = 0
+            while os.path.normcase(s._var(p.stem, p.suffix, n)) in ns:
+                out.append(s.root / folder / s._var(p.stem, p.suffix, n));
+                n += 1
+        return out
+
+    def reserve(s, folder, name):
+        """Свободное имя в папке (name или name_N) — сразу занятое. Возвращает полный путь."""
+        p = Path(name)
+        with s._lk:
+            ns = s._folder(folder)
+            nm = name
+            if os.path.normcase(nm) in ns:
+                k = (folder, os.path.normcase(p.stem), os.path.normcase(p.suffix))
+                n = s._next.get(k, 1)
+                while os.path.normcase(s._var(p.stem, p.suffix, n)) in ns: n += 1
+                s._next[k] = n + 1
+                nm = s._var(p.stem, p.suffix, n)
+            ns.add(os.path.normcase(nm))
+        return s.root / folder / nm
+
+    def release(s, folder, dst):
+        """Имя не пригодилось (запись не удалась) — возвращаем его."""
+        with s._lk:
+            ns = s._names.get(folder)
+            if ns is not None: ns.discard(os.path.normcase(Path(dst).name))
+
+
+class OutputWriter:
+    """
+    Фоновая запись: копирует принятые скрины в odir/<папка>, не задерживая анализ.
+    В полёте держит не больше budget байт — при медленном диске submit() ждёт.
+    Каждая папка создаётся один раз за запуск, готовые копии — через on_done(src, dst, how).
+    mode — как класть файл: copy, move (переименование в пределах тома), hardlink,
+    reflink (copy-on-write), symlink. Если способ не сработал (другой том, нет прав,
+    ФС без CoW), запуск дальше копирует; how — чем файл положен на самом деле.
+    Чужой файл, появившийся под зарезервированным именем, не перезаписывается ни одним
+    способом: запись берёт следующее свободное имя.
+    reuse=True — копия прерванного запуска (то же имя и то же содержимое) не повторяется.
+    archive=True — вместо папок архивы без сжатия (PNG и JPEG уже сжаты): каждые
+    _ZIP_FLUSH файлов папки — новый том odir/<папка>.zip, <папка>.2.zip, ... Том пишется
+    один раз и закрывается, готовые тома больше не открываются на запись. Файлы тома
+    считаются записанными (on_done) только после его закрытия: обрыв теряет лишь
+    незакрытый том, и в журнале нет копий, которых нет в архивах. dst — «том.zip!имя».
+    """
+    _ZIP_FLUSH = 64
+
+    def __init__(s, odir, on_done=None, on_error=None, budget=256 << 20, reuse=False, archive=False,
+                 mode="copy"):
+        s.odir = Path(odir)
+        s.mode = mode if mode in OUT_MODES else "copy"
+        s.fell = {}  # способ -> ошибка, после которой перешли на копирование
+        s.used = {}  # способ -> сколько файлов им положено
+        s._on_done = on_done;
+        s._on_err = on_error
+        s._reuse = reuse
+        s.archive = archive
+        s._zips = {}  # папка -> {"zf": открытый том, "names": имя -> (том, ZipInfo), "late": неподтверждённые, "k": номер тома}
+        s._budget = budget;
+        s._fly = 0
+        s._cv = threading.Condition()
+        s.names = DestIndex(s.odir)
+        s._p = ThreadPoolExecutor(1, thread_name_prefix="out")
+        s.written = 0;
+        s.failed = 0
+
+    def submit(s, src, folder, fh=None):
+        """fh — хеш содержимого src (_fhb), если уже посчитан: для reuse не читать src заново."""
+        try:
+            sz = src.stat().st_size
+        except OSError:
+            sz = 0
+        with s._cv:
+            # Один файл больше бюджета всё равно пропускаем, иначе зависнем
+            while s._fly and s._fly + sz > s._budget:
+                s._cv.wait()
+            s._fly += sz
+        s._p.submit(s._write, src, folder, sz, fh)
+
+    def _write(s, src, folder, sz, fh=None):
+        try:
+            if s.archive: s._put_zip(src, folder); return
+            dst = None
+            if s._reuse:
+                dst = next((p for p in s.names.existing(folder, src.name) if s._same(src, p, fh)), None)
+            if dst is not None:
+                how = "reuse"
+            else:
+                dst = s.names.reserve(folder, src.name)
+                while True:
+                    try:
+                        how = s._place(src, dst);
+                        break
+                    except FileExistsError:
+                        # Имя заняли снаружи после reserve: оно так и остаётся занятым, берём следующее
+                        dst = s.names.reserve(folder, src.name)
+                    except Exception:
+                        s.names.release(folder, dst);
+                        raise
+            s.used[how] = s.used.get(how, 0) + 1
+            s.written += 1
+            if s._on_done: s._on_done(src, dst, how)
+        except Exception as e:
+            s.failed += 1
+            if s._on_err: s._on_err(src, e)
+        finally:
+            with s._cv:
+                s._fly -= sz
+                s._cv.notify_all()
+
+    def _place(s, src, dst):
+        m = s.mode
+        if m != "copy" and m not in s.fell and not isinstance(src, ArchiveMember):
+            try:
+                if m == "move":
+                    # rename в POSIX молча заменяет чужой файл — занятое имя проверяем сами
+                    if os.path.lexists(dst): raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(dst))
+                    shutil.move(str(src), str(dst))
+                elif m == "hardlink":
+                    os.link(src, dst)
+                elif m == "symlink":
+                    os.symlink(os.path.abspath(src), dst)
+                else:
+                    _reflink(src, dst)
+                return m
+            except OSError as e:
+                # Нет исходника или имя заняли между reserve и записью — это не «способ не работает»
+                if e.errno in (errno.ENOENT, errno.EEXIST): raise
+                # Раз не вышло — остальные файлы сразу копируем, не пробуя заново
+                s.fell[m] = str(e)
+        s._copy(src, dst)
+        return "copy"
+
+    @staticmethod
+    def _open(src):
+        return src.open() if isinstance(src, ArchiveMember) else open(src, "rb")
+
+    @classmethod
+    def _copy(cls, src, dst):
+        # "xb": имя, занятое снаружи после reserve, не перезаписываем — _write возьмёт следующее.
+        # Из архива — тоже потоком, без промежуточной распаковки
+        with cls._open(src) as fi, open(dst, "xb") as fo:
+            ok = False
+            try:
+                shutil.copyfileobj(fi, fo, 1 << 20)
+                ok = True
+            finally:
+                if not ok:
+                    try:
+                        os.unlink(dst)
+                    except OSError:
+                        pass
+        if isinstance(src, ArchiveMember):
+            mt = src.stat().st_mtime  # время файла как в архиве
+            os.utime(dst, (mt, mt))
+        else:
+            shutil.copystat(src, dst)
+
+    @staticmethod
+    def _parts(base):
+        """Тома папки на диске: {номер: путь}; base.zip — том 1, base.N.zip — том N."""
+        out = {}
+        try:
+            with os.scandir(base.parent) as it:
+                for e in it:
+                    if not e.name.startswith(base.name + ".") or not e.name.endswith(".zip"): continue
+                    mid = e.name[len(base.name) + 1:-4]
+                    if mid == "": out[1] = Path(e.path)
+                    elif mid.isdigit(): out[int(mid)] = Path(e.path)
+        except OSError:
+            pass
+        return out
+
+    def _zip(s, folder):
+        z = s._zips.get(folder)
+        if z is None:
+            base = s.odir / folder
+            base.parent.mkdir(parents=True, exist_ok=True)
+            parts = s._parts(base)
+            names = {}
+            for k in sorted(parts):
+                try:
+                    with zipfile.ZipFile(parts[k]) as zf:
+                        for zi in zf.infolist(): names.setdefault(zi.filename, (parts[k], zi))
+                except (OSError, zipfile.BadZipFile):
+                    continue  # том оборванного запуска: его файлы не были подтверждены
+            z = s._zips[folder] = {"base": base, "zf": None, "names": names, "late": [],
+                                   "k": max(parts, default=0)}
+        return z
+
+    @staticmethod
+    def _vol(z):
+        """Текущий том на запись; новый создаётся только под первый записываемый файл."""
+        if z["zf"] is None:
+            z["k"] += 1
+            b = z["base"]
+            z["zf"] = zipfile.ZipFile(Path(f"{b}.zip" if z["k"] == 1 else f"{b}.{z['k']}.zip"), "x")
+        return z["zf"]
+
+    @classmethod
+    def _crc(cls, src):
+        c = 0
+        with cls._open(src) as fi:
+            for ch in iter(lambda: fi.read(1 << 20), b""): c = zlib.crc32(ch, c)
+        return c
+
+    def _put_zip(s, src, folder):
+        z = s._zip(folder)
+        names = z["names"]
+        st = src.stat()
+        nm = src.name;
+        n = 1;
+        hit = None
+        while nm in names:
+            zp, zi = names[nm]
+            if s._reuse and zi.file_size == st.st_size and zi.CRC == s._crc(src): hit = zp; break
+            nm = f"{src.stem}_{n}{src.suffix}";
+            n += 1
+        if hit is None:
+            dt = time.localtime(st.st_mtime)[:6]
+            zi = zipfile.ZipInfo(nm, date_time=dt if dt[0] >= 1980 else (1980, 1, 1, 0, 0, 0))
+            zi.compress_type = zipfile.ZIP_STORED
+            zf = s._vol(z)
+            with s._open(src) as fi, zf.open(zi, "w") as fo:
+                shutil.copyfileobj(fi, fo, 1 << 20)
+            hit = Path(zf.filename)
+            names[nm] = (hit, zi)
+        z["late"].append((src, f"{hit}!{nm}"))
+        if len(z["late"]) >= s._ZIP_FLUSH: s._flush(folder)
+
+    def _flush(s, folder):
+        """Закрывает текущий том папки и подтверждает его файлы; следующий файл откроет новый том."""
+        z = s._zips[folder]
+        zf, z["zf"] = z["zf"], None
+        late, z["late"] = z["late"], []
+        try:
+            if zf is not None: zf.close()
+        except Exception as e:
+            for src, _ in late:
+                s.failed += 1
+                if s._on_err: s._on_err(src, e)
+            return
+        for src, dst in late:
+            s.written += 1
+            s.used["zip"] = s.used.get("zip", 0) + 1
+            if s._on_done: s._on_done(src, dst, "zip")
+
+    @staticmethod
+    def _same(src, dst, fh=None):
+        # Та же копия — то же содержимое: размер отсекает сразу, хеш всего файла подтверждает
+        # (mtime не годится — его переносят copy2 и архивы, а файл мог оборваться на середине)
+        try:
+            if src.stat().st_size != dst.stat().st_size: return False
+            return (fh or _fh(src)) == _fh(dst)
+        except OSError:
+            return False
+
+    @property
+    def pending(s):
+        """Сколько байт ещё не записано."""
+        return s._fly
+
+    def close(s):
+        """Дожидается записи всего, что уже отправлено."""
+        s._p.shutdown(wait=True)
+        for folder in list(s._zips):
+            s._flush(folder)
+            s._zips.pop(folder)
+
+
+INDEX_FILE = ".sorter.sqlite3"
+
+
+class ResultIndex:
+    """
+    Решения сортировки в SQLite (odir/.sorter.sqlite3) — «виртуальные папки» без копий:
+    folders() — дерево с числом файлов, files(папка) — что в ней лежит. Физически
+    разложить — отдельный шаг materialize(). Запись пачками: commit раз в every решений.
+    Путь исходника — ключ: повторный запуск обновляет решение, а не дублирует его.
+    """
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            path TEXT PRIMARY KEY, folder TEXT, ok INTEGER, err TEXT,
+            cat TEXT, hosp TEXT, night INTEGER, method TEXT, conf REAL,
+            ts REAL, size INTEGER, fh TEXT, placed TEXT, t REAL);
+        CREATE INDEX IF NOT EXISTS results_folder ON results(folder);
+    """
+
+    def __init__(s, odir, every=256):
+        s.odir = Path(odir)
+        s.odir.mkdir(parents=True, exist_ok=True)
+        s._db = sqlite3.connect(str(s.odir / INDEX_FILE), check_same_thread=False)
+        s._db.execute("PRAGMA journal_mode=WAL")
+        s._db.executescript(s._SCHEMA)
+        s._every = every;
+        s._n = 0
+        s._lk = threading.Lock()
+
+    def _put(s, row):
+        # Повторная сортировка обновляет только решение: placed остаётся, иначе
+        # materialize разложил бы файл второй раз (name_1). Сменилась папка — файл снова к раскладке
+        with s._lk:
+            s._db.execute("INSERT INTO results (path, folder, ok, err, cat, hosp, night, method, conf, ts, size, fh, t) "
+                          "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?) ON CONFLICT(path) DO UPDATE SET "
+                          "folder=excluded.folder, ok=excluded.ok, err=excluded.err, cat=excluded.cat, "
+                          "hosp=excluded.hosp, night=excluded.night, method=excluded.method, "
+                          "conf=excluded.conf, ts=excluded.ts, size=excluded.size, fh=excluded.fh, t=excluded.t, "
+                          "placed=CASE WHEN results.folder IS excluded.folder THEN results.placed END",
+                          row)
+            s._n += 1
+            if s._n >= s._every: s._db.commit(); s._n = 0
+
+    def record(s, fp, r):
+        try:
+            sz = fp.stat().st_size
+        except OSError:
+            sz = None
+        s._put((str(fp), r.folder if r.ok else None, int(r.ok), r.err, r.cat.value, r.hosp.value,
+                int(r.night), r.method, r.conf, r.ts, sz, r.fh or None, time.time()))
+
+    def record_rec(s, fp, rec):
+        """Решение из журнала прерванного запуска — если полной строки в базе ещё нет."""
+        with s._lk:
+            s._db.execute("INSERT OR IGNORE INTO results (path, folder, ok, err, ts, size, t) "
+                          "VALUES (?,?,?,?,?,?,?)",
+                          (str(fp), rec.get("fd"), int(bool(rec.get("ok"))), rec.get("err"),
+                           rec.get("ts"), rec.get("sz"), time.time()))
+
+    def folders(s):
+        """{папка: файлов} по принятым скринам."""
+        with s._lk:
+            return dict(s._db.execute("SELECT folder, COUNT(*) FROM results WHERE ok=1 "
+                                      "GROUP BY folder ORDER BY folder"))
+
+    def files(s, folder=None):
+        """Исходники папки (или всех принятых): [(путь, разложен_куда или None)]."""
+        q = "SELECT path, placed FROM results WHERE ok=1" + (" AND folder=?" if folder else "") + " ORDER BY ts, path"
+        with s._lk:
+            return list(s._db.execute(q, (folder,) if folder else ()))
+
+    def materialize(s, mode="copy", folder=None, stop=None, on_done=None, on_error=None):
+        """
+        Раскладывает ещё не разложенные файлы по папкам выхода (OutputWriter, тот же mode).
+        Возвращает (разложено, ошибок). Исходники из ZIP берутся прямо из архива.
+        """
+        q = "SELECT path, folder FROM results WHERE ok=1 AND placed IS NULL" + (" AND folder=?" if folder else "")
+        with s._lk:
+            rows = list(s._db.execute(q, (folder,) if folder else ()))
+        arcs = {}
+
+        def done(src, dst, how):
+            with s._lk: s._db.execute("UPDATE results SET placed=? WHERE path=?", (str(dst), str(src)))
+            if on_done: on_done(src, dst, how)
+
+        wr = OutputWriter(s.odir, on_done=done, on_error=on_error, mode=mode)
+        try:
+            for p, fd in rows:
+                if stop is not None and stop.is_set(): break
+                src = s._src(p, arcs)
+                if src is None:
+                    wr.failed += 1
+                    if on_error: on_error(Path(p), FileNotFoundError(p))
+                    continue
+                wr.submit(src, fd)
+        finally:
+            wr.close()
+            for a in arcs.values(): a.close()
+            s.commit()
+        return wr.written, wr.failed
+
+    @staticmethod
+    def _src(p, arcs):
+        a, sep, m = p.partition("!")
+        if sep and Path(a).is_file():
+            arc = arcs.get(a)
+            if arc is None: arc = arcs[a] = ZipInput(a)
+            try:
+                return ArchiveMember(arc, arc.zf.getinfo(m))
+            except KeyError:
+                return None
+        fp = Path(p)
+        return fp if fp.is_file() else None
+
+    def commit(s):
+        with s._lk:
+            s._db.commit();
+            s._n = 0
+
+    def close(s):
+        s.commit()
+        s._db.close()
+
+
+class ContentIndex:
+    """
+    Что уже лежит в выходной папке — по содержимому: хеш → путь (таблица content
+    в той же базе odir/.sorter.sqlite3). При первом find() выход обходится scandir и
+    раскладывается по размерам (пока сравнивать не с чем — обхода нет); хеши считаются лениво — только когда на входе
+    встретился файл того же размера, и запоминаются в базе. Поэтому и выход,
+    разложенный до появления индекса, узнаётся, а уникальные файлы не читаются лишний раз.
+    """
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS content (path TEXT PRIMARY KEY, fh TEXT, size INTEGER, mt INTEGER);
+    """
+
+    def __init__(s, odir):
+        s.odir = Path(odir)
+        s.odir.mkdir(parents=True, exist_ok=True)
+        s._db = sqlite3.connect(str(s.odir / INDEX_FILE), check_same_thread=False)
+        s._db.execute("PRAGMA journal_mode=WAL")
+        s._db.executescript(s._SCHEMA)
+        s._lk = threading.Lock()
+        s._by_size = None  # размер -> [путь]; None — выход ещё не обойдён
+        s._fh = {}  # путь -> хеш (известные)
+
+    @property
+    def ready(s):
+        return s._by_size is not None
+
+    def _build(s):
+        bs = {}
+        known = {p: (h, sz, mt) for p, h, sz, mt in s._db.execute("SELECT path, fh, size, mt FROM content")}
+        gone = set(known)
+        for fp, de in scan_images(s.odir, recursive=True):
+            try:
+                st = de.stat()
+            except OSError:
+                continue
+            p = str(fp);
+            gone.discard(p)
+            bs.setdefault(st.st_size, []).append(p)
+            k = known.get(p)
+            if k is not None and k[1] == st.st_size and k[2] == st.st_mtime_ns: s._fh[p] = k[0]
+        if gone:
+            s._db.executemany("DELETE FROM content WHERE path=?", [(p,) for p in gone])
+            s._db.commit()
+        s._by_size = bs
+
+    def __len__(s):
+        return sum(len(v) for v in s._by_size.values()) if s.ready else 0
+
+    def _put(s, p, h):
+        s._fh[p] = h
+        try:
+            st = os.stat(p)
+        except OSError:
+            return
+        s._db.execute("INSERT OR REPLACE INTO content VALUES (?,?,?,?)", (p, h, st.st_size, st.st_mtime_ns))
+
+    def find(s, fp, size):
+        """Путь в выходе с тем же содержимым, что у fp, или None. Хеш fp — только при совпадении размера."""
+        with s._lk:
+            if not s.ready: s._build()
+            cands = list(s._by_size.get(size, ()))
+        if not cands: return None
+        try:
+            h = _fh(fp)
+        except OSError:
+            return None
+        for p in cands:
+            with s._lk: ph = s._fh.get(p)
+            if ph is None:
+                try:
+                    ph = _fh(p)
+                except OSError:
+                    continue
+                with s._lk: s._put(p, ph)
+            if ph == h: return p
+        return None
+
+    def add(s, dst, h, size):
+        """Файл положен в выход — его содержимое теперь известно."""
+        p = str(dst)
+        with s._lk:
+            # До обхода файл попадёт в раскладку с диска, а хеш возьмётся из базы
+            if s.ready: s._by_size.setdefault(size, []).append(p)
+            if h: s._put(p, h)
+
+    def close(s):
+        with s._lk:
+            s._db.commit()
+            s._db.close()
+
+
+# ═══════════════════════════════════════════
+#  ОБХОД ПАПКИ
+# ═══════════════════════════════════════════
+def scan_images(root, recursive=False, skip=()):
+    """
+    Потоковый обход через os.scandir: отдаёт (путь, DirEntry) картинок по мере чтения
+    каталога — работа начинается, не дожидаясь конца списка. Тип файла берётся из записи
+    каталога без stat; DirEntry.stat() кеширует результат (в Windows он и вовсе бесплатный).
+    recursive — с подпапками; skip — папки, в которые не заходим (например, выходная).
+    """
+    sk = {os.path.normcase(os.path.abspath(p)) for p in skip}
+    todo = [os.path.abspath(root)]
+    while todo:
+        d = todo.pop()
+        sub = []
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    try:
+                        if e.is_file():
+                            if os.path.splitext(e.name)[1].lower() in EXTS: yield Path(e.path), e
+                        elif recursive and e.is_dir(follow_symlinks=False) \
+                                and os.path.normcase(e.path) not in sk:
+                            sub.append(e.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Обход {d}: {e}")
+        todo.extend(sorted(sub, reverse=True))
+
+
+def is_archive(p):
+    """Вход — ZIP-архив, а не папка."""
+    p = Path(p)
+    return p.is_file() and zipfile.is_zipfile(p)
+
+
+def scan_archive(arc):
+    """Картинки архива (со всеми вложенными папками) как (ArchiveMember, None) — та же форма, что у scan_images."""
+    for zi in arc.zf.infolist():
+        if zi.is_dir() or Path(zi.filename).suffix.lower() not in EXTS: continue
+        yield ArchiveMember(arc, zi), None
+
+
+def _chunks(it, n):
+    """Порции по n из потока: (порция, последняя ли). Заглядывает вперёд на один элемент."""
+    it = iter(it)
+    ch = list(itertools.islice(it, n))
+    while ch:
+        nx = list(itertools.islice(it, 1))
+        yield ch, not nx
+        ch = nx + list(itertools.islice(it, n - 1)) if nx else []
+
+
+# ═══════════════════════════════════════════
+#  АРХИВЫ
+# ═══════════════════════════════════════════
+class ZipInput:
+    """
+    ZIP со скриншотами как входная «папка»: файлы читаются прямо из архива в память,
+    без распаковки на диск. Чтение из нескольких потоков безопасно (zipfile сам
+    разделяет файл архива под блокировкой).
+    """
+
+    def __init__(s, path):
+        s.path = Path(path)
+        s.zf = zipfile.ZipFile(s.path)
+
+    def close(s):
+        s.zf.close()
+
+
+class ArchiveMember:
+    """
+    Файл внутри архива там, где движок ждёт Path: имя, stat(), чтение.
+    str() — «архив.zip!путь/внутри», по нему его узнают журнал и манифест.
+    """
+    __slots__ = ("arc", "info", "name", "stem", "suffix", "_k")
+
+    def __init__(s, arc, info):
+        s.arc = arc;
+        s.info = info
+        p = Path(info.filename)
+        s.name = p.name;
+        s.stem = p.stem;
+        s.suffix = p.suffix
+        s._k = f"{arc.path}!{info.filename}"
+
+    def __str__(s):
+        return s._k
+
+    def __repr__(s):
+        return f"ArchiveMember({s._k!r})"
+
+    def __hash__(s):
+        return hash(s._k)
+
+    def __eq__(s, o):
+        return isinstance(o, ArchiveMember) and o._k == s._k
+
+    def __lt__(s, o):
+        return str(s) < str(o)
+
+    @property
+    def parent(s):
+        return s.arc.path
+
+    def exists(s):
+        return True
+
+    def stat(s):
+        try:
+            mt = datetime.datetime(*s.info.date_time).timestamp()
+        except ValueError:
+            mt = 0.
+        t = int(mt)
+        return os.stat_result((0o100444, 0, 0, 1, 0, 0, s.info.file_size, t, t, t),
+                              {"st_atime": mt, "st_mtime": mt, "st_ctime": mt, "st_mtime_ns": int(mt * 1e9)})
+
+    def read_bytes(s):
+        return s.arc.zf.read(s.info)
+
+    def open(s):
+        return s.arc.zf.open(s.info)
+
+
+# ═══════════════════════════════════════════
+#  СЛЕЖЕНИЕ ЗА ПАПКОЙ
+# ═══════════════════════════════════════════
+_IN_CLOSE_WRITE = 0x08
+_IN_MOVED_TO = 0x80
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+def _written(fp, sz):
+    """Файл дописан до конца: у PNG в хвосте IEND, у JPEG — FFD9. Прочие — по размеру."""
+    if sz <= 0: return False
+    ext = fp.suffix.lower()
+    if ext not in (".png", ".jpg", ".jpeg"): return True
+    try:
+        with open(fp, "rb") as f:
+            f.seek(max(0, sz - 16))
+            tail = f.read(16)
+    except OSError:
+        return False
+    if ext == ".png": return b"IEND" in tail[-12:]
+    return b"\xff\xd9" in tail
+
+
+class FolderWatcher:
+    """
+    Следит за папкой и отдаёт новые скрины в on_file(fp), когда игра их дописала.
+    Linux — inotify (IN_CLOSE_WRITE | IN_MOVED_TO), иначе — опрос: раз в poll секунд,
+    пока в папке что-то происходит, и всё реже (до poll_max), пока тихо.
+    Готовность: размер не менялся между двумя проверками и в хвосте есть конец формата,
+    так что недописанный PNG не уйдёт в анализ. Что так и не дописалось к stop(), — в left.
+    """
+
+    def __init__(s, folder, on_file, poll=.25, poll_max=2.):
+        s.folder = Path(folder)
+        s._on = on_file
+        s._poll = poll
+        s._poll_max = max(poll, poll_max)
+        s.left = []  # после stop(): файлы, не дождавшиеся готовности
+        s._pend = {}  # путь -> размер на прошлой проверке
+        s._seen = set()
+        s._stop = threading.Event()
+        s._th = None
+        s.backend = ""
+
+    def start(s):
+        s._stop.clear();
+        s.left = []
+        try:
+            s._seen = {e.path for e in os.scandir(s.folder) if e.is_file()}
+        except OSError:
+            s._seen = set()
+        s._th = threading.Thread(target=s._run, name="watch", daemon=True)
+        s._th.start()
+
+    def stop(s):
+        s._stop.set()
+        if s._th is not None: s._th.join(timeout=2); s._th = None
+
+    def _run(s):
+        fd = s._inotify() if sys.platform.startswith("linux") else None
+        s.backend = "inotify" if fd is not None else "опрос"
+        dt = s._poll
+        try:
+            while not s._stop.is_set():
+                if fd is not None:
+                    s._read_events(fd)
+                else:
+                    n = len(s._seen) + len(s._pend)
+                    s._scan()
+                    # Тихо — полный scandir всё реже; новый или недописанный файл возвращает частый опрос
+                    idle = not s._pend and len(s._seen) + len(s._pend) == n
+                    dt = min(dt * 2, s._poll_max) if idle else s._poll
+                    s._stop.wait(dt)
+                s._settle()
+        finally:
+            if fd is not None: os.close(fd)
+            # Последняя проверка: дописанное уходит в on_file, остальное — в left
+            s._scan();
+            s._settle()
+            s.left = [Path(p) for p in s._pend]
+
+    def _inotify(s):
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd < 0: return None
+            if libc.inotify_add_watch(fd, os.fsencode(str(s.folder)), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+                os.close(fd);
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _read_events(s, fd):
+        import select, struct
+        r, _, _ = select.select([fd], [], [], s._poll if not s._pend else .05)
+        if not r: return
+        try:
+            buf = os.read(fd, 1 << 16)
+        except BlockingIOError:
+            return
+        i = 0
+        while i + 16 <= len(buf):
+            _, mask, _, ln = struct.unpack_from("iIII", buf, i)
+            nm = buf[i + 16:i + 16 + ln].rstrip(b"\0")
+            i += 16 + ln
+            if nm: s._new(str(s.folder / os.fsdecode(nm)), ready=bool(mask & _IN_CLOSE_WRITE))
+
+    def _scan(s):
+        try:
+            for e in os.scandir(s.folder):
+                if e.path not in s._seen and e.is_file(): s._new(e.path)
+        except OSError:
+            pass
+
+    def _new(s, path, ready=False):
+        if path in s._seen or Path(path).suffix.lower() not in EXTS: return
+        # После закрытия записи размер уже окончательный — ждать вторую проверку незачем
+        s._pend.setdefault(path, -1)
+        if ready: s._check(path, stable=True)
+
+    def _settle(s):
+        for path in list(s._pend): s._check(path)
+
+    def _check(s, path, stable=False):
+        try:
+            sz = os.stat(path).st_size
+        except OSError:
+            s._pend.pop(path, None);
+            return
+        if (stable or s._pend.get(path) == sz) and _written(Path(path), sz):
+            s._pend.pop(path, None)
+            s._seen.add(path)
+            try:
+                s._on(Path(path))
+            except Exception as e:
+                logger.error(f"Слежение: {path}: {e}")
+        else:
+            s._pend[path] = sz
+
+
+# ═══════════════════════════════════════════
+#  ПЛАНИРОВЩИК
+# ═══════════════════════════════════════════
+PLAN_CLASSES = ("вероятно", "возможно", "мусор")
+
+
+@dataclass
+class Probe:
+    fp: Path
+    size: int = 0
+    ts: Optional[float] = None
+    red: bool = True
+    txt: bool = True
+    cls: str = "возможно"
+    probed: bool = False  # миниатюра смотрелась (JPEG); нет — класс по умолчанию
+
+
+def prescan(fp, cfg, de=None):
+    """
+    Дешёвая оценка файла до OCR: метка времени и размер — из имени и одного stat.
+    Миниатюра 1/4 (quick_red_precheck и текст в зоне чата) — только у JPEG: он уменьшается
+    прямо при декодировании. Ограничение: PNG так не умеет — zlib-поток разжимается целиком,
+    а чат и метка боди-кам внизу кадра, так что проба стоила бы второго полного декода.
+    PNG не пробуется (probed=False): получает «возможно» и идёт по времени съёмки — в папке
+    из одних PNG порядок работы просто хронологический. При любой ошибке — «возможно».
+    de — DirEntry из обхода.
+    """
+    pr = Probe(fp=fp)
+    try:
+        st = de.stat() if de is not None else fp.stat()
+        pr.size = st.st_size;
+        pr.ts = _extract_ts(fp, st.st_mtime)
+        if fp.suffix.lower() not in _REDUCED_EXTS: return pr
+        buf = _rd(fp)
+        try:
+            th = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_REDUCED_COLOR_4)
+        finally:
+            _free(buf)
+    except Exception:
+        return pr
+    if th is None or th.size == 0: return pr
+    ctx = ImageContext(th, cfg)
+    pr.probed = True
+    pr.red = ctx.quick_red_precheck()
+    pr.txt = False
+    for roi in cfg.CHAT_SCAN_ROIS[:3]:
+        r = ctx.crop(*roi)
+        if r is not None and _ocr.has_text_region(cv2.cvtColor(r, cv2.COLOR_BGR2GRAY), 1):
+            pr.txt = True;
+            break
+    pr.cls = PLAN_CLASSES[0] if pr.red and pr.txt else PLAN_CLASSES[1] if pr.red or pr.txt else PLAN_CLASSES[2]
+    return pr
+
+
+class Planner:
+    """
+    Двухфазная сортировка: сначала дешёвый предпросмотр порции файлов, затем дорогая
+    работа в порядке ожидаемой пользы — вероятные попадания первыми, явный мусор в конце.
+    Классы различает только проба JPEG (см. prescan); PNG идут классом «возможно»
+    по времени съёмки. Оценка остатка — по средней цене файла каждого класса.
+    """
+
+    def __init__(s, cfg, workers=1):
+        s.cfg = cfg;
+        s.wk = max(1, workers)
+        s._cls = {};
+        s._left = {}
+        s._cost = {}  # класс -> [сумма секунд, файлов]
+        s._lk = threading.Lock()  # scan() идёт в потоке подачи, done()/eta() — в потоке итогов
+
+    def scan(s, fps, stop=None, des=None):
+        """Предпросмотр файлов параллельно. Возвращает пробы в порядке fps. des — {путь: DirEntry}."""
+        out = []
+        des = des or {}
+        with ThreadPoolExecutor(s.wk, thread_name_prefix="plan") as ex:
+            for pr in ex.map(lambda fp: None if stop is not None and stop.is_set()
+                             else prescan(fp, s.cfg, des.get(fp)), fps):
+                if pr is not None: out.append(pr)
+        for pr in out: s._add(pr.fp, pr.cls)
+        return out
+
+    def _add(s, fp, cls):
+        with s._lk:
+            s._cls[fp] = cls
+            s._left[cls] = s._left.get(cls, 0) + 1
+
+    def add(s, fps, cls):
+        """Добавляет в план файлы второго прохода."""
+        for fp in fps: s._add(fp, cls)
+
+    @staticmethod
+    def order(probes):
+        """Порядок дорогой работы: по классу, внутри класса — по времени съёмки."""
+        rk = {c: i for i, c in enumerate(PLAN_CLASSES)}
+        return sorted(probes, key=lambda p: (rk.get(p.cls, 1), p.ts if p.ts is not None else float("inf"),
+                                             p.fp.name))
+
+    def done(s, fp, dt):
+        with s._lk:
+            cls = s._cls.pop(fp, None)
+            if cls is None: return
+            s._left[cls] -= 1
+            c = s._cost.setdefault(cls, [0., 0]);
+            c[0] += dt;
+            c[1] += 1
+
+    def counts(s):
+        with s._lk: return dict(s._left)
+
+    def eta(s, el):
+        """
+        Секунд до конца. Стоимость файлов по классам переводится в настенное время
+        через уже прошедшее: el / (стоимость сделанного) — учитывает и число потоков.
+        """
+        with s._lk:
+            spent = sum(c[0] for c in s._cost.values())
+            n = sum(c[1] for c in s._cost.values())
+            if spent <= 0 or n == 0: return None
+            avg = spent / n
+            rem = sum(k * (s._cost[c][0] / s._cost[c][1] if s._cost.get(c, (0, 0))[1] else avg)
+                      for c, k in s._left.items() if k > 0)
+        return el * rem / spent
+
+
+# ═══════════════════════════════════════════
+#  АНАЛИЗАТОР
+# ═══════════════════════════════════════════
+class Analyzer:
+    def __init__(s, cfg, require_bodycam=True, location_db=None, trigger_db=None, images=None):
+        s.cfg = cfg
+        s.require_bodycam = require_bodycam
+        s.images = images if images is not None else ImageProvider()
+        s._c = LRUCache(_CACHE_MAX)
+        s._tl = BodycamTimeline()
+        s._nobc = set()  # хеши, отбракованные bodycam_probe: полного кадра для них нет
+        s._pl = None
+        s.location_db = location_db if location_db is not None else load_location_db()
+        s.trigger_db = trigger_db if trigger_db is not None else load_trigger_db()
+
+    def bind_folder(s, folder):
+        """Подключает сохранённую ленту боди-кам входной папки (читается при первом _cbc)."""
+        f = Path(folder).resolve()
+        if s._tl.folder != f: s._tl = BodycamTimeline(f)
+
+    def _rbc(s, ts):
+        s._tl.add(ts)
+
+    def _cbc(s, ts, w=GROUP_BC_WINDOW):
+        return s._tl.near(ts, w)
+
+    def bc_join(s, tss, w=GROUP_BC_WINDOW):
+        """
+        Для каждой метки времени — есть ли подтверждённая боди-кам ближе w секунд.
+        Вызывается после прохода по всем файлам, поэтому не зависит от порядка обработки;
+        учитывает и боди-кам из прошлых запусков по той же папке.
+        """
+        return s._tl.join(tss, w)
+
+    def _cached(s, fp, fv):
+        c = s._c.get(fv)
+        if c is None: return None
+        return Result(fp=fp, cat=c.cat, hosp=c.hosp, night=c.night, conf=c.conf,
+                      method=c.method + "к", ok=c.ok, err=c.err, bodycam=c.bodycam,
+                      bodycam_ratio=c.bodycam_ratio, bc_inherited=c.bc_inherited,
+                      ts=_extract_ts(fp), fh=fv, shard=s.cfg.OUT_SHARD)
+
+    def _known(s, fv):
+        return s._c.get(fv) is not None
+
+    def _probe(s, fv, th):
+        if bodycam_probe(ImageContext(th, s.cfg)): return True
+        s._nobc.add(fv)
+        return False
+
+    def _pr(s):
+        """Проба боди-кам для проходов по папке: только если боди-кам обязательна."""
+        return s._probe if s.require_bodycam and s.cfg.BC_PROBE_REDUCED else None
+
+    def run(s, fp, wd=False):
+        j = s._do(fp, wd)
+        if j.fv is not None and not j.hit: s._c.put(j.fv, j.r)
+        return j.r
+
+    @staticmethod
+    def stage_workers(wk):
+        """Потоки по стадиям конвейера: OCR получает все wk, дешёвые стадии — долю."""
+        return {"чтение": max(1, wk // 2), "боди-кам": max(1, wk // 2),
+                "ocr": max(1, wk), "локация": max(1, wk // 4)}
+
+    def run_many(s, fps, workers=1, stop=None, inherit=False):
+        """
+        Прогоняет файлы через конвейер чтение → боди-кам → OCR → локация.
+        Отдаёт (fp, результат, исключение) строго в порядке fps. fps может быть генератором:
+        он читается в потоке подачи конвейера, по мере того как освобождается место.
+        inherit=True — боди-кам уже унаследована (см. bc_join), её проверка пропускается.
+        """
+        sw = s.stage_workers(workers)
+        it = iter(fps)
+        ahead = 2 * sw["чтение"] + 4
+
+        def feed():
+            # Предзагрузка идёт впереди подачи: пока очередь чтения полна, кадры уже декодируются.
+            # fps может быть генератором (потоковый обход) — окно вперёд держим сами
+            win = deque();
+            err = None
+            try:
+                win.extend(itertools.islice(it, ahead + 1))
+            except Exception as e:
+                err = e
+            while win:
+                fp = win.popleft()
+                if err is None:
+                    try:
+                        win.extend(itertools.islice(it, ahead - len(win)))
+                    except Exception as e:
+                        err = e  # уже прочитанное окно подаём, ошибку — после него
+                s.images.prefetch(list(win), *((None, None) if inherit else (s._known, s._pr())))
+                yield s._job(fp, inherit=inherit, park=not inherit)
+            if err is not None: raise err
+
+        pl = Pipeline([("чтение", s._st_load, sw["чтение"]),
+                       ("боди-кам", s._st_bodycam, sw["боди-кам"]),
+                       ("ocr", s._st_trigger, sw["ocr"]),
+                       ("локация", s._st_location, sw["локация"])])
+        s._pl = pl
+        try:
+            for j in pl.run(feed(), stop):
+                if j.exc is None and not j.hit and j.fv is not None: s._c.put(j.fv, j.r)
+                j.r.dt = j.dt
+                yield j.fp, j.r, j.exc
+        finally:
+            s._pl = None
+
+    def depths(s):
+        """Глубина очередей текущего конвейера: [(стадия, в очереди)]."""
+        pl = s._pl
+        return pl.depths() if pl is not None else []
+
+    def _do(s, fp, dg=False, fv=None):
+        j = s._job(fp, dg, fv)
+        for st in (s._st_load, s._st_bodycam, s._st_trigger, s._st_location):
+            if not st(j): break
+        return j
+
+    def _job(s, fp, dg=False, fv=None, inherit=False, park=False):
+        r = Result(fp=fp, shard=s.cfg.OUT_SHARD)
+        return Job(fp=fp, r=r, fv=fv, diag=r.diag if dg else None, inherit=inherit, park=park)
+
+    # ── Стадии анализа: True — передать дальше, False — результат готов ──
+    def _st_load(s, j):
+        r = j.r;
+        diag = j.diag
+        if j.fv is None:
+            # Одно чтение: хеш всего файла и декод из того же буфера
+            fresh = j.inherit or diag is not None
+            j.fv, img = s.images.frame(j.fp, None if fresh else s._known, s._pr() if j.park else None)
+            c = None if fresh or j.fv is None else s._cached(j.fp, j.fv)
+            if c is not None:
+                j.r = c;
+                j.hit = True
+                return False
+            if img is None and j.fv in s._nobc:
+                # Отказ по пробе 1/2 — как «Нет боди-кам» из _st_bodycam; решит bc_join после прохода
+                s._nobc.discard(j.fv)
+                r.fh = j.fv;
+                j.ts = r.ts = _extract_ts(j.fp)
+                r.err = "Нет боди-кам"
+                return False
+            # Декод пропущен по кешу, а запись успели вытеснить — дочитываем
+            if img is None and j.fv is not None: img = _ld(j.fp)
+        else:
+            img = s.images.get(j.fp)
+        r.fh = j.fv or ""
+        if img is None: r.err = "ошибка загрузки"; return False
+        j.ctx = ImageContext(img, s.cfg)
+        if j.fv and diag is None:
+            cached_texts, cached_cat = _ocr_disk_cache.get(j.fv)
+            if cached_texts and cached_cat:
+                cat_map = {"TAB": Cat.TAB, "VAC": Cat.VAC, "PMP": Cat.PMP}
+                if cached_cat in cat_map:
+                    r.cat = cat_map[cached_cat]
+                    r.ocr_texts = cached_texts
+        j.ts = r.ts = _extract_ts(j.fp)
+        return True
+
+    def _st_bodycam(s, j):
+        r = j.r
+        if j.inherit:
+            r.bodycam = True;
+            r.bc_inherited = True;
+            r.bodycam_ratio = .001
+            return True
+        bc, bcr = check_bodycam(j.ctx, j.diag)
+        r.bodycam = bc;
+        r.bodycam_ratio = bcr
+        if bc:
+            s._rbc(j.ts)
+        elif s.require_bodycam:
+            # В проходе по папке соседей не спрашиваем: итог зависел бы от того, какой файл
+            # закончил раньше. Решит bc_join после прохода, кадр придержим для второго.
+            # Одиночный файл наследует от ленты сразу
+            if not j.park and s._cbc(j.ts):
+                r.bodycam = True;
+                r.bc_inherited = True;
+                r.bodycam_ratio = .001
+            else:
+                if j.park: s.images.keep(j.fp, j.fv, j.ctx.img)
+                r.err = "Нет боди-кам";
+                return False
+        return True
+
+    def _st_trigger(s, j):
+        r = j.r;
+        diag = j.diag
+
+        def lg(m):
+            if diag is not None: diag.append(m)
+
+        t0 = time.monotonic()
+        found, cat_code, txts = find_trigger(j.ctx, diag, trigger_db=s.trigger_db)
+        dt = time.monotonic() - t0
+        r.ocr_texts = txts
+        lg(f"  [триг] найден={found} кат='{cat_code}' ({dt * 1000:.0f}мс)")
+
+        if not found:
+            r.err = "Нет триггера"
+            if r.bc_inherited: r.bodycam = False; r.bc_inherited = False
+            return False
+
+        cat_map = {"TAB": Cat.TAB, "VAC": Cat.VAC, "PMP": Cat.PMP}
+        r.cat = cat_map.get(cat_code, Cat.TAB)
+        return True
+
+    def _st_location(s, j):
+        r = j.r;
+        ctx = j.ctx;
+        diag = j.diag
+
+        def lg(m):
+            if diag is not None: diag.append(m)
+
+        # ПРИЗНАКИ — извлекаем для ВСЕХ категорий (включая ПМП)
+        feats = extract_features(ctx, diag)
+        r.features = feats
+        r.color_detail = feats
+
+        # ЛОКАЦИЯ — определяем для ВСЕХ (ПМП нужна для город/пригород)
+        hosp, method = s._determine_location(ctx, feats, diag)
+        r.hosp = hosp
+        r.method = method
+
+        if r.cat == Cat.PMP:
+            if r.hosp == Hosp.ELSH:
+                lg("  [результат] ПМП - Город")
+            elif r.hosp in (Hosp.SANDY, Hosp.PALETO):
+                lg(f"  [результат] ПМП - Пригород ({r.hosp.value})")
+            else:
+                lg("  [результат] ПМП - район неизвестен")
+        else:
+            lg(f"  [результат] {r.cat.value} | {r.hosp.value} | {r.method}")
+
+        r.night = s._nt(ctx)
+        r.ok = True
+        return True
+
+    def _determine_location(s, ctx, feats, diag=None) -> Tuple[Hosp, str]:
+        def lg(m):
+            if diag: diag.append(m)
+
+        cfg = s.cfg
+        hm = {cfg.F_ELSH: Hosp.ELSH, cfg.F_SANDY: Hosp.SANDY, cfg.F_PALETO: Hosp.PALETO}
+
+        db_sample_count = len(s.location_db.get("samples", []))
+        db_loc_counts = {}
+        for sample in s.location_db.get("samples", []):
+            loc = sample.get("location", "")
+            db_loc_counts[loc] = db_loc_counts.get(loc, 0) + 1
+
+        has_enough_data = (
+                db_sample_count >= cfg.MIN_DB_SAMPLES and
+                len(db_loc_counts) >= 1 and
+                any(v >= 2 for v in db_loc_counts.values())
+        )
+
+        if has_enough_data:
+            pred_loc, pred_conf, pred_details = predict_location_from_db(s.location_db, feats)
+            lg(f"  [бд] предсказание: {pred_loc} (уверенность={pred_conf:.4f})")
+            if "scores" in pred_details:
+                for loc_name, sc in pred_details["scores"].items():
+                    lg(f"    {loc_name}: {sc:.4f}")
+            if pred_conf >= cfg.THR_DB_CONFIDENCE and pred_loc != "Unsorted":
+                hosp = hm.get(pred_loc, Hosp.UNK)
+                if pred_conf < 0.15:
+                    ocr_hosp = s._oh(ctx, diag)
+                    if ocr_hosp != Hosp.UNK:
+                        return ocr_hosp, "бд+ocr"
+                return hosp, f"бд(д={pred_conf:.3f})"
+
+        cr = color_analyze_classic(ctx, feats, diag)
+        if cr.winner != cfg.F_UNK and cr.conf >= cfg.THR_SKIP_OCR:
+            return hm.get(cr.winner, Hosp.UNK), "цвет"
+        elif cr.winner != cfg.F_UNK:
+            oh = s._oh(ctx, diag)
+            hosp = oh if oh != Hosp.UNK else hm.get(cr.winner, Hosp.UNK)
+            return hosp, "ocr" if oh != Hosp.UNK else "цвет_сл"
+        else:
+            oh = s._oh(ctx, diag)
+            hosp = oh if oh != Hosp.UNK else Hosp.UNK
+            return hosp, "ocr" if oh != Hosp.UNK else "неизв"
+
+    def _oh(s, ctx, d=None):
+        def lg(m):
+            if d is not None: d.append(m)
+
+        roi = ctx.crop(*s.cfg.MINIMAP)
+        if roi is None: return Hosp.UNK
+        g = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        b = cv2.resize(g, None, fx=4, fy=4, interpolation=cv2.INTER_LINEAR)
+        e = cv2.createCLAHE(3., (8, 8)).apply(b)
+        _, th = cv2.threshold(e, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        t, _ = _ocr.read(cv2.cvtColor(th, cv2.COLOR_GRAY2BGR), mc=.20, mh=6, ml=2)
+        if not t:
+            t, _ = _ocr.read(cv2.cvtColor(cv2.bitwise_not(th), cv2.COLOR_GRAY2BGR), mc=.20, mh=6, ml=2)
+        if not t: return Hosp.UNK
+        t = t.lower();
+        lg(f"  [ocr_карта] '{t[:60]}'")
+        hm = {"ELSH": Hosp.ELSH, "Sandy Shores": Hosp.SANDY, "Paleto Bay": Hosp.PALETO}
+        for n, kws in s.cfg.HOSPITALS_OCR.items():
+            for kw in kws:
+                if kw in t: return hm.get(n, Hosp.UNK)
+        return Hosp.UNK
+
+    def _nt(s, ctx):
+        roi = ctx.crop(140, 870, 170, 65)
+        if roi is None or not TESSERACT_OK: return False
+        g = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        b = cv2.resize(g, None, fx=3, fy=3, interpolation=cv2.INTER_LINEAR)
+        _, bn = cv2.threshold(b, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        for v in (bn, cv2.bitwise_not(bn)):
+            try:
+                t = pytesseract.image_to_string(
+                    v, config="--psm 7 --oem 1 -c tessedit_char_whitelist=0123456789:").strip()
+                m = re.search(r"(\d{1,2}):(\d{2})", t)
+                if m:
+                    h_val = int(m.group(1))
+                    if 0 <= h_val <= 23: return h_val >= s.cfg.NIGHT_START or h_val < s.cfg.NIGHT_END
+            except:
+                pass
+        return False
+
+    def teach(s, fp: Path, correct_location: str, log_fn=None) -> dict:
+        def lg(msg, lv="default"):
+            if log_fn: log_fn(msg, lv)
+
+        ctx = ImageContext.from_file(fp, s.cfg, s.images)
+        if ctx is None: lg("  Ошибка загрузки", "error"); return {}
+        feats = extract_features(ctx)
+        add_location_sample(s.location_db, feats, correct_location, fp.name)
+        lg(f"  Добавлен: {fp.name} → {correct_location}", "success")
+        lg(f"  Всего в БД: {len(s.location_db['samples'])}", "info")
+        return feats
+
+
+# ═══════════════════════════════════════════
+#  СОРТИРОВКА
+# ═══════════════════════════════════════════
+@dataclass
+class SortStats:
+    total: int = 0
+    done: int = 0
+    ok: int = 0
+    sk: int = 0
+    er: int = 0
+    bc: int = 0
+    dur: float = 0.
+    stopped: bool = False
+    cut: str = ""  # обход папки оборвался ошибкой — журнал сохранён для продолжения
+    dup: int = 0  # уже лежат в выходе (по содержимому)
+    hc: Dict[str, int] = field(default_factory=dict)
+    skipped: List[Path] = field(default_factory=list)
+
+
+class Sorter:
+    """
+    Сортировка inp → out без окон: манифест, журнал запуска, предпросмотр,
+    конвейер Analyzer, наследование боди-кам и фоновая запись.
+    Ход работы — через колбэки, их подключают и окно, и командная строка:
+      log(msg, tag)                    — строка лога с тегом окна ("success", "warning", ...)
+      on_file(fp, r, exc)              — итог анализа файла
+      progress(stats, total, el, eta)  — после каждого файла
+      on_copy(src, dst, how)           — файл положен в выходную папку (how — copy/move/hardlink/...)
+    """
+
+    def __init__(s, az, inp, out, workers=2, dry=False, inc=False, stop=None,
+                 log=None, on_file=None, progress=None, on_copy=None, recursive=False, zip_out=False,
+                 mode="copy", virtual=False):
+        s.az = az;
+        s.idir = Path(inp);
+        s.odir = Path(out)
+        s.wk = max(1, workers);
+        s.dry = dry;
+        s.inc = inc;
+        s.rec = recursive;
+        s.zip_out = zip_out;
+        s.mode = mode
+        s.virtual = virtual  # только база решений (ResultIndex), без записи файлов
+        s._vx = None
+        s._ci = None;
+        s._pfh = {}  # исходник -> хеш, пока файл пишется (для ContentIndex)
+        s._pfd = {}  # исходник -> категория, пока файл пишется (счётчик откатывается при сбое записи)
+        s._slk = threading.Lock()
+        s.stop = stop if stop is not None else threading.Event()
+        s._log_cb = log;
+        s._file_cb = on_file
+        s._prog_cb = progress;
+        s._copy_cb = on_copy
+        s.stats = SortStats()
+        s._jr = None;
+        s._man = None
+
+    def _log(s, m, tag="default"):
+        if s._log_cb: s._log_cb(m, tag)
+
+    def _prog(s, total, el, eta=None):
+        if s._prog_cb: s._prog_cb(s.stats, total, el, eta)
+
+    def _opts(s):
+        o = {"bc": bool(s.az.require_bodycam)}
+        if s.az.cfg.OUT_SHARD: o["sh"] = s.az.cfg.OUT_SHARD  # другая раскладка — другие папки
+        return o
+
+    def _inc(s, k, d=1):
+        """Счётчик SortStats: обход порций и итоги идут в разных потоках."""
+        with s._slk: setattr(s.stats, k, getattr(s.stats, k) + d)
+
+    def _ok(s, bf, d=1):
+        """Принятый файл в счётчики (d=-1 — откат, если запись не удалась)."""
+        st = s.stats
+        with s._slk:
+            n = st.hc.get(bf, 0) + d
+            if n > 0:
+                st.hc[bf] = n
+            else:
+                st.hc.pop(bf, None)
+            st.ok += d
+
+    def _wd(s, src, dst, how="copy"):
+        s._pfd.pop(str(src), None)
+        if s._ci is not None:
+            try:
+                s._ci.add(dst, s._pfh.pop(str(src), None), Path(dst).stat().st_size)
+            except OSError:
+                pass
+        if s._copy_cb: s._copy_cb(src, dst, how)
+        if s._jr is not None: s._jr.copied_to(src, dst)
+        if s._man is not None: s._man.copied(src)
+
+    def _writer(s, reuse=False, dedup=True):
+        """
+        Куда уходят принятые файлы: тест — никуда, виртуально — в базу решений, иначе — OutputWriter.
+        dedup=False — без индекса выхода (наблюдение: новые файлы с выходом не сверяются).
+        """
+        if s.dry: return None
+        if s.virtual:
+            s._vx = ResultIndex(s.odir)
+            s._log(f"  🗂 Виртуальная сортировка: решения в {s.odir / INDEX_FILE}", "info")
+            return None
+        if dedup and not s.zip_out:
+            # Повторный запуск по частично разобранной папке: уже лежащее в выходе не трогаем.
+            # Выход обходится при первой сверке, не при открытии
+            s._ci = ContentIndex(s.odir)
+        return OutputWriter(s.odir, on_done=s._wd, on_error=s._wf, reuse=reuse, archive=s.zip_out, mode=s.mode)
+
+    def _wsum(s, wr):
+        for m, e in wr.fell.items():
+            s._log(f"  ⚠ Вывод «{m}» недоступен ({e[:60]}) — файлы скопированы", "warning")
+        if wr.used and set(wr.used) != {"copy"}:
+            s._log("  💾 Записано: " + ", ".join(f"{m} {n}" for m, n in sorted(wr.used.items())), "info")
+
+    def _wf(s, src, e):
+        # Принят при анализе, но не записан: из ОК убираем (в ошибки — через wr.failed в конце)
+        bf = s._pfd.pop(str(src), None)
+        s._pfh.pop(str(src), None)
+        if bf is not None: s._ok(bf, -1)
+        s.stats.skipped.append(src)
+        s._log(f"  ❌ {src.name}: запись: {str(e)[:60]}", "error")
+
+    def _resumed(s, fp, wr, nb):
+        """Файл решён прерванным запуском: доделываем копию по журналу. False — анализировать заново."""
+        st = s.stats;
+        jr = s._jr
+        rec = jr.finished(fp)
+        if rec is None: return False
+        s._inc("done")
+        if s._vx is not None: s._vx.record_rec(fp, rec)
+        if rec.get("ok"):
+            fd = rec["fd"]
+            bf = fd.split("/", 1)[0]
+            s._ok(bf)
+            if wr is not None and not jr.was_copied(fp):
+                if s._man is not None: s._man.hold(fp, {k: v for k, v in rec.items() if k != "k"})
+                s._pfd[str(fp)] = bf
+                wr.submit(fp, fd)
+        elif rec.get("err") == "Нет боди-кам":
+            nb.append((fp, rec.get("ts")))
+        else:
+            s._inc("sk");
+            st.skipped.append(fp)
+        return True
+
+    def _dup(s, fp, de):
+        try:
+            sz = (de.stat() if de is not None else fp.stat()).st_size
+        except OSError:
+            return False
+        t = None if s._ci.ready else time.monotonic()
+        p = s._ci.find(fp, sz)
+        if t is not None and len(s._ci):
+            s._log(f"  🧾 Индекс выходной папки: {len(s._ci)} файлов ({time.monotonic() - t:.1f}с)", "info")
+        if p is None: return False
+        s._inc("done");
+        s._inc("dup")
+        if s._file_cb: s._file_cb(fp, Result(fp=fp, err=f"уже в выходе: {p}"), None)
+        return True
+
+    def _take(s, fp, r, exc, wr, nb=None, lat=None):
+        """Итог по одному файлу. nb — куда отложить «без боди-кам» (None — это уже отказ)."""
+        st = s.stats
+        if s._file_cb: s._file_cb(fp, r, exc)
+        if exc is not None:
+            s._inc("er");
+            st.skipped.append(fp)
+            s._log(f"  ❌ {fp.name}: {str(exc)[:60]}", "error")
+            return
+        if s._jr is not None: s._jr.decide(fp, r)
+        if s._man is not None:
+            s._man.decide(fp, r)
+            # В виртуальном режиме копии не будет — решение и есть результат
+            if s._vx is not None and r.ok: s._man.copied(fp)
+        if s._vx is not None: s._vx.record(fp, r)
+        if r.ok:
+            fd = r.folder
+            # Счётчики — по категориям, без подпапок дат
+            s._ok(r.base_folder)
+            if wr is not None:
+                if s._ci is not None and r.fh: s._pfh[str(fp)] = r.fh
+                s._pfd[str(fp)] = r.base_folder
+                wr.submit(fp, fd, r.fh or None)
+            s._log(f"  ✅ [{r.method}] {fp.name} → {fd}" + (f" ({lat:.2f}с)" if lat is not None else ""),
+                   "success")
+        elif r.err == "Нет боди-кам" and nb is not None:
+            nb.append((fp, r.ts))
+        else:
+            s._inc("sk");
+            st.skipped.append(fp)
+            s._log(f"  ⏭ {fp.name} — {r.err}", "warning")
+
+    def run(s):
+        st = s.stats;
+        az = s.az
+        s.odir.mkdir(parents=True, exist_ok=True)
+        # Папка читается потоком: порция за порцией — предпросмотр, анализ, следующая порция.
+        # ZIP вместо папки читается прямо из архива, без распаковки
+        arc = ZipInput(s.idir) if is_archive(s.idir) else None
+        src = scan_archive(arc) if arc is not None else scan_images(s.idir, s.rec, skip=(s.odir,))
+        chs = _chunks(src, SCAN_CHUNK)
+        first = next(chs, None)
+        if first is None:
+            s._log("  Папка пуста", "warning");
+            if arc is not None: arc.close()
+            return st
+        az.bind_folder(s.idir)
+        t0 = time.monotonic()
+        pnb = [];
+        onb = set()
+        mf = False
+        if s.inc and not s.dry:
+            # Инкрементально: файлы, решённые в прошлые дни, не трогаем;
+            # старые «без боди-кам» ещё раз сверяются с лентой боди-кам
+            s._man = SortManifest(s.idir, s.odir, s._opts())
+            mf = s._man.load()
+
+        rs = False
+        if not s.dry:
+            s._jr = RunJournal(s.idir, s.odir, s._opts())
+            rs = s._jr.load();
+            s._jr.begin(rs)
+        wr = s._writer(reuse=rs)
+
+        pln = Planner(az.cfg, s.wk)
+        nsc = nold = nres = 0
+        scanned = threading.Event()
+
+        def files():
+            # Порция обхода → фильтры → предпросмотр → файлы порции в порядке плана.
+            # Генератор читается потоком подачи конвейера: следующая порция готовится,
+            # пока анализируется предыдущая, и конвейер на границе порций не пустеет.
+            # Порядок «вероятные первыми» — внутри порции (SCAN_CHUNK файлов): папка
+            # не больше порции упорядочена целиком, большая — порция за порцией
+            nonlocal nsc, nold, nres
+            shown = False
+            try:
+                for k, (ch, last) in enumerate(itertools.chain([first], chs)):
+                    if s.stop.is_set(): return
+                    nsc += len(ch)
+                    des = {}
+                    for fp, de in ch:
+                        if mf:
+                            rec = s._man.seen(fp)
+                            if rec is not None:
+                                nold += 1
+                                if rec.get("err") == "Нет боди-кам":
+                                    pnb.append((fp, rec.get("ts")));
+                                    onb.add(fp)
+                                continue
+                        s._inc("total")
+                        # Продолжение прерванного запуска: решённые файлы не анализируем заново
+                        if rs and s._resumed(fp, wr, pnb):
+                            nres += 1;
+                            continue
+                        # То же содержимое уже лежит в выходе — ни анализа, ни копии
+                        if s._ci is not None and s._dup(fp, de): continue
+                        des[fp] = de
+                    if nres and k == 0: s._prog(st.total, 0.)
+
+                    # Предпросмотр порции — порядок работы и оценка времени
+                    tp = time.monotonic()
+                    prb = pln.scan(list(des), s.stop, des)
+                    if prb and not shown:
+                        shown = True
+                        pc = pln.counts()
+                        npb = sum(not p.probed for p in prb)
+                        s._log(f"  🔎 Предпросмотр {time.monotonic() - tp:.1f}с: "
+                               + " · ".join(f"{c} {pc.get(c, 0)}" for c in PLAN_CLASSES)
+                               + (f" (без пробы, по времени: {npb})" if npb else "")
+                               + ("" if last else f" (первые {len(ch)}, обход папки продолжается)"), "info")
+                    for p in pln.order(prb): yield p.fp
+            finally:
+                scanned.set()
+
+        try:
+            for fp, r, exc in az.run_many(files(), s.wk, s.stop):
+                s._inc("done")
+                el = time.monotonic() - t0
+                pln.done(fp, r.dt)
+                s._take(fp, r, exc, wr, pnb)
+                # Пока обход не закончен, остаток неизвестен — оценку не показываем
+                s._prog(st.total, el, pln.eta(el) if scanned.is_set() else None)
+        except Exception as e:
+            # Разобранное до обрыва дописываем как обычно, но запуск не считается законченным
+            st.cut = str(e) or type(e).__name__
+            st.er += 1
+            s._log(f"  ❌ Обход папки прерван: {st.cut[:80]}", "error")
+        if mf:
+            s._log(f"  📑 Инкрементально: {nold} уже разобраны раньше, новых {nsc - nold}", "info")
+        if nres:
+            s._log(f"  ♻ Продолжен прерванный запуск: {nres} из {st.total} были разобраны раньше", "info")
+        if st.dup:
+            s._log(f"  🧾 Уже лежат в выходной папке: {st.dup} — пропущены без анализа", "info")
+        total = st.total
+
+        if pnb and not s.stop.is_set() and not st.cut:
+            # Боди-кам рядом по времени ищем один раз по всем меткам, без повторного анализа
+            inh = az.bc_join([ts for _, ts in pnb])
+            fin = [fp for (fp, _), y in zip(pnb, inh) if y]
+            for (fp, _), y in zip(pnb, inh):
+                if y: continue
+                az.images.discard(fp)
+                if fp not in onb: st.bc += 1; st.skipped.append(fp)
+            s._log(f"\n  🔄 Наследование боди-кам: {len(fin)} из {len(pnb)} файлов", "bodycam")
+            pln.add(fin, PLAN_CLASSES[0])
+            for fp, r, exc in az.run_many(fin, s.wk, s.stop, inherit=True):
+                st.done += 1;
+                el = time.monotonic() - t0
+                pln.done(fp, r.dt)
+                s._take(fp, r, exc, wr)
+                s._prog(total + len(fin), el, pln.eta(el))
+
+        if wr is not None:
+            if wr.pending: s._log("  💾 Дописываю файлы...", "info")
+            wr.close()
+            st.er += wr.failed
+            s._wsum(wr)
+        if s._vx is not None: s._vx.close()
+        if s._ci is not None: s._ci.close()
+        if arc is not None: arc.close()
+        st.stopped = s.stop.is_set()
+        if s._jr is not None:
+            if st.stopped or st.cut:
+                s._jr.close()
+                s._log("  📒 Журнал сохранён — следующий запуск продолжит с этого места", "info")
+            else:
+                s._jr.remove()
+        if s._man is not None: s._man.close()
+        st.dur = time.monotonic() - t0
+        return st
+
+    def watch(s):
+        """
+        Сортировка по мере появления файлов, пока не выставлен stop. Скрины без боди-кам
+        ждут в стороне: каждая новая боди-кам заново сверяет их с лентой и забирает соседей.
+        """
+        st = s.stats;
+        az = s.az
+        s.odir.mkdir(parents=True, exist_ok=True)
+        az.bind_folder(s.idir)
+        wq = queue.Queue()
+        wt = FolderWatcher(s.idir, lambda fp: wq.put((fp, time.monotonic())))
+        wt.start()
+        _ocr.warm()
+        if s.inc and not s.dry:
+            s._man = SortManifest(s.idir, s.odir, s._opts());
+            s._man.load()
+        wr = s._writer(dedup=False)
+        t0 = time.monotonic()
+        park = []
+        try:
+            while not s.stop.is_set():
+                try:
+                    batch = [wq.get(timeout=.2)]
+                except queue.Empty:
+                    continue
+                while len(batch) < 32:
+                    try:
+                        batch.append(wq.get_nowait())
+                    except queue.Empty:
+                        break
+                t_in = dict(batch)
+                runs = [(list(t_in), False)]
+                while runs:
+                    fps, inh = runs.pop()
+                    nbc = False;
+                    np0 = len(park)
+                    for fp, r, exc in az.run_many(fps, s.wk, inherit=inh):
+                        st.done += 1
+                        nbc = nbc or (exc is None and r.bodycam and not r.bc_inherited)
+                        s._take(fp, r, exc, wr, None if inh else park,
+                                lat=time.monotonic() - t_in.get(fp, time.monotonic()))
+                    # Новая боди-кам тянет отложенные; новые отложенные сверяем с лентой
+                    if park and (nbc or len(park) > np0):
+                        y = az.bc_join([ts for _, ts in park])
+                        fin = [fp for (fp, _), v in zip(park, y) if v]
+                        park = [p for p, v in zip(park, y) if not v]
+                        if fin:
+                            s._log(f"  🔄 Наследование боди-кам: {len(fin)}", "bodycam")
+                            st.done -= len(fin)
+                            runs.append((fin, True))
+                st.total = st.done;
+                st.bc = len(park)
+                s._prog(st.total, 0.)
+        finally:
+            wt.stop()
+            # Остановлено раньше, чем дошла очередь, или файл не дописан — не теряем, а пропускаем явно
+            left = []
+            while not wq.empty(): left.append(wq.get_nowait()[0])
+            left += wt.left
+            if left:
+                st.skipped.extend(left)
+                s._log(f"  ⏸ Не разобраны при остановке: {len(left)} — "
+                       + ", ".join(fp.name for fp in left[:5]) + (" …" if len(left) > 5 else ""), "warning")
+            if wr is not None:
+                wr.close();
+                st.er += wr.failed
+                s._wsum(wr)
+            if s._vx is not None: s._vx.close()
+            if s._ci is not None: s._ci.close()
+            if s._man is not None: s._man.close()
+            st.stopped = True
+            st.dur = time.monotonic() - t0
+        return st
@@ -0,0 +1,3105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Majestic RP Screenshot Sorter — окна программы на customtkinter:
+главное окно, оверлей, аналитика и автообновление. Движок — в core.py.
+"""
+
+import os
+import json
+import time
+import shutil
+import threading
+import webbrowser
+from pathlib import Path
+import datetime
+from PIL import Image, ImageTk, ImageDraw
+
+import customtkinter as ctk
+from tkinter import filedialog, Text, END
+import tkinter as tk
+from loguru import logger
+import mss
+import mss.tools
+try:
+    import keyboard
+    KEYBOARD_OK = True
+except ImportError:
+    KEYBOARD_OK = False
+    print("[DEBUG] keyboard не установлен — горячие клавиши оверлея недоступны")
+
+from core import (APP_AUTHOR, APP_DONATE, DATA_DIR, INDEX_FILE, LOCATION_DB_FILE, OVERLAY_SETTINGS_FILE,
+                  RAPIDOCR_OK, PADDLEOCR_OK, EASYOCR_OK, TESSERACT_OK,
+                  Config, Analyzer, Sorter, ImageContext, DestIndex, ResultIndex,
+                  check_bodycam, extract_features, predict_location_from_db, add_location_sample,
+                  load_location_db, save_location_db, load_trigger_db, save_trigger_db,
+                  load_settings, save_settings, is_archive)
+from core import _ocr, _ocr_disk_cache, _ocr_crop_cache
+
+# ═══════════════════════════════════════════
+#  СИСТЕМА АВТООБНОВЛЕНИЯ
+# ═══════════════════════════════════════════
+
+def _parse_version(version_str):
+    """Парсит версию в кортеж чисел для сравнения."""
+    try:
+        # Убираем 'v' в начале если есть
+        version_str = version_str.strip().lstrip('v').lstrip('V')
+        parts = version_str.split('.')
+        return tuple(int(p) for p in parts[:3])
+    except:
+        return (0, 0, 0)
+
+
+def _is_newer_version(latest, current):
+    """Проверяет, новее ли latest чем current."""
+    return _parse_version(latest) > _parse_version(current)
+
+
+def check_for_updates(callback=None):
+    """
+    Проверяет наличие обновлений на GitHub.
+    Возвращает: (есть_обновление, версия, ссылка_скачивания, описание)
+    """
+    # Если репозиторий не указан — пропускаем проверку
+    if not GITHUB_REPO or not UPDATE_CHECK_URL:
+        return False, APP_VERSION, None, None
+
+    try:
+        import urllib.request
+
+        req = urllib.request.Request(
+            UPDATE_CHECK_URL,
+            headers={"User-Agent": "MajesticSorter/AutoUpdate"}
+        )
+
+        with urllib.request.urlopen(req, timeout=10) as response:
+            data = json.loads(response.read().decode('utf-8'))
+
+            latest_version = data.get("tag_name", "").lstrip('v')
+            description = data.get("body", "")
+
+            # Ищем файл для скачивания
+            download_url = None
+            for asset in data.get("assets", []):
+                name = asset.get("name", "").lower()
+                if name.endswith('.exe') or name.endswith('.zip'):
+                    download_url = asset.get("browser_download_url")
+                    break
+
+            # Если нет assets, используем zipball
+            if not download_url:
+                download_url = data.get("zipball_url")
+
+            if _is_newer_version(latest_version, APP_VERSION):
+                return True, latest_version, download_url, description
+
+            return False, latest_version, download_url, description
+
+    except Exception as e:
+        print(f"[UPDATE] Ошибка проверки: {e}")
+        return False, None, None, None
+
+def download_update(url, progress_callback=None):
+    """
+    Скачивает обновление.
+    progress_callback(percent, downloaded, total) - для прогресс-бара
+    """
+    try:
+        import urllib.request
+
+        # Определяем имя файла
+        filename = url.split('/')[-1]
+        if not filename.endswith(('.exe', '.zip')):
+            filename = "MajesticSorter_update.zip"
+
+        DATA_DIR = Path.home() / ".majestic_sorter"
+        DATA_DIR.mkdir(exist_ok=True)
+
+        download_path = DATA_DIR / filename  # ← ЭТА СТРОКА БЫЛА ПРОПУЩЕНА!
+
+        req = urllib.request.Request(
+            url,
+            headers={"User-Agent": "MajesticSorter/AutoUpdate"}
+        )
+
+        with urllib.request.urlopen(req, timeout=60) as response:
+            total_size = int(response.headers.get('content-length', 0))
+            downloaded = 0
+            chunk_size = 8192
+
+            with open(download_path, 'wb') as f:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    downloaded += len(chunk)
+
+                    if progress_callback and total_size > 0:
+                        percent = int(downloaded * 100 / total_size)
+                        progress_callback(percent, downloaded, total_size)
+
+        return True, download_path
+
+    except Exception as e:
+        print(f"[UPDATE] Ошибка скачивания: {e}")
+        return False, None
+
+def apply_update(file_path):
+    """Применяет обновление (открывает папку с файлом)."""
+    try:
+        import subprocess
+        import sys
+
+        if sys.platform == 'win32':
+            # Открываем папку с файлом
+            subprocess.Popen(f'explorer /select,"{file_path}"')
+            return True
+
+        return False
+    except Exception as e:
+        print(f"[UPDATE] Ошибка применения: {e}")
+        return False
+
+
+class UpdateDialog(ctk.CTkToplevel):
+    """Окно проверки и установки обновлений."""
+
+    def __init__(self, parent, version, download_url, description):
+        super().__init__(parent)
+
+        print(f"[DEBUG] UpdateDialog.__init__ начало")
+
+        self.title("Доступно обновление!")
+        self.configure(fg_color=P["bg"])
+
+        self.download_url = download_url
+        self.version = version
+
+        # Размеры и позиция
+        w, h = 500, 350
+        sw = self.winfo_screenwidth()
+        sh = self.winfo_screenheight()
+        x = (sw - w) // 2
+        y = (sh - h) // 2
+        self.geometry(f"{w}x{h}+{x}+{y}")
+        self.resizable(False, False)
+        self.minsize(w, h)
+
+        # Строим интерфейс
+        self._build(version, description)
+
+        # КРИТИЧЕСКИ ВАЖНО: Принудительно показываем окно
+        self.deiconify()  # Показать окно
+        self.lift()  # Поднять наверх
+        self.focus_force()  # Установить фокус
+        self.grab_set()  # Захватить ввод
+
+        # Обновляем окно
+        self.update()
+
+        # Ещё раз поднимаем через 100мс
+        self.after(100, self._bring_to_front)
+
+        print(f"[DEBUG] UpdateDialog.__init__ завершено")
+
+    def _bring_to_front(self):
+        """Поднимает окно на передний план."""
+        try:
+            self.deiconify()
+            self.lift()
+            self.focus_force()
+            self.attributes('-topmost', True)
+            self.update()
+            self.after(300, lambda: self.attributes('-topmost', False))
+            print(f"[DEBUG] _bring_to_front выполнено")
+        except Exception as e:
+            print(f"[DEBUG] _bring_to_front ошибка: {e}")
+
+    def _build(self, version, description):
+        print(f"[DEBUG] _build начало")
+
+        # Основной контейнер
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Заголовок
+        ctk.CTkLabel(
+            main_frame,
+            text="🎉 Доступно обновление!",
+            font=ctk.CTkFont(size=20, weight="bold"),
+            text_color=P["accent"]
+        ).pack(pady=(10, 10))
+
+        # Версии
+        version_frame = ctk.CTkFrame(main_frame, fg_color=P["card"], corner_radius=10)
+        version_frame.pack(fill="x", padx=10, pady=10)
+
+        ctk.CTkLabel(
+            version_frame,
+            text=f"Текущая версия: {APP_VERSION}",
+            font=ctk.CTkFont(size=12),
+            text_color=P["t2"]
+        ).pack(pady=(10, 2))
+
+        ctk.CTkLabel(
+            version_frame,
+            text=f"Новая версия: {version}",
+            font=ctk.CTkFont(size=14, weight="bold"),
+            text_color=P["ok"]
+        ).pack(pady=(2, 10))
+
+        # Описание
+        if description:
+            ctk.CTkLabel(
+                main_frame,
+                text="Что нового:",
+                font=ctk.CTkFont(size=11, weight="bold"),
+                text_color=P["text"]
+            ).pack(anchor="w", padx=10, pady=(10, 5))
+
+            desc_text = description[:300]
+            if len(description) > 300:
+                desc_text += "..."
+
+            ctk.CTkLabel(
+                main_frame,
+                text=desc_text,
+                font=ctk.CTkFont(size=10),
+                text_color=P["t2"],
+                wraplength=450,
+                justify="left"
+            ).pack(fill="x", padx=10, pady=(0, 10))
+
+        # Кнопки внизу
+        btn_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        btn_frame.pack(fill="x", padx=10, pady=(20, 10), side="bottom")
+
+        # Кнопка "Позже"
+        later_btn = ctk.CTkButton(
+            btn_frame,
+            text="Позже",
+            width=150,
+            height=40,
+            fg_color=P["entry"],
+            hover_color=P["bh"],
+            border_width=1,
+            border_color=P["border"],
+            text_color=P["t2"],
+            font=ctk.CTkFont(size=12),
+            command=self._on_later
+        )
+        later_btn.pack(side="left", padx=(0, 10))
+        print(f"[DEBUG] Кнопка 'Позже' создана")
+
+        # Кнопка "Скачать"
+        download_btn = ctk.CTkButton(
+            btn_frame,
+            text="🌐 Скачать обновление",
+            width=200,
+            height=40,
+            fg_color=P["accent"],
+            hover_color=P["ah"],
+            text_color="#fff",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            command=self._open_browser
+        )
+        download_btn.pack(side="right")
+        print(f"[DEBUG] Кнопка 'Скачать' создана")
+
+        print(f"[DEBUG] _build завершено")
+
+    def _on_later(self):
+        """Закрывает окно."""
+        print(f"[DEBUG] Нажата кнопка 'Позже'")
+        self.destroy()
+
+    def _open_browser(self):
+        """Открывает страницу релиза в браузере."""
+        print(f"[DEBUG] Нажата кнопка 'Скачать'")
+        try:
+            url = f"https://github.com/{GITHUB_REPO}/releases/latest"
+            print(f"[DEBUG] Открываю URL: {url}")
+            webbrowser.open(url)
+            self.destroy()
+        except Exception as e:
+            print(f"[DEBUG] Ошибка открытия браузера: {e}")
+
+    def _open_download_page(self):
+        """Открывает страницу релиза в браузере."""
+        import webbrowser
+        url = DOWNLOAD_URL if DOWNLOAD_URL else self.download_url
+        if url:
+            webbrowser.open(url)
+        self.destroy()
+    def _download_thread(self):
+        def progress_callback(percent, downloaded, total):
+            mb_downloaded = downloaded / (1024 * 1024)
+            mb_total = total / (1024 * 1024)
+
+            self.after(0, lambda: self.progress_bar.set(percent / 100))
+            self.after(0, lambda: self.progress_label.configure(
+                text=f"{percent}% ({mb_downloaded:.1f} / {mb_total:.1f} MB)"
+            ))
+
+        success, file_path = download_update(self.download_url, progress_callback)
+
+        if success:
+            self.after(0, lambda: self._download_complete(file_path))
+        else:
+            self.after(0, self._download_failed)
+
+    def _download_complete(self, file_path):
+        self.progress_bar.set(1)
+        self.progress_label.configure(text="✅ Скачано!")
+
+        self.download_btn.configure(
+            text="📂 Открыть папку",
+            state="normal",
+            command=lambda: self._open_folder(file_path)
+        )
+        self.later_btn.configure(state="normal", text="Закрыть")
+
+    def _download_failed(self):
+        self.progress_label.configure(text="❌ Ошибка скачивания")
+        self.download_btn.configure(text="Повторить", state="normal")
+        self.later_btn.configure(state="normal")
+        self.is_downloading = False
+
+    def _open_folder(self, file_path):
+        apply_update(file_path)
+        self.destroy()
+
+# ═══════════════════════════════════════════
+#  АВТООБНОВЛЕНИЕ
+# ═══════════════════════════════════════════
+
+APP_VERSION = "4.0.0"
+GITHUB_REPO = "Orange2-invalide/MadjesticRP_Sorter"
+UPDATE_CHECK_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
+DOWNLOAD_URL = f"https://github.com/{GITHUB_REPO}/releases/latest"
+
+# Plyer для уведомлений
+PLYER_OK = False
+try:
+    from plyer import notification as _notify
+    PLYER_OK = True
+except:
+    pass
+
+# Winsound для звуков
+try:
+    import winsound
+except:
+    winsound = None
+
+
+
+
+def _play_sort_sound():
+    try:
+        if winsound:
+            winsound.MessageBeep(winsound.MB_OK)
+    except:
+        pass
+
+
+def _play_done_sound():
+    try:
+        if winsound:
+            winsound.MessageBeep(winsound.MB_ICONASTERISK)
+    except:
+        pass
+
+
+def _play_error_sound():
+    try:
+        if winsound:
+            winsound.MessageBeep(winsound.MB_ICONHAND)
+    except:
+        pass
+
+
+
+
+P = {
+    "bg": "#0a0a0a", "card": "#131313", "card2": "#1a1a1a", "entry": "#1e1e1e",
+    "border": "#252525", "bh": "#333333", "accent": "#2CC985", "ah": "#3DF5A0",
+    "red": "#E8364F", "rh": "#FF5068", "orange": "#FF8C42", "oh": "#FFA862",
+    "purple": "#A855F7", "blue": "#3B82F6", "gold": "#FFD700", "text": "#E0E0E0",
+    "t2": "#909090", "dim": "#484848", "log": "#080808", "ok": "#2CC985",
+    "err": "#E8364F", "warn": "#FFA502", "info": "#70A1FF", "bodycam": "#ED3A3A",
+    "donate_bg": "#1a1200", "donate_border": "#3d2e00"
+}
+
+
+# ═══════════════════════════════════════════
+#  GUI — СЕКЦИЯ
+# ═══════════════════════════════════════════
+class Sec(ctk.CTkFrame):
+    def __init__(s, p, t, color=P["accent"], col=False, **kw):
+        super().__init__(p, fg_color=P["card"], corner_radius=12, border_width=1,
+                         border_color=P["border"], **kw)
+        s._c = col;
+        s._t = t
+        s._h = ctk.CTkButton(s, text=s._tt(), anchor="w", font=ctk.CTkFont(size=11, weight="bold"),
+                             fg_color="transparent", hover_color=P["entry"], text_color=color, height=36, command=s._tg)
+        s._h.pack(fill="x", padx=4, pady=(2, 0))
+        s._s = ctk.CTkFrame(s, height=1, fg_color=P["border"])
+        s.body = ctk.CTkFrame(s, fg_color="transparent")
+        if not col: s._s.pack(fill="x", padx=10); s.body.pack(fill="x", expand=False)
+
+    def _tt(s):
+        return f"  {'>' if s._c else 'v'}  {s._t}"
+
+    def _tg(s):
+        s._c = not s._c;
+        s._h.configure(text=s._tt())
+        if s._c:
+            s.body.pack_forget(); s._s.pack_forget()
+        else:
+            s._s.pack(fill="x", padx=10); s.body.pack(fill="x", expand=False, pady=(0, 4))
+
+
+def _icon():
+    img = Image.new("RGBA", (64, 64), (0, 0, 0, 0));
+    d = ImageDraw.Draw(img)
+    for i in range(64):
+        for j in range(64):
+            r = int(15 + (i / 64) * 10);
+            g = int(150 + (i / 64) * 50 + (j / 64) * 15);
+            b = int(85 + (j / 64) * 40)
+            cr = 16;
+            ok = True
+            for cd, dy, dx in [(i < cr and j < cr, cr - i, cr - j), (i < cr and j > 63 - cr, cr - i, j - (63 - cr)),
+                               (i > 63 - cr and j < cr, i - (63 - cr), cr - j),
+                               (i > 63 - cr and j > 63 - cr, i - (63 - cr), j - (63 - cr))]:
+                if cd and dy ** 2 + dx ** 2 > cr ** 2: ok = False; break
+            if ok: img.putpixel((j, i), (r, g, b, 255))
+    d.rounded_rectangle([27, 12, 37, 52], radius=4, fill=(255, 255, 255, 220))
+    d.rounded_rectangle([12, 27, 52, 37], radius=4, fill=(255, 255, 255, 220))
+    d.ellipse([46, 4, 58, 16], fill=(232, 54, 79, 240));
+    return img
+
+
+class Tooltip:
+    def __init__(s, widget, text, delay=500):
+        s.widget = widget;
+        s.text = text;
+        s.delay = delay
+        s.tip = None;
+        s._id = None
+        widget.bind("<Enter>", s._on_enter)
+        widget.bind("<Leave>", s._on_leave)
+
+    def _on_enter(s, e):
+        s._id = s.widget.after(s.delay, s._show)
+
+    def _on_leave(s, e):
+        if s._id: s.widget.after_cancel(s._id); s._id = None
+        s._hide()
+
+    def _show(s):
+        x = s.widget.winfo_rootx() + 20
+        y = s.widget.winfo_rooty() + s.widget.winfo_height() + 5
+        s.tip = tk.Toplevel(s.widget)
+        s.tip.wm_overrideredirect(True)
+        s.tip.wm_geometry(f"+{x}+{y}")
+        frame = tk.Frame(s.tip, bg="#1a1a1a", bd=1, relief="solid",
+                         highlightbackground="#333", highlightthickness=1)
+        frame.pack()
+        tk.Label(frame, text=s.text, bg="#1a1a1a", fg="#e0e0e0",
+                 font=("Segoe UI", 9), padx=8, pady=4,
+                 wraplength=300, justify="left").pack()
+
+    def _hide(s):
+        if s.tip:
+            s.tip.destroy();
+            s.tip = None
+
+
+# ═══════════════════════════════════════════
+#  ОКНО АНАЛИТИКИ
+# ═══════════════════════════════════════════
+class AnalyticsWindow(ctk.CTkToplevel):
+    def __init__(s, parent, fp: Path, az: Analyzer, log_fn, location_db: dict):
+        super().__init__(parent)
+        s.title(f"Аналитика: {fp.name}")
+        s.configure(fg_color=P["bg"]);
+        s.transient(parent)
+        s.fp = fp;
+        s.az = az;
+        s.log_fn = log_fn;
+        s.location_db = location_db
+        s.photo = None;
+        s.features = {};
+        s.result = None
+        sw, sh = s.winfo_screenwidth(), s.winfo_screenheight()
+        s.geometry(f"1100x750+{(sw - 1100) // 2}+{(sh - 750) // 2}")
+        s._build()
+        threading.Thread(target=s._run_analysis, daemon=True).start()
+
+    def _build(s):
+        hf = ctk.CTkFrame(s, fg_color=P["card"], corner_radius=0, height=50)
+        hf.pack(fill="x");
+        hf.pack_propagate(False)
+        ctk.CTkLabel(hf, text="Полная аналитика скриншота",
+                     font=ctk.CTkFont(size=14, weight="bold"),
+                     text_color=P["accent"]).pack(side="left", padx=16, pady=12)
+        ctk.CTkLabel(hf, text=s.fp.name,
+                     font=ctk.CTkFont(size=10),
+                     text_color=P["t2"]).pack(side="left", pady=12)
+
+        mn = ctk.CTkFrame(s, fg_color="transparent")
+        mn.pack(fill="both", expand=True, padx=8, pady=6)
+        mn.columnconfigure(0, weight=1);
+        mn.columnconfigure(1, weight=1);
+        mn.rowconfigure(0, weight=1)
+
+        # Левая панель
+        lp = ctk.CTkFrame(mn, fg_color=P["card"], corner_radius=10)
+        lp.grid(row=0, column=0, sticky="nsew", padx=(0, 4))
+
+        s.img_lbl = ctk.CTkLabel(lp, text="Загрузка...",
+                                 font=ctk.CTkFont(size=11), text_color=P["t2"])
+        s.img_lbl.pack(padx=8, pady=8, expand=True)
+
+        s.status_lbl = ctk.CTkLabel(lp, text="Анализирую...",
+                                    font=ctk.CTkFont(size=11, weight="bold"),
+                                    text_color=P["warn"])
+        s.status_lbl.pack(padx=8, pady=4)
+
+        tf = ctk.CTkFrame(lp, fg_color=P["entry"], corner_radius=8,
+                          border_width=1, border_color=P["border"])
+        tf.pack(fill="x", padx=8, pady=(0, 4))
+        ctk.CTkLabel(tf, text="Правильная локация:",
+                     font=ctk.CTkFont(size=10), text_color=P["t2"]).pack(anchor="w", padx=8, pady=(6, 0))
+        s.loc_var = ctk.StringVar(value="ELSH")
+        ctk.CTkOptionMenu(tf, values=["ELSH", "Sandy", "Paleto"],
+                          variable=s.loc_var, width=140, height=30,
+                          fg_color=P["bg"], button_color=P["gold"],
+                          dropdown_fg_color=P["card"], text_color=P["text"],
+                          font=ctk.CTkFont(size=11)).pack(padx=8, pady=4, anchor="w")
+        ctk.CTkButton(tf, text="Обучить систему", height=34,
+                      fg_color=P["accent"], hover_color=P["ah"],
+                      text_color="#fff", font=ctk.CTkFont(size=11, weight="bold"),
+                      command=s._teach).pack(fill="x", padx=8, pady=(0, 8))
+
+        s.db_stat_lbl = ctk.CTkLabel(lp, text="", font=ctk.CTkFont(size=9), text_color=P["dim"])
+        s.db_stat_lbl.pack(padx=8, pady=(0, 6))
+        s._update_db_stat()
+
+        # Правая панель — вкладки
+        rp = ctk.CTkFrame(mn, fg_color=P["card"], corner_radius=10)
+        rp.grid(row=0, column=1, sticky="nsew")
+        rp.rowconfigure(0, weight=1);
+        rp.columnconfigure(0, weight=1)
+
+        tabs = ctk.CTkTabview(rp,
+                              fg_color=P["card"],
+                              segmented_button_fg_color=P["entry"],
+                              segmented_button_selected_color=P["accent"],
+                              segmented_button_selected_hover_color=P["ah"],
+                              text_color=P["text"])
+        tabs.pack(fill="both", expand=True, padx=4, pady=4)
+
+        t1 = tabs.add("Признаки")
+        s.feat_text = Text(t1, font=("Consolas", 9), bg=P["log"], fg=P["text"],
+                           relief="flat", borderwidth=0, padx=6, pady=4, wrap="none")
+        sb1 = tk.Scrollbar(t1, orient="vertical", command=s.feat_text.yview,
+                           bg=P["card"], troughcolor=P["log"])
+        sb1.pack(side="right", fill="y")
+        s.feat_text.pack(fill="both", expand=True)
+        s.feat_text.configure(yscrollcommand=sb1.set)
+
+        t2 = tabs.add("Скоры БД")
+        s.score_text = Text(t2, font=("Consolas", 9), bg=P["log"], fg=P["text"],
+                            relief="flat", borderwidth=0, padx=6, pady=4, wrap="word")
+        sb2 = tk.Scrollbar(t2, orient="vertical", command=s.score_text.yview,
+                           bg=P["card"], troughcolor=P["log"])
+        sb2.pack(side="right", fill="y")
+        s.score_text.pack(fill="both", expand=True)
+        s.score_text.configure(yscrollcommand=sb2.set)
+
+        t3 = tabs.add("Диагностика")
+        s.diag_text = Text(t3, font=("Consolas", 9), bg=P["log"], fg=P["text"],
+                           relief="flat", borderwidth=0, padx=6, pady=4, wrap="word")
+        sb3 = tk.Scrollbar(t3, orient="vertical", command=s.diag_text.yview,
+                           bg=P["card"], troughcolor=P["log"])
+        sb3.pack(side="right", fill="y")
+        s.diag_text.pack(fill="both", expand=True)
+        s.diag_text.configure(yscrollcommand=sb3.set)
+
+        bf = ctk.CTkFrame(rp, fg_color="transparent")
+        bf.pack(fill="x", padx=4, pady=(0, 4))
+        ctk.CTkButton(bf, text="Копировать для анализа", height=30,
+                      fg_color=P["purple"], hover_color="#C026D3",
+                      text_color="#fff", font=ctk.CTkFont(size=10),
+                      command=s._copy_for_analysis).pack(side="left", padx=(0, 4))
+        ctk.CTkButton(bf, text="Сохранить JSON", height=30,
+                      fg_color=P["entry"], hover_color=P["bh"],
+                      border_width=1, border_color=P["border"],
+                      text_color=P["t2"], font=ctk.CTkFont(size=10),
+                      command=s._save_json).pack(side="left")
+
+    def _update_db_stat(s):
+        db = s.location_db;
+        total = len(db.get("samples", []))
+        by_loc = {}
+        for sample in db.get("samples", []):
+            loc = sample.get("location", "?")
+            by_loc[loc] = by_loc.get(loc, 0) + 1
+        lines = [f"БД: {total} примеров"]
+        for loc, cnt in by_loc.items(): lines.append(f"  {loc}: {cnt}")
+        s.db_stat_lbl.configure(text="\n".join(lines))
+
+    def _run_analysis(s):
+        try:
+            pil = Image.open(s.fp)
+            r = min(500 / pil.width, 280 / pil.height)
+            pil = pil.resize((int(pil.width * r), int(pil.height * r)), Image.LANCZOS)
+            s.photo = ImageTk.PhotoImage(pil)
+            s.after(0, lambda: s.img_lbl.configure(image=s.photo, text=""))
+        except:
+            pass
+
+        ctx = ImageContext.from_file(s.fp, s.az.cfg, s.az.images)
+        if ctx is None:
+            s.after(0, lambda: s.status_lbl.configure(text="Ошибка загрузки", text_color=P["err"]))
+            return
+
+        diag = []
+        feats = extract_features(ctx, diag);
+        s.features = feats
+        r = s.az.run(s.fp, wd=True);
+        s.result = r
+        db_pred, db_conf, db_details = predict_location_from_db(s.location_db, feats)
+
+        s.after(0, lambda: s._fill_features(feats))
+        s.after(0, lambda: s._fill_scores(db_pred, db_conf, db_details, feats))
+        s.after(0, lambda: s._fill_diag(r.diag))
+
+        if r.ok:
+            status = f"{r.cat.value} | {r.hosp.value} | {r.method}"
+            s.after(0, lambda: s.status_lbl.configure(text=status, text_color=P["ok"]))
+        else:
+            s.after(0, lambda: s.status_lbl.configure(text=f"Ошибка: {r.err}", text_color=P["err"]))
+
+    def _fill_features(s, feats):
+        s.feat_text.delete("1.0", END)
+        for tg, cl in [("elsh", P["orange"]), ("paleto", P["blue"]), ("sandy", P["gold"]),
+                       ("mean", P["t2"]), ("header", P["accent"]), ("good", P["ok"]), ("dim", P["dim"])]:
+            s.feat_text.tag_config(tg, foreground=cl)
+
+        def ins(txt, tag="dim"):
+            s.feat_text.insert(END, txt, tag)
+
+        ins("══ ELSH ══\n", "header")
+        for k in ["elsh_floor", "elsh_wall_or", "elsh_beds", "elsh_clothes", "elsh_lamp"]:
+            v = feats.get(k, 0)
+            ins(f"  {k:<22} = {v:.6f}\n", "good" if v > 0.01 else "elsh")
+
+        ins("\n══ PALETO ══\n", "header")
+        for k in ["paleto_floor", "paleto_wall_gray", "paleto_wall_dark", "paleto_wall_blue", "paleto_sky"]:
+            v = feats.get(k, 0)
+            ins(f"  {k:<22} = {v:.6f}\n", "good" if v > 0.10 else "paleto")
+
+        ins("\n══ SANDY ══\n", "header")
+        for k in ["sandy_floor", "sandy_wall", "sandy_floor_br", "sandy_door", "sandy_mm"]:
+            v = feats.get(k, 0)
+            ins(f"  {k:<22} = {v:.6f}\n", "good" if v > 0.10 else "sandy")
+
+        ins("\n══ СРЕДНИЕ HSV ══\n", "header")
+        for name, kh, ks, kv in [("Пол", "floor_h", "floor_s", "floor_v"),
+                                 ("Стена Л", "wall_l_h", "wall_l_s", "wall_l_v"),
+                                 ("Стена П", "wall_r_h", "wall_r_s", "wall_r_v"),
+                                 ("Потолок", "ceiling_h", "ceiling_s", "ceiling_v"),
+                                 ("Центр", "center_h", "center_s", "center_v"),
+                                 ("Карта", "minimap_h", "minimap_s", "minimap_v")]:
+            h = feats.get(kh, 0);
+            sat = feats.get(ks, 0);
+            v = feats.get(kv, 0)
+            ins(f"  {name:<10} H={h:5.1f} S={sat:5.1f} V={v:5.1f}\n", "mean")
+
+    def _fill_scores(s, db_pred, db_conf, db_details, feats):
+        s.score_text.delete("1.0", END)
+        for tg, cl in [("info", P["info"]), ("success", P["ok"]), ("header", P["accent"]),
+                       ("accent", P["accent"]), ("dim", P["t2"]), ("warn", P["warn"])]:
+            s.score_text.tag_config(tg, foreground=cl)
+
+        def ins(txt, tag="dim"):
+            s.score_text.insert(END, txt, tag)
+
+        db = s.location_db;
+        total = len(db.get("samples", []))
+        ins(f"БД примеров: {total}\n", "info")
+        ins(f"Предсказание: {db_pred} (уверенность={db_conf:.4f})\n\n", "success")
+
+        if "scores" in db_details:
+            ins("Скоры по локациям:\n", "header")
+            for loc, sc in sorted(db_details["scores"].items(), key=lambda x: -x[1]):
+                bar = "█" * int(sc * 20)
+                ins(f"  {loc:<12} {sc:.4f} {bar}\n", "accent")
+
+        ins("\nКол-во примеров:\n", "header")
+        by_loc = {}
+        for sample in db.get("samples", []):
+            loc = sample.get("location", "?")
+            by_loc[loc] = by_loc.get(loc, 0) + 1
+        for loc, cnt in sorted(by_loc.items(), key=lambda x: -x[1]):
+            ins(f"  {loc}: {cnt}\n", "dim")
+
+        if db_pred in db.get("feature_ranges", {}):
+            ins(f"\nДиапазоны {db_pred}:\n", "header")
+            ranges = db["feature_ranges"][db_pred]
+            for k in ["elsh_floor", "elsh_wall_or", "elsh_beds", "paleto_floor",
+                      "paleto_wall_dark", "sandy_floor", "sandy_door", "sandy_mm"]:
+                if k in ranges:
+                    r = ranges[k];
+                    cur = feats.get(k, 0)
+                    ok = "✓" if r["min"] <= cur <= r["max"] else "✗"
+                    ins(f"  {ok} {k:<22} [{r['min']:.4f}–{r['max']:.4f}] сред={r['mean']:.4f} | тек={cur:.4f}\n", "dim")
+
+    def _fill_diag(s, diag_lines):
+        s.diag_text.delete("1.0", END)
+        for tg, cl in [("c", P["accent"]), ("t", P["info"]), ("r", P["ok"]), ("d", P["t2"]), ("e", P["err"]),
+                       ("g", P["gold"])]:
+            s.diag_text.tag_config(tg, foreground=cl)
+        for line in diag_lines:
+            if "[признаки]" in line or "[c]" in line:
+                tag = "c"
+            elif "[триг]" in line:
+                tag = "t"
+            elif "[результат]" in line:
+                tag = "r"
+            elif "[бд]" in line:
+                tag = "g"
+            elif "ошибка" in line.lower():
+                tag = "e"
+            else:
+                tag = "d"
+            s.diag_text.insert(END, line + "\n", tag)
+
+    def _teach(s):
+        correct_loc = s.loc_var.get()
+        if not s.features: s.log_fn("  Дождитесь анализа", "warning"); return
+        add_location_sample(s.location_db, s.features, correct_loc, s.fp.name)
+        s.log_fn(f"  Обучение: {s.fp.name} → {correct_loc}", "success")
+        s.log_fn(f"  Всего в БД: {len(s.location_db['samples'])}", "info")
+        s._update_db_stat()
+        db_pred, db_conf, db_details = predict_location_from_db(s.location_db, s.features)
+        s.after(0, lambda: s._fill_scores(db_pred, db_conf, db_details, s.features))
+
+    def _copy_for_analysis(s):
+        if not s.features: return
+        lines = [f"=== АНАЛИТИКА: {s.fp.name} ===",
+                 f"Размер: {s.features.get('img_w', 0)}x{s.features.get('img_h', 0)}", "",
+                 "--- КЛЮЧЕВЫЕ ПРИЗНАКИ ---"]
+        for group, keys in [("ELSH", ["elsh_floor", "elsh_wall_or", "elsh_beds", "elsh_clothes", "elsh_lamp"]),
+                            ("PALETO", ["paleto_floor", "paleto_wall_dark", "paleto_wall_blue", "paleto_sky"]),
+                            ("SANDY", ["sandy_floor", "sandy_wall", "sandy_floor_br", "sandy_door", "sandy_mm"])]:
+            lines.append(f"\n{group}:")
+            for k in keys: lines.append(f"  {k} = {s.features.get(k, 0):.6f}")
+        lines.append("\nСРЕДНИЕ HSV:")
+        for zone in ["floor", "wall_l", "wall_r", "ceiling", "center"]:
+            h = s.features.get(f"{zone}_h", 0);
+            sat = s.features.get(f"{zone}_s", 0);
+            v = s.features.get(f"{zone}_v", 0)
+            lines.append(f"  {zone}: H={h:.1f} S={sat:.1f} V={v:.1f}")
+        if s.result:
+            lines.append(f"\nРЕЗУЛЬТАТ: {s.result.cat.value} | {s.result.hosp.value} | {s.result.method}")
+        text = "\n".join(lines)
+        s.clipboard_clear();
+        s.clipboard_append(text)
+        s.log_fn("  Скопировано", "success")
+
+    def _save_json(s):
+        if not s.features: return
+        fp = filedialog.asksaveasfilename(defaultextension=".json",
+                                          initialfile=f"analytics_{s.fp.stem}.json", filetypes=[("JSON", "*.json")])
+        if fp:
+            data = {"file": s.fp.name, "features": s.features,
+                    "result": {"cat": s.result.cat.value if s.result else "",
+                               "hosp": s.result.hosp.value if s.result else "",
+                               "method": s.result.method if s.result else "",
+                               "ok": s.result.ok if s.result else False}}
+            Path(fp).write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+            s.log_fn(f"  Сохранено: {fp}", "success")
+
+
+# ═══════════════════════════════════════════
+#  ОВЕРЛЕЙ СКРИНШОТЕРА
+# ═══════════════════════════════════════════
+
+class ScreenshotOverlay(ctk.CTkToplevel):
+    """Оверлей для быстрого создания скриншотов."""
+
+    def __init__(self, parent, log_fn=None):
+        super().__init__(parent)
+
+        self.parent = parent
+        self.log_fn = log_fn or print
+        self._is_visible = True
+        self._is_selecting_hospital = False
+        self._drag_data = {"x": 0, "y": 0, "dragging": False}
+        self._hotkey_ids = []
+        self._session_start = None
+        self._timer_running = False
+        self._sorting = False
+        self._sort_stop = threading.Event()
+
+        # Счётчики
+        self.counters = {"TAB": 0, "VAC": 0, "PMP": 0}
+
+        # Текущие настройки
+        self.current_hospital = "ELSH"
+        self.current_category = "TAB"
+        self.current_time_of_day = "day"
+        self.common_folder_mode = False
+        self.screenshot_folder = ""
+        self._filename_format = "category"
+
+        # Настройки горячих клавиш
+        self.hotkeys = {
+            "toggle_overlay": "ctrl+alt",
+            "screenshot": "f6",
+            "select_hospital": "f7"
+        }
+
+        # Загрузить настройки
+        self._load_settings()
+
+        # Настройка окна
+        self.title("Majestic Screenshoter")
+        self.configure(fg_color=P["bg"])
+        self.attributes("-topmost", True)
+        self.attributes("-alpha", 0.90)
+        self.overrideredirect(False)
+
+        # Размеры
+        self.minsize(300, 450)
+
+        # Позиция
+        sw = self.winfo_screenwidth()
+        sh = self.winfo_screenheight()
+        x = self._settings.get("position", {}).get("x", sw - 320)
+        y = self._settings.get("position", {}).get("y", sh - 550)
+        self.geometry(f"310x500+{x}+{y}")
+
+        # Построить интерфейс
+        self._build()
+
+        # Привязки для перетаскивания
+        self.bind("<Button-1>", self._on_drag_start)
+        self.bind("<B1-Motion>", self._on_drag_motion)
+        self.bind("<ButtonRelease-1>", self._on_drag_end)
+
+        # Регистрация горячих клавиш
+        self._register_hotkeys()
+
+        # При закрытии
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        self.log_fn("  📸 Оверлей запущен", "success")
+
+    def _load_settings(self):
+        """Загружает настройки оверлея."""
+        self._settings = {}
+        if OVERLAY_SETTINGS_FILE.exists():
+            try:
+                self._settings = json.loads(
+                    OVERLAY_SETTINGS_FILE.read_text(encoding="utf-8"))
+
+                # Восстанавливаем настройки
+                self.hotkeys = self._settings.get("hotkeys", self.hotkeys)
+                self.current_hospital = self._settings.get("last_hospital", "ELSH")
+                self.current_category = self._settings.get("last_category", "TAB")
+                self.current_time_of_day = self._settings.get("last_time_of_day", "day")
+                self.screenshot_folder = self._settings.get("last_folder", "")
+                self.counters = self._settings.get("counters", self.counters)
+                self._filename_format = self._settings.get("filename_format", "category")
+
+            except Exception as e:
+                print(f"[OVERLAY] Ошибка загрузки настроек: {e}")
+
+    def _save_settings(self):
+        """Сохраняет настройки оверлея."""
+        try:
+            self._settings.update({
+                "position": {"x": self.winfo_x(), "y": self.winfo_y()},
+                "size": {"width": self.winfo_width(), "height": self.winfo_height()},
+                "hotkeys": self.hotkeys,
+                "last_hospital": self.current_hospital,
+                "last_category": self.current_category,
+                "last_time_of_day": self.current_time_of_day,
+                "last_folder": self.screenshot_folder,
+                "counters": self.counters,
+                "filename_format": self._filename_format,
+                "opacity": self.attributes("-alpha"),
+                "show_close_button": getattr(self, '_show_close_btn', False)
+            })
+            OVERLAY_SETTINGS_FILE.write_text(
+                json.dumps(self._settings, indent=2, ensure_ascii=False),
+                encoding="utf-8"
+            )
+        except Exception as e:
+            print(f"[OVERLAY] Ошибка сохранения настроек: {e}")
+
+    def _build(self):
+        """Строит интерфейс оверлея."""
+
+        # Основной контейнер со скроллом
+        self.main_frame = ctk.CTkScrollableFrame(
+            self, fg_color="transparent",
+            scrollbar_button_color=P["border"],
+            scrollbar_button_hover_color=P["accent"]
+        )
+        self.main_frame.pack(fill="both", expand=True, padx=6, pady=6)
+
+        # ══ Заголовок ══
+        header = ctk.CTkFrame(self.main_frame, fg_color=P["card"],
+                              corner_radius=8, height=36)
+        header.pack(fill="x", pady=(0, 6))
+        header.pack_propagate(False)
+
+        ctk.CTkLabel(
+            header, text="📸 Majestic Screenshoter",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=P["accent"]
+        ).pack(side="left", padx=10, pady=6)
+
+        # Кнопка настроек
+        self.settings_btn = ctk.CTkButton(
+            header, text="⚙️", width=28, height=28,
+            fg_color="transparent", hover_color=P["bh"],
+            text_color=P["t2"], font=ctk.CTkFont(size=14),
+            command=self._open_settings
+        )
+        self.settings_btn.pack(side="right", padx=4, pady=4)
+
+        # Кнопка закрытия (скрыта по умолчанию)
+        self._show_close_btn = self._settings.get("show_close_button", False)
+        self.close_btn = ctk.CTkButton(
+            header, text="✕", width=28, height=28,
+            fg_color="transparent", hover_color=P["red"],
+            text_color=P["t2"], font=ctk.CTkFont(size=14),
+            command=self._on_close
+        )
+        if self._show_close_btn:
+            self.close_btn.pack(side="right", padx=(0, 4), pady=4)
+
+        # ══ Выбор папки ══
+        folder_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        folder_frame.pack(fill="x", pady=(0, 6))
+
+        ctk.CTkLabel(
+            folder_frame, text="📁 Папка для скринов:",
+            font=ctk.CTkFont(size=10), text_color=P["t2"]
+        ).pack(anchor="w", padx=8, pady=(6, 2))
+
+        folder_row = ctk.CTkFrame(folder_frame, fg_color="transparent")
+        folder_row.pack(fill="x", padx=8, pady=(0, 6))
+
+        self.folder_entry = ctk.CTkEntry(
+            folder_row, height=28,
+            fg_color=P["entry"], border_color=P["border"],
+            text_color=P["text"], font=ctk.CTkFont(size=9),
+            placeholder_text="Выберите папку..."
+        )
+        self.folder_entry.pack(side="left", fill="x", expand=True, padx=(0, 4))
+
+        if self.screenshot_folder:
+            self.folder_entry.insert(0, self.screenshot_folder)
+
+        ctk.CTkButton(
+            folder_row, text="...", width=32, height=28,
+            fg_color=P["entry"], hover_color=P["bh"],
+            border_width=1, border_color=P["border"],
+            text_color=P["t2"], font=ctk.CTkFont(size=10),
+            command=self._select_folder
+        ).pack(side="right")
+
+        # ══ Выбор больницы ══
+        hospital_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        hospital_frame.pack(fill="x", pady=(0, 6))
+
+        ctk.CTkLabel(
+            hospital_frame, text="Больница (F7 для выбора):",
+            font=ctk.CTkFont(size=10), text_color=P["t2"]
+        ).pack(anchor="w", padx=8, pady=(6, 2))
+
+        hospital_row = ctk.CTkFrame(hospital_frame, fg_color="transparent")
+        hospital_row.pack(fill="x", padx=8, pady=(0, 6))
+
+        ctk.CTkButton(
+            hospital_row, text="◀", width=30, height=30,
+            fg_color=P["entry"], hover_color=P["bh"],
+            text_color=P["t2"], font=ctk.CTkFont(size=12),
+            command=lambda: self._change_hospital(-1)
+        ).pack(side="left")
+
+        self.hospital_label = ctk.CTkLabel(
+            hospital_row, text="🏥 ELSH",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color=P["accent"]
+        )
+        self.hospital_label.pack(side="left", fill="x", expand=True)
+
+        ctk.CTkButton(
+            hospital_row, text="▶", width=30, height=30,
+            fg_color=P["entry"], hover_color=P["bh"],
+            text_color=P["t2"], font=ctk.CTkFont(size=12),
+            command=lambda: self._change_hospital(1)
+        ).pack(side="right")
+
+        self._update_hospital_display()
+
+        # ══ Выбор категории ══
+        category_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        category_frame.pack(fill="x", pady=(0, 6))
+
+        ctk.CTkLabel(
+            category_frame, text="Категория:",
+            font=ctk.CTkFont(size=10), text_color=P["t2"]
+        ).pack(anchor="w", padx=8, pady=(6, 2))
+
+        cat_row = ctk.CTkFrame(category_frame, fg_color="transparent")
+        cat_row.pack(fill="x", padx=8, pady=(0, 6))
+
+        self.cat_buttons = {}
+        cat_data = [
+            ("TAB", "💊 Табл", P["accent"]),
+            ("VAC", "💉 Вакц", P["blue"]),
+            ("PMP", "🚑 ПМП", P["orange"])
+        ]
+
+        for cat_id, cat_text, cat_color in cat_data:
+            btn = ctk.CTkButton(
+                cat_row, text=cat_text, height=32,
+                fg_color=P["entry"], hover_color=cat_color,
+                border_width=2, border_color=P["border"],
+                text_color=P["text"], font=ctk.CTkFont(size=10, weight="bold"),
+                command=lambda c=cat_id: self._select_category(c)
+            )
+            btn.pack(side="left", fill="x", expand=True, padx=1)
+            self.cat_buttons[cat_id] = (btn, cat_color)
+
+        self._update_category_display()
+
+        # ══ День/Ночь ══
+        time_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        time_frame.pack(fill="x", pady=(0, 6))
+
+        time_row = ctk.CTkFrame(time_frame, fg_color="transparent")
+        time_row.pack(fill="x", padx=8, pady=6)
+
+        ctk.CTkLabel(
+            time_row, text="☀️ День",
+            font=ctk.CTkFont(size=10), text_color=P["text"]
+        ).pack(side="left")
+
+        self.time_switch = ctk.CTkSwitch(
+            time_row, text="", width=46, height=22,
+            progress_color=P["purple"],
+            button_color=P["text"],
+            command=self._toggle_time
+        )
+        self.time_switch.pack(side="left", padx=10)
+
+        if self.current_time_of_day == "night":
+            self.time_switch.select()
+
+        ctk.CTkLabel(
+            time_row, text="🌙 Ночь",
+            font=ctk.CTkFont(size=10), text_color=P["text"]
+        ).pack(side="left")
+
+        # ══ Режим "В общую папку" ══
+        common_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        common_frame.pack(fill="x", pady=(0, 6))
+
+        common_row = ctk.CTkFrame(common_frame, fg_color="transparent")
+        common_row.pack(fill="x", padx=8, pady=6)
+
+        ctk.CTkLabel(
+            common_row, text="📁 В общую папку:",
+            font=ctk.CTkFont(size=10), text_color=P["text"]
+        ).pack(side="left")
+
+        self.common_switch = ctk.CTkSwitch(
+            common_row, text="", width=46, height=22,
+            progress_color=P["gold"],
+            button_color=P["text"],
+            command=self._toggle_common_folder
+        )
+        self.common_switch.pack(side="right")
+
+        # ══ Кнопка скриншота ══
+        self.screenshot_btn = ctk.CTkButton(
+            self.main_frame, text="📸 СКРИНШОТ (F6)",
+            height=45,
+            fg_color=P["accent"], hover_color=P["ah"],
+            text_color="#fff",
+            font=ctk.CTkFont(size=14, weight="bold"),
+            corner_radius=10,
+            command=self._take_screenshot
+        )
+        self.screenshot_btn.pack(fill="x", pady=(0, 6))
+
+        # ══ Счётчики ══
+        stats_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        stats_frame.pack(fill="x", pady=(0, 6))
+
+        self.counters_label = ctk.CTkLabel(
+            stats_frame,
+            text="💊 0  💉 0  🚑 0  │  Всего: 0",
+            font=ctk.CTkFont(size=11, weight="bold"),
+            text_color=P["text"]
+        )
+        self.counters_label.pack(padx=8, pady=4)
+
+        self.timer_label = ctk.CTkLabel(
+            stats_frame,
+            text="⏱ 00:00:00",
+            font=ctk.CTkFont(size=10),
+            text_color=P["dim"]
+        )
+        self.timer_label.pack(padx=8, pady=(0, 4))
+
+        self._update_counters_display()
+
+        # ══ Мини-лог ══
+        log_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        log_frame.pack(fill="x", pady=(0, 6))
+
+        ctk.CTkLabel(
+            log_frame, text="Последние:",
+            font=ctk.CTkFont(size=9), text_color=P["dim"]
+        ).pack(anchor="w", padx=8, pady=(4, 0))
+
+        self.mini_log = ctk.CTkLabel(
+            log_frame, text="—",
+            font=ctk.CTkFont(size=9, family="Consolas"),
+            text_color=P["t2"], justify="left", anchor="w"
+        )
+        self.mini_log.pack(fill="x", padx=8, pady=(0, 4))
+
+        self._log_entries = []
+
+        # ══ Автосортировка ══
+        sort_frame = ctk.CTkFrame(self.main_frame, fg_color=P["card"], corner_radius=8)
+        sort_frame.pack(fill="x", pady=(0, 6))
+
+        self.sort_btn = ctk.CTkButton(
+            sort_frame, text="🔄 Сортировать",
+            height=34,
+            fg_color=P["blue"], hover_color="#2563EB",
+            text_color="#fff",
+            font=ctk.CTkFont(size=11, weight="bold"),
+            command=self._start_sorting
+        )
+        self.sort_btn.pack(fill="x", padx=8, pady=(6, 4))
+
+        self.sort_progress = ctk.CTkProgressBar(
+            sort_frame, height=6,
+            progress_color=P["accent"],
+            fg_color=P["entry"]
+        )
+        self.sort_progress.pack(fill="x", padx=8, pady=(0, 4))
+        self.sort_progress.set(0)
+
+        self.sort_status = ctk.CTkLabel(
+            sort_frame, text="",
+            font=ctk.CTkFont(size=9), text_color=P["dim"]
+        )
+        self.sort_status.pack(padx=8, pady=(0, 6))
+
+        # ══ Подпись ══
+        ctk.CTkLabel(
+            self.main_frame, text="create Orange",
+            font=ctk.CTkFont(size=9), text_color=P["dim"]
+        ).pack(anchor="w", pady=(4, 0))
+
+    def _select_folder(self):
+        """Выбор папки для скриншотов."""
+        folder = filedialog.askdirectory(title="Папка для скриншотов")
+        if folder:
+            self.screenshot_folder = folder
+            self.folder_entry.delete(0, END)
+            self.folder_entry.insert(0, folder)
+            self._save_settings()
+
+    def _ensure_folder(self):
+        """Проверяет/создаёт папку для скриншотов."""
+        if not self.screenshot_folder:
+            # Создаём папку на рабочем столе
+            desktop = Path.home() / "Desktop"
+            self.screenshot_folder = str(desktop / "MajesticScreenshots")
+            Path(self.screenshot_folder).mkdir(parents=True, exist_ok=True)
+
+            self.folder_entry.delete(0, END)
+            self.folder_entry.insert(0, self.screenshot_folder)
+
+            self._add_to_log(f"📁 Создана: {Path(self.screenshot_folder).name}")
+            self.log_fn(f"  📁 Создана папка: {self.screenshot_folder}", "info")
+
+            # Звук уведомления
+            try:
+                if winsound:
+                    winsound.MessageBeep(winsound.MB_ICONASTERISK)
+            except:
+                pass
+
+            self._save_settings()
+
+        # Создаём папку если не существует
+        Path(self.screenshot_folder).mkdir(parents=True, exist_ok=True)
+        return self.screenshot_folder
+
+    def _change_hospital(self, direction):
+        """Меняет больницу."""
+        hospitals = ["ELSH", "Sandy", "Paleto"]
+        current_idx = hospitals.index(self.current_hospital)
+        new_idx = (current_idx + direction) % len(hospitals)
+        self.current_hospital = hospitals[new_idx]
+        self._update_hospital_display()
+        self._save_settings()
+
+    def _update_hospital_display(self):
+        """Обновляет отображение больницы."""
+        icons = {"ELSH": "🏥", "Sandy": "🏜", "Paleto": "🌊"}
+        colors = {"ELSH": P["accent"], "Sandy": P["gold"], "Paleto": P["purple"]}
+
+        icon = icons.get(self.current_hospital, "🏥")
+        color = colors.get(self.current_hospital, P["accent"])
+
+        self.hospital_label.configure(
+            text=f"{icon} {self.current_hospital}",
+            text_color=color
+        )
+
+    def _select_category(self, category):
+        """Выбирает категорию."""
+        self.current_category = category
+        self._update_category_display()
+        self._save_settings()
+
+    def _update_category_display(self):
+        """Обновляет отображение категории."""
+        for cat_id, (btn, color) in self.cat_buttons.items():
+            if cat_id == self.current_category:
+                btn.configure(fg_color=color, border_color=color)
+            else:
+                btn.configure(fg_color=P["entry"], border_color=P["border"])
+
+    def _toggle_time(self):
+        """Переключает день/ночь."""
+        self.current_time_of_day = "night" if self.time_switch.get() else "day"
+        self._save_settings()
+
+    def _toggle_common_folder(self):
+        """Переключает режим общей папки."""
+        self.common_folder_mode = self.common_switch.get()
+        self._save_settings()
+
+    def _update_counters_display(self):
+        """Обновляет отображение счётчиков."""
+        tab = self.counters.get("TAB", 0)
+        vac = self.counters.get("VAC", 0)
+        pmp = self.counters.get("PMP", 0)
+        total = tab + vac + pmp
+
+        self.counters_label.configure(
+            text=f"💊 {tab}  💉 {vac}  🚑 {pmp}  │  Всего: {total}"
+        )
+
+    def _add_to_log(self, message):
+        """Добавляет сообщение в мини-лог."""
+        self._log_entries.insert(0, message)
+        self._log_entries = self._log_entries[:3]  # Максимум 3 записи
+
+        self.mini_log.configure(text="\n".join(self._log_entries))
+
+    def _start_timer(self):
+        """Запускает таймер сессии."""
+        if not self._timer_running:
+            self._session_start = time.time()
+            self._timer_running = True
+            self._update_timer()
+
+    def _update_timer(self):
+        """Обновляет таймер."""
+        if self._timer_running and self._session_start:
+            elapsed = int(time.time() - self._session_start)
+            hours = elapsed // 3600
+            minutes = (elapsed % 3600) // 60
+            seconds = elapsed % 60
+
+            self.timer_label.configure(
+                text=f"⏱ {hours:02d}:{minutes:02d}:{seconds:02d}"
+            )
+
+            self.after(1000, self._update_timer)
+
+    def _take_screenshot(self):
+        """Делает скриншот."""
+        try:
+            # Запускаем таймер при первом скрине
+            self._start_timer()
+
+            # Получаем папку
+            folder = self._ensure_folder()
+
+            # Скрываем оверлей
+            self.withdraw()
+            self.update()
+            time.sleep(0.05)  # Небольшая задержка
+
+            # Делаем скриншот
+            with mss.mss() as sct:
+                monitor = sct.monitors[1]  # Основной монитор
+                screenshot = sct.grab(monitor)
+
+                # Формируем имя файла
+                now = datetime.datetime.now()
+                date_str = now.strftime("%d.%m.%Y_%H-%M-%S")
+                time_only = now.strftime("%H-%M-%S")
+
+                if self.common_folder_mode:
+                    # В общую папку — используем выбранный формат
+                    if self._filename_format == "time":
+                        filename = f"{time_only}.png"
+                    elif self._filename_format == "date":
+                        filename = f"{date_str}.png"
+                    else:  # category
+                        time_suffix = "День" if self.current_time_of_day == "day" else "Ночь"
+                        filename = f"{self.current_category}_{self.current_hospital}_{time_suffix}_{date_str}.png"
+                    save_path = Path(folder) / filename
+                else:
+                    # С сортировкой по папкам
+                    time_suffix = "День" if self.current_time_of_day == "day" else "Ночь"
+
+                    if self._filename_format == "time":
+                        filename = f"{time_only}.png"
+                    elif self._filename_format == "date":
+                        filename = f"{date_str}.png"
+                    else:  # category
+                        filename = f"{self.current_category}_{self.current_hospital}_{time_suffix}_{date_str}.png"
+
+                    # Определяем подпапку
+                    cat_names = {"TAB": "Таблетки", "VAC": "Вакцины", "PMP": "ПМП"}
+                    cat_name = cat_names.get(self.current_category, "Другое")
+
+                    if self.current_category == "PMP":
+                        if self.current_hospital == "ELSH":
+                            subfolder = "ПМП - Город"
+                        else:
+                            subfolder = "ПМП - Пригород"
+                    else:
+                        hosp_names = {"ELSH": "ELSH", "Sandy": "Sandy Shores", "Paleto": "Paleto Bay"}
+                        hosp_name = hosp_names.get(self.current_hospital, self.current_hospital)
+                        subfolder = f"{cat_name} - {hosp_name}"
+
+                    if self.current_time_of_day == "night":
+                        subfolder += " [НОЧЬ]"
+
+                    save_dir = Path(folder) / subfolder
+                    save_dir.mkdir(parents=True, exist_ok=True)
+                    save_path = save_dir / filename
+
+                # Сохраняем
+                mss.tools.to_png(screenshot.rgb, screenshot.size, output=str(save_path))
+
+            # Показываем оверлей
+            self.deiconify()
+
+            # Обновляем счётчик
+            self.counters[self.current_category] = self.counters.get(self.current_category, 0) + 1
+            self._update_counters_display()
+
+            # Добавляем в лог
+            self._add_to_log(f"✓ {filename[:40]}...")
+
+            # Звук
+            try:
+                if winsound:
+                    winsound.PlaySound("SystemAsterisk", winsound.SND_ALIAS | winsound.SND_ASYNC)
+            except:
+                pass
+
+            self._save_settings()
+
+        except Exception as e:
+            self.deiconify()
+            self._add_to_log(f"❌ Ошибка: {str(e)[:30]}")
+            self.log_fn(f"  ❌ Ошибка скриншота: {e}", "error")
+
+    def _start_sorting(self):
+        """Запускает сортировку."""
+        if self._sorting:
+            self._sort_stop.set()
+            return
+
+        folder = self.folder_entry.get().strip()
+        if not folder or not Path(folder).exists():
+            self._add_to_log("❌ Укажите папку")
+            return
+
+        # Ищем файлы для сортировки
+        files = list(Path(folder).glob("*.png"))
+        unsorted_files = [f for f in files if not any(
+            sub in str(f.parent) for sub in ["Таблетки", "Вакцины", "ПМП"]
+        )]
+
+        if not unsorted_files:
+            self._add_to_log("ℹ️ Нечего сортировать")
+            return
+
+        self._sorting = True
+        self._sort_stop.clear()
+        self.sort_btn.configure(text="⏹ Отмена")
+
+        threading.Thread(
+            target=self._do_sorting,
+            args=(folder, unsorted_files),
+            daemon=True
+        ).start()
+
+    def _do_sorting(self, folder, files):
+        """Выполняет сортировку."""
+        total = len(files)
+        done = 0
+
+        # Создаём анализатор
+        cfg = Config()
+        az = Analyzer(cfg, require_bodycam=False)
+        names = DestIndex(folder)
+
+        for i, fp in enumerate(files):
+            if self._sort_stop.is_set():
+                break
+
+            az.images.prefetch(files[i + 1:i + 3])
+            try:
+                result = az.run(fp, wd=False)
+
+                if result.ok:
+                    # Свободное имя в папке результата — из индекса, без перебора на диске
+                    dest = names.reserve(result.folder, fp.name)
+                    try:
+                        shutil.move(str(fp), str(dest))
+                    except Exception:
+                        names.release(result.folder, dest)
+                        raise
+
+            except Exception as e:
+                print(f"[OVERLAY] Ошибка сортировки {fp.name}: {e}")
+
+            done += 1
+            progress = done / total
+
+            self.after(0, lambda p=progress, d=done, t=total:
+            self._update_sort_progress(p, d, t))
+
+        self.after(0, self._sorting_done)
+
+    def _update_sort_progress(self, progress, done, total):
+        """Обновляет прогресс сортировки."""
+        self.sort_progress.set(progress)
+        self.sort_status.configure(text=f"{done}/{total}")
+
+    def _sorting_done(self):
+        """Завершение сортировки."""
+        self._sorting = False
+        self.sort_btn.configure(text="🔄 Сортировать")
+        self.sort_status.configure(text="✅ Готово!")
+        self._add_to_log("✅ Сортировка завершена")
+
+        # Звук
+        try:
+            if winsound:
+                winsound.MessageBeep(winsound.MB_ICONASTERISK)
+        except:
+            pass
+
+        # Уведомление если скрыт
+        if not self._is_visible and PLYER_OK:
+            try:
+                _notify.notify(
+                    title="Сортировка завершена",
+                    message="Все скрины рассортированы!",
+                    timeout=3
+                )
+            except:
+                pass
+
+    def _register_hotkeys(self):
+        """Регистрирует горячие клавиши."""
+        if not KEYBOARD_OK:
+            return
+
+        try:
+            # Очищаем старые
+            for hk_id in self._hotkey_ids:
+                try:
+                    keyboard.remove_hotkey(hk_id)
+                except:
+                    pass
+            self._hotkey_ids = []
+
+            # Регистрируем новые
+            hk1 = keyboard.add_hotkey(
+                self.hotkeys.get("toggle_overlay", "ctrl+alt"),
+                self._toggle_visibility
+            )
+            self._hotkey_ids.append(hk1)
+
+            hk2 = keyboard.add_hotkey(
+                self.hotkeys.get("screenshot", "f6"),
+                self._take_screenshot
+            )
+            self._hotkey_ids.append(hk2)
+
+            hk3 = keyboard.add_hotkey(
+                self.hotkeys.get("select_hospital", "f7"),
+                self._on_hospital_hotkey
+            )
+            self._hotkey_ids.append(hk3)
+
+        except Exception as e:
+            print(f"[OVERLAY] Ошибка регистрации горячих клавиш: {e}")
+
+    def _on_hospital_hotkey(self):
+        """Обработка горячей клавиши выбора больницы."""
+        if self._is_selecting_hospital:
+            self._is_selecting_hospital = False
+        else:
+            self._is_selecting_hospital = True
+            # Слушаем стрелки
+            keyboard.on_press_key("left", lambda _: self._change_hospital(-1))
+            keyboard.on_press_key("right", lambda _: self._change_hospital(1))
+
+    def _toggle_visibility(self):
+        """Показывает/скрывает оверлей."""
+        if self._is_visible:
+            self.withdraw()
+            self._is_visible = False
+        else:
+            self.deiconify()
+            self._is_visible = True
+
+    def _open_settings(self):
+        """Открывает окно настроек."""
+        OverlaySettingsWindow(self, self.hotkeys, self._on_settings_save)
+
+    def _on_settings_save(self, new_hotkeys, show_close):
+        """Callback сохранения настроек."""
+        self.hotkeys = new_hotkeys
+        self._show_close_btn = show_close
+
+        if show_close:
+            self.close_btn.pack(side="right", padx=(0, 4), pady=4)
+        else:
+            self.close_btn.pack_forget()
+
+        self._register_hotkeys()
+        self._save_settings()
+
+    # ══ Перетаскивание ══
+    def _on_drag_start(self, event):
+        self._drag_data["x"] = event.x
+        self._drag_data["y"] = event.y
+        self._drag_data["dragging"] = True
+
+    def _on_drag_motion(self, event):
+        if self._drag_data["dragging"]:
+            x = self.winfo_x() + event.x - self._drag_data["x"]
+            y = self.winfo_y() + event.y - self._drag_data["y"]
+            self.geometry(f"+{x}+{y}")
+
+    def _on_drag_end(self, event):
+        self._drag_data["dragging"] = False
+        self._save_settings()
+
+    def _on_close(self):
+        """Закрытие оверлея."""
+        # Убираем горячие клавиши
+        if KEYBOARD_OK:
+            for hk_id in self._hotkey_ids:
+                try:
+                    keyboard.remove_hotkey(hk_id)
+                except:
+                    pass
+
+        self._save_settings()
+        self.destroy()
+
+        # Обновляем статус в основном приложении
+        if hasattr(self.parent, '_overlay_closed'):
+            self.parent._overlay_closed()
+
+        self.log_fn("  📸 Оверлей закрыт", "info")
+
+    def reset_counters(self):
+        """Сбрасывает счётчики."""
+        self.counters = {"TAB": 0, "VAC": 0, "PMP": 0}
+        self._update_counters_display()
+        self._save_settings()
+
+
+class OverlaySettingsWindow(ctk.CTkToplevel):
+    """Окно настроек оверлея."""
+
+    def __init__(self, parent, hotkeys, save_callback):
+        super().__init__(parent)
+
+        self.parent = parent
+        self.hotkeys = hotkeys.copy()
+        self.save_callback = save_callback
+        self._recording_key = None
+        self._recording_button = None
+
+        self.title("Настройки оверлея")
+        self.configure(fg_color=P["bg"])
+        self.transient(parent)
+        self.grab_set()
+
+        # Размеры окна с возможностью изменения
+        self.geometry("450x550")
+        self.minsize(400, 450)
+        self.resizable(True, True)  # Можно менять размер
+
+        self._build()
+
+    def _build(self):
+        # Основной скроллируемый контейнер
+        main_scroll = ctk.CTkScrollableFrame(
+            self, fg_color="transparent",
+            scrollbar_button_color=P["border"],
+            scrollbar_button_hover_color=P["accent"]
+        )
+        main_scroll.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Заголовок
+        ctk.CTkLabel(
+            main_scroll, text="⚙️ Настройки оверлея",
+            font=ctk.CTkFont(size=18, weight="bold"),
+            text_color=P["accent"]
+        ).pack(pady=(0, 16))
+
+        # ══ Горячие клавиши ══
+        hk_frame = ctk.CTkFrame(main_scroll, fg_color=P["card"], corner_radius=10)
+        hk_frame.pack(fill="x", pady=(0, 12))
+
+        ctk.CTkLabel(
+            hk_frame, text="⌨️ Горячие клавиши",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color=P["text"]
+        ).pack(anchor="w", padx=12, pady=(12, 4))
+
+        ctk.CTkLabel(
+            hk_frame, text="Нажмите кнопку и введите комбинацию клавиш",
+            font=ctk.CTkFont(size=9),
+            text_color=P["dim"]
+        ).pack(anchor="w", padx=12, pady=(0, 8))
+
+        self.hk_buttons = {}
+        hk_labels = {
+            "toggle_overlay": "Показать/скрыть оверлей",
+            "screenshot": "Сделать скриншот",
+            "select_hospital": "Выбор больницы"
+        }
+
+        for key, label in hk_labels.items():
+            row = ctk.CTkFrame(hk_frame, fg_color="transparent")
+            row.pack(fill="x", padx=12, pady=4)
+
+            ctk.CTkLabel(
+                row, text=label,
+                font=ctk.CTkFont(size=11),
+                text_color=P["t2"], width=180, anchor="w"
+            ).pack(side="left")
+
+            current_value = self.hotkeys.get(key, "не назначено")
+
+            btn = ctk.CTkButton(
+                row, text=current_value.upper() if current_value else "Нажмите...",
+                width=140, height=32,
+                fg_color=P["entry"], hover_color=P["bh"],
+                border_width=1, border_color=P["border"],
+                text_color=P["text"], font=ctk.CTkFont(size=10),
+                command=lambda k=key: self._start_recording(k)
+            )
+            btn.pack(side="right")
+            self.hk_buttons[key] = btn
+
+        # Кнопка сброса горячих клавиш
+        ctk.CTkButton(
+            hk_frame, text="🔄 Сбросить по умолчанию",
+            height=28,
+            fg_color=P["entry"], hover_color=P["bh"],
+            border_width=1, border_color=P["border"],
+            text_color=P["dim"], font=ctk.CTkFont(size=9),
+            command=self._reset_hotkeys
+        ).pack(fill="x", padx=12, pady=(8, 12))
+
+        # ══ Папка для сортировки ══
+        folder_frame = ctk.CTkFrame(main_scroll, fg_color=P["card"], corner_radius=10)
+        folder_frame.pack(fill="x", pady=(0, 12))
+
+        ctk.CTkLabel(
+            folder_frame, text="📁 Папка для сортировки",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color=P["text"]
+        ).pack(anchor="w", padx=12, pady=(12, 4))
+
+        ctk.CTkLabel(
+            folder_frame, text="Куда будут сохраняться отсортированные скрины",
+            font=ctk.CTkFont(size=9),
+            text_color=P["dim"]
+        ).pack(anchor="w", padx=12, pady=(0, 8))
+
+        folder_row = ctk.CTkFrame(folder_frame, fg_color="transparent")
+        folder_row.pack(fill="x", padx=12, pady=(0, 12))
+
+        self.sort_folder_entry = ctk.CTkEntry(
+            folder_row, height=32,
+            fg_color=P["entry"], border_color=P["border"],
+            text_color=P["text"], font=ctk.CTkFont(size=10),
+            placeholder_text="Папка для сортировки..."
+        )
+        self.sort_folder_entry.pack(side="left", fill="x", expand=True, padx=(0, 8))
+
+        # Заполняем текущее значение
+        current_folder = getattr(self.parent, 'screenshot_folder', '')
+        if current_folder:
+            self.sort_folder_entry.insert(0, current_folder)
+
+        ctk.CTkButton(
+            folder_row, text="📂", width=40, height=32,
+            fg_color=P["entry"], hover_color=P["bh"],
+            border_width=1, border_color=P["border"],
+            text_color=P["text"], font=ctk.CTkFont(size=14),
+            command=self._select_sort_folder
+        ).pack(side="right")
+
+        # ══ Внешний вид ══
+        appearance_frame = ctk.CTkFrame(main_scroll, fg_color=P["card"], corner_radius=10)
+        appearance_frame.pack(fill="x", pady=(0, 12))
+
+        ctk.CTkLabel(
+            appearance_frame, text="🎨 Внешний вид",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color=P["text"]
+        ).pack(anchor="w", padx=12, pady=(12, 8))
+
+        # Прозрачность
+        opacity_row = ctk.CTkFrame(appearance_frame, fg_color="transparent")
+        opacity_row.pack(fill="x", padx=12, pady=(0, 4))
+
+        ctk.CTkLabel(
+            opacity_row, text="Прозрачность:",
+            font=ctk.CTkFont(size=11),
+            text_color=P["t2"]
+        ).pack(side="left")
+
+        self.opacity_value_label = ctk.CTkLabel(
+            opacity_row, text=f"{int(self.parent.attributes('-alpha') * 100)}%",
+            font=ctk.CTkFont(size=11, weight="bold"),
+            text_color=P["accent"]
+        )
+        self.opacity_value_label.pack(side="right")
+
+        self.opacity_slider = ctk.CTkSlider(
+            appearance_frame, from_=0.3, to=1.0,
+            progress_color=P["accent"],
+            button_color=P["text"],
+            button_hover_color=P["accent"]
+        )
+        self.opacity_slider.pack(fill="x", padx=12, pady=(0, 12))
+        self.opacity_slider.set(self.parent.attributes("-alpha"))
+        self.opacity_slider.configure(command=self._on_opacity_change)
+
+        # Кнопка закрытия
+        close_row = ctk.CTkFrame(appearance_frame, fg_color="transparent")
+        close_row.pack(fill="x", padx=12, pady=(0, 12))
+
+        ctk.CTkLabel(
+            close_row, text="Показать кнопку закрытия (X):",
+            font=ctk.CTkFont(size=11),
+            text_color=P["t2"]
+        ).pack(side="left")
+
+        self.close_switch = ctk.CTkSwitch(
+            close_row, text="", width=46, height=22,
+            progress_color=P["accent"],
+            button_color=P["text"]
+        )
+        self.close_switch.pack(side="right")
+
+        if getattr(self.parent, '_show_close_btn', False):
+            self.close_switch.select()
+
+        # ══ Формат имени файла ══
+        filename_frame = ctk.CTkFrame(main_scroll, fg_color=P["card"], corner_radius=10)
+        filename_frame.pack(fill="x", pady=(0, 12))
+
+        ctk.CTkLabel(
+            filename_frame, text="📝 Формат имени файла",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color=P["text"]
+        ).pack(anchor="w", padx=12, pady=(12, 8))
+
+        self.filename_format_var = ctk.StringVar(
+            value=getattr(self.parent, '_filename_format', 'category')
+        )
+
+        formats = [
+            ("category", "По категории: TAB_ELSH_День_15.01.2024_14-30-52.png"),
+            ("date", "По дате: 15.01.2024_14-30-52.png"),
+            ("time", "Только время: 14-30-52.png")
+        ]
+
+        for value, text in formats:
+            ctk.CTkRadioButton(
+                filename_frame, text=text,
+                variable=self.filename_format_var, value=value,
+                font=ctk.CTkFont(size=10),
+                text_color=P["t2"],
+                fg_color=P["accent"],
+                hover_color=P["ah"]
+            ).pack(anchor="w", padx=16, pady=2)
+
+        ctk.CTkFrame(filename_frame, height=8, fg_color="transparent").pack()
+
+        # ══ Кнопки ══
+        btn_frame = ctk.CTkFrame(main_scroll, fg_color="transparent")
+        btn_frame.pack(fill="x", pady=(8, 0))
+
+        ctk.CTkButton(
+            btn_frame, text="Отмена", height=40,
+            fg_color=P["entry"], hover_color=P["bh"],
+            border_width=1, border_color=P["border"],
+            text_color=P["t2"], font=ctk.CTkFont(size=12),
+            command=self.destroy
+        ).pack(side="left", fill="x", expand=True, padx=(0, 6))
+
+        ctk.CTkButton(
+            btn_frame, text="✅ Сохранить", height=40,
+            fg_color=P["accent"], hover_color=P["ah"],
+            text_color="#fff", font=ctk.CTkFont(size=12, weight="bold"),
+            command=self._save
+        ).pack(side="right", fill="x", expand=True, padx=(6, 0))
+
+    def _select_sort_folder(self):
+        """Выбор папки для сортировки."""
+        folder = filedialog.askdirectory(title="Выберите папку для сортировки скринов")
+        if folder:
+            self.sort_folder_entry.delete(0, END)
+            self.sort_folder_entry.insert(0, folder)
+
+    def _start_recording(self, key):
+        """Начинает запись горячей клавиши."""
+        if not KEYBOARD_OK:
+            return
+
+        # Сбрасываем предыдущую запись
+        if self._recording_button:
+            old_key = self._recording_key
+            old_val = self.hotkeys.get(old_key, "не назначено")
+            self._recording_button.configure(
+                text=old_val.upper() if old_val else "Нажмите...",
+                fg_color=P["entry"]
+            )
+
+        self._recording_key = key
+        self._recording_button = self.hk_buttons[key]
+        self._recording_button.configure(
+            text="⏺ Нажмите клавиши...",
+            fg_color=P["orange"]
+        )
+
+        # Записываем нажатие
+        self._recorded_keys = []
+
+        def on_key(event):
+            if event.event_type == 'down':
+                key_name = event.name.lower()
+
+                # Пропускаем модификаторы в отдельности
+                if key_name in ['ctrl', 'alt', 'shift', 'left ctrl', 'right ctrl',
+                                'left alt', 'right alt', 'left shift', 'right shift']:
+                    if key_name not in self._recorded_keys:
+                        if 'left ' in key_name or 'right ' in key_name:
+                            key_name = key_name.split(' ')[1]  # left ctrl -> ctrl
+                        self._recorded_keys.append(key_name)
+                else:
+                    # Основная клавиша
+                    self._recorded_keys.append(key_name)
+                    self._finish_recording()
+                    return False  # Останавливаем запись
+
+        keyboard.hook(on_key)
+
+        # Таймаут на запись
+        self.after(5000, self._cancel_recording)
+
+    def _finish_recording(self):
+        """Завершает запись горячей клавиши."""
+        if not self._recording_key:
+            return
+
+        keyboard.unhook_all()
+
+        if self._recorded_keys:
+            # Формируем комбинацию
+            combo = '+'.join(self._recorded_keys)
+            self.hotkeys[self._recording_key] = combo
+            self._recording_button.configure(
+                text=combo.upper(),
+                fg_color=P["accent"]
+            )
+        else:
+            self._recording_button.configure(
+                text="Нажмите...",
+                fg_color=P["entry"]
+            )
+
+        self._recording_key = None
+        self._recording_button = None
+        self._recorded_keys = []
+
+        # Возвращаем нормальный цвет через секунду
+        self.after(1000, self._reset_button_colors)
+
+    def _cancel_recording(self):
+        """Отменяет запись по таймауту."""
+        if self._recording_key:
+            keyboard.unhook_all()
+            old_val = self.hotkeys.get(self._recording_key, "не назначено")
+            self._recording_button.configure(
+                text=old_val.upper() if old_val else "Нажмите...",
+                fg_color=P["entry"]
+            )
+            self._recording_key = None
+            self._recording_button = None
+
+    def _reset_button_colors(self):
+        """Сбрасывает цвета кнопок."""
+        for btn in self.hk_buttons.values():
+            btn.configure(fg_color=P["entry"])
+
+    def _reset_hotkeys(self):
+        """Сбрасывает горячие клавиши по умолчанию."""
+        defaults = {
+            "toggle_overlay": "ctrl+alt",
+            "screenshot": "f6",
+            "select_hospital": "f7"
+        }
+        self.hotkeys = defaults.copy()
+
+        for key, btn in self.hk_buttons.items():
+            btn.configure(text=defaults[key].upper())
+
+    def _on_opacity_change(self, value):
+        """Обработчик изменения прозрачности."""
+        self.parent.attributes("-alpha", value)
+        self.opacity_value_label.configure(text=f"{int(value * 100)}%")
+
+    def _save(self):
+        """Сохраняет настройки."""
+        show_close = self.close_switch.get()
+
+        # Сохраняем папку
+        sort_folder = self.sort_folder_entry.get().strip()
+        if sort_folder:
+            self.parent.screenshot_folder = sort_folder
+            self.parent.folder_entry.delete(0, END)
+            self.parent.folder_entry.insert(0, sort_folder)
+
+        # Сохраняем формат имени файла
+        self.parent._filename_format = self.filename_format_var.get()
+
+        self.save_callback(self.hotkeys, show_close)
+        self.destroy()
+# ═══════════════════════════════════════════
+#  ГЛАВНОЕ ОКНО
+# ═══════════════════════════════════════════
+_OUT_MODE_NAMES = {"copy": "Копия", "move": "Перенос", "hardlink": "Жёсткая ссылка",
+                   "reflink": "Копия CoW (reflink)", "symlink": "Символьная ссылка"}
+_OUT_SHARD_NAMES = {"": "Нет", "day": "По дням", "week": "По неделям", "month": "По месяцам"}
+
+
+class App(ctk.CTk):
+    def __init__(s):
+        super().__init__()
+        s.title(f"Majestic RP Sorter v{APP_VERSION}")
+        s.minsize(1080, 700)
+        s.configure(fg_color=P["bg"])
+        sw, sh = s.winfo_screenwidth(), s.winfo_screenheight()
+        w = min(1200, sw - 40)
+        h = sh - 80
+        x = (sw - w) // 2
+        y = 10
+        s.geometry(f"{w}x{h}+{x}+{y}")
+        try:
+            s._ico = ImageTk.PhotoImage(_icon());
+            s.iconphoto(True, s._ico)
+        except:
+            pass
+        s.cfg = Config();
+        s.cfg.load_thresholds()
+        s.is_pro = False
+        s.location_db = load_location_db()
+        s.trigger_db = load_trigger_db()
+        s.az = Analyzer(s.cfg, require_bodycam=True,
+                        location_db=s.location_db, trigger_db=s.trigger_db)
+        s.is_proc = False;
+        s.skipped = [];
+        s._stop = threading.Event();
+        s._undo_history = []
+        s.wk_var = ctk.StringVar(value="2");
+        s.dry_var = ctk.BooleanVar(value=False)
+        s.bc_var = ctk.BooleanVar(value=True);
+        s.inc_var = ctk.BooleanVar(value=False);
+        s.rec_var = ctk.BooleanVar(value=False);
+        s.zip_var = ctk.BooleanVar(value=False)
+        s.mode_var = ctk.StringVar(value=_OUT_MODE_NAMES["copy"]);
+        s.virt_var = ctk.BooleanVar(value=False)
+        s.shard_var = ctk.StringVar(value=_OUT_SHARD_NAMES[""])
+        s._wt = None
+        s._settings = load_settings()
+        s._overlay = None
+        s._build()
+        s._setup_log()
+        s._restore_settings()
+        threading.Thread(target=lambda: _ocr.init(s._log), daemon=True).start()
+        if s._overlay and s._overlay.winfo_exists():
+            s._overlay.reset_counters()
+            s._overlay._on_close()
+        s.protocol("WM_DELETE_WINDOW", s._on_close)
+        threading.Thread(target=s._check_updates_background, daemon=True).start()
+
+    def _on_close(s):
+        if s._wt is not None: s._watch_stop()
+        s._save_current_settings()
+        s.cfg.save_thresholds()
+        save_location_db(s.location_db)
+        save_trigger_db(s.trigger_db)
+        s.az.images.shutdown()
+        _ocr_disk_cache.save()
+        _ocr_crop_cache.save()
+        s.destroy()
+
+    def _restore_settings(s):
+        st = s._settings
+        if st.get("last_input"):
+            s.inp_e.delete(0, END)
+            s.inp_e.insert(0, st["last_input"])
+        if st.get("last_output"):
+            s.out_e.delete(0, END)
+            s.out_e.insert(0, st["last_output"])
+        if st.get("workers"):
+            s.wk_var.set(str(st["workers"]))
+        if "require_bodycam" in st:
+            s.bc_var.set(st["require_bodycam"])
+        if "dry_run" in st:
+            s.dry_var.set(st["dry_run"])
+        if "incremental" in st:
+            s.inc_var.set(st["incremental"])
+        if "recursive" in st:
+            s.rec_var.set(st["recursive"])
+        if "zip_out" in st:
+            s.zip_var.set(st["zip_out"])
+        if "virtual" in st:
+            s.virt_var.set(st["virtual"])
+        if st.get("out_mode") in _OUT_MODE_NAMES:
+            s.mode_var.set(_OUT_MODE_NAMES[st["out_mode"]])
+        if st.get("out_shard") in _OUT_SHARD_NAMES:
+            s.shard_var.set(_OUT_SHARD_NAMES[st["out_shard"]])
+        if st.get("window_geometry"):
+            try:
+                s.geometry(st["window_geometry"])
+            except Exception:
+                pass
+
+    def _save_current_settings(s):
+        s._settings.update({
+            "last_input": s.inp_e.get().strip(),
+            "last_output": s.out_e.get().strip(),
+            "workers": int(s.wk_var.get()),
+            "require_bodycam": s.bc_var.get(),
+            "dry_run": s.dry_var.get(),
+            "incremental": s.inc_var.get(),
+            "recursive": s.rec_var.get(),
+            "zip_out": s.zip_var.get(),
+            "out_mode": s._out_mode(),
+            "out_shard": s._out_shard(),
+            "virtual": s.virt_var.get(),
+            "window_geometry": s.geometry(),
+        })
+        save_settings(s._settings)
+
+    def _undo_last(s):
+        if not s._undo_history:
+            s._log("  Нечего отменять", "warning")
+            return
+        src, dst, how = s._undo_history.pop()
+        if not isinstance(dst, Path):
+            s._log(f"  ↩️ {Path(str(dst).split('!')[-1]).name}: уже в архиве — отмена недоступна", "warning")
+            return
+        try:
+            if how == "move":
+                # Перенесённый файл возвращаем на место, а не удаляем
+                if dst.exists() and not src.exists():
+                    shutil.move(str(dst), str(src))
+                    s._log(f"  ↩️ Отменено: {dst.name} возвращён в {src.parent.name}", "info")
+            elif dst.exists() or dst.is_symlink():
+                dst.unlink()
+                s._log(f"  ↩️ Отменено: {dst.name} удалён из {dst.parent.name}", "info")
+        except Exception as e:
+            s._log(f"  ❌ Ошибка отмены: {e}", "error")
+
+    def _activate_pro(s):
+        s._log("", "default")
+        s._log("  💎 PRO версия доступна для покупки", "gold")
+        s._log("  💰 https://www.donationalerts.com/r/orange91323", "accent")
+        webbrowser.open("https://www.donationalerts.com/r/orange91323")
+
+    def _setup_log(s):
+        (DATA_DIR / "logs").mkdir(exist_ok=True)
+        logger.remove()
+        tm = {"info": "info", "success": "success", "warning": "warning",
+              "error": "error", "debug": "dim"}
+
+        def sink(m):
+            s._log(m.record["message"], tm.get(m.record["level"].name.lower(), "default"))
+
+        logger.add(sink, level="INFO")
+        logger.add(DATA_DIR / "logs" / "sorter.log", level="DEBUG", rotation="10 MB", encoding="utf-8")
+
+    def _log(s, msg, lv="default"):
+        def _i():
+            s.log_t.insert(END, msg + "\n", lv)
+            if s._as.get():
+                s.log_t.see(END)
+
+        if threading.current_thread() is threading.main_thread():
+            _i()
+        else:
+            s.after(0, _i)
+
+    def _build(s):
+        # ══ Шапка ══
+        hd = ctk.CTkFrame(s, fg_color=P["card"], corner_radius=0, height=60)
+        hd.pack(fill="x");
+        hd.pack_propagate(False)
+        hi = ctk.CTkFrame(hd, fg_color="transparent");
+        hi.pack(fill="both", expand=True, padx=20)
+        tf = ctk.CTkFrame(hi, fg_color="transparent");
+        tf.pack(side="left", pady=8)
+        ctk.CTkLabel(tf, text=f"Majestic RP Sorter v{APP_VERSION}",
+                     font=ctk.CTkFont(size=16, weight="bold"), text_color=P["text"]).pack(anchor="w")
+        ctk.CTkLabel(tf, text=f"by {APP_AUTHOR}",
+                     font=ctk.CTkFont(size=9), text_color=P["dim"]).pack(anchor="w")
+        rf = ctk.CTkFrame(hi, fg_color="transparent");
+        rf.pack(side="right", pady=8)
+        s.ocr_l = ctk.CTkLabel(rf, text="OCR...", font=ctk.CTkFont(size=9), text_color=P["warn"])
+        s.ocr_l.pack(anchor="e")
+        s.db_l = ctk.CTkLabel(rf, text="", font=ctk.CTkFont(size=9), text_color=P["gold"])
+        s.db_l.pack(anchor="e");
+        s._update_db_label()
+        ctk.CTkFrame(s, height=2, corner_radius=0, fg_color=P["accent"]).pack(fill="x")
+
+        # ══ Донат ══
+        db = ctk.CTkFrame(s, fg_color=P["donate_bg"], corner_radius=0, height=60,
+                          border_width=1, border_color=P["donate_border"])
+        db.pack(fill="x", side="bottom");
+        db.pack_propagate(False)
+        di = ctk.CTkFrame(db, fg_color="transparent");
+        di.pack(fill="both", expand=True, padx=20)
+        dl = ctk.CTkFrame(di, fg_color="transparent");
+        dl.pack(side="left", fill="y", pady=8)
+        ctk.CTkLabel(dl, text=APP_AUTHOR, font=ctk.CTkFont(size=13, weight="bold"),
+                     text_color=P["orange"]).pack(anchor="w")
+        dr = ctk.CTkFrame(di, fg_color="transparent");
+        dr.pack(side="right", fill="y", pady=8)
+        ctk.CTkButton(dr, text="Поддержать автора ❤️", width=200, height=42, fg_color=P["gold"],
+                      hover_color="#FFE033", text_color="#1a1a1a",
+                      font=ctk.CTkFont(size=13, weight="bold"), corner_radius=8,
+                      command=lambda: webbrowser.open(APP_DONATE)).pack(side="right")
+
+        # ══ Основная область ══
+        mn = ctk.CTkFrame(s, fg_color="transparent")
+        mn.pack(fill="both", expand=True, padx=8, pady=6)
+        mn.columnconfigure(0, weight=0, minsize=420);
+        mn.columnconfigure(1, weight=1)
+        mn.rowconfigure(0, weight=1)
+        lp = ctk.CTkScrollableFrame(mn, fg_color="transparent", width=410)
+        lp.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
+
+        # ── Папки ──
+        fc = Sec(lp, "📁 Папки");
+        fc.pack(fill="x", pady=(0, 4))
+        s.inp_e = s._fr(fc.body, "Входная (папка или путь к .zip)", "Выбрать папку...", s._bi)
+        s.out_e = s._fr(fc.body, "Выходная (куда складывать результат)", "Выбрать папку...", s._bo)
+
+        # ── Настройки ──
+        sc2 = Sec(lp, "⚙️ Настройки", P["blue"]);
+        sc2.pack(fill="x", pady=(0, 4))
+        of = ctk.CTkFrame(sc2.body, fg_color="transparent");
+        of.pack(fill="x", padx=12, pady=6)
+
+        f2 = ctk.CTkFrame(of, fg_color="transparent");
+        f2.pack(fill="x", pady=(0, 4))
+        ctk.CTkLabel(f2, text="Потоки (больше = быстрее, но тяжелее для ПК)",
+                     font=ctk.CTkFont(size=10), text_color=P["t2"]).pack(side="left")
+        ctk.CTkOptionMenu(f2, values=["1", "2", "4", "8"], variable=s.wk_var, width=60, height=26,
+                          fg_color=P["entry"], button_color=P["blue"],
+                          dropdown_fg_color=P["card"], text_color=P["text"],
+                          font=ctk.CTkFont(size=10)).pack(side="right")
+        f2 = ctk.CTkFrame(of, fg_color="transparent");
+        f2.pack(fill="x", pady=(0, 4))
+        ctk.CTkLabel(f2, text="Вывод (ссылки и перенос — без копирования байтов)",
+                     font=ctk.CTkFont(size=10), text_color=P["t2"]).pack(side="left")
+        ctk.CTkOptionMenu(f2, values=list(_OUT_MODE_NAMES.values()), variable=s.mode_var, width=150, height=26,
+                          fg_color=P["entry"], button_color=P["blue"],
+                          dropdown_fg_color=P["card"], text_color=P["text"],
+                          font=ctk.CTkFont(size=10)).pack(side="right")
+        f2 = ctk.CTkFrame(of, fg_color="transparent");
+        f2.pack(fill="x", pady=(0, 4))
+        ctk.CTkLabel(f2, text="Подпапки по дате съёмки",
+                     font=ctk.CTkFont(size=10), text_color=P["t2"]).pack(side="left")
+        ctk.CTkOptionMenu(f2, values=list(_OUT_SHARD_NAMES.values()), variable=s.shard_var, width=150, height=26,
+                          fg_color=P["entry"], button_color=P["blue"],
+                          dropdown_fg_color=P["card"], text_color=P["text"],
+                          font=ctk.CTkFont(size=10)).pack(side="right")
+        ctk.CTkButton(of, text="💰 Купить PRO версию", height=28,
+                      fg_color=P["gold"], hover_color="#FFE033",
+                      text_color="#1a1a1a", font=ctk.CTkFont(size=10),
+                      command=lambda: webbrowser.open("https://www.donationalerts.com/r/orange91323")).pack(fill="x",
+                                                                                                            pady=(4, 0))
+        ctk.CTkButton(
+            of,
+            text="🔄 Проверить обновления",
+            height=28,
+            fg_color=P["blue"],
+            hover_color="#2563EB",
+            text_color="#fff",
+            font=ctk.CTkFont(size=10),
+            command=s._check_updates_manual
+        ).pack(fill="x", pady=(4, 0))
+
+        for lbl, var, clr, tip in [
+            ("Требовать боди-кам", s.bc_var, P["bodycam"],
+             "Если вкл — скрины без красной лампочки записи пропускаются"),
+            ("Тест-режим (не копировать файлы)", s.dry_var, P["orange"],
+             "Если вкл — программа покажет что сделает, но файлы не тронет"),
+            ("Инкрементальный (только новые скрины)", s.inc_var, P["blue"],
+             "Если вкл — файлы, разобранные в прошлые запуски в эту же папку, пропускаются"),
+            ("С подпапками", s.rec_var, P["info"],
+             "Если вкл — скрины ищутся и во вложенных папках (выходная папка пропускается)"),
+            ("Выход в ZIP (архив на папку)", s.zip_var, P["gold"],
+             "Если вкл — вместо папок в выходной создаются архивы «Папка.zip»"),
+            ("Виртуально (только база решений)", s.virt_var, P["purple"],
+             "Если вкл — файлы не трогаются, решения пишутся в базу выходной папки; разложить — в Инструментах"),
+        ]:
+            f2 = ctk.CTkFrame(of, fg_color="transparent");
+            f2.pack(fill="x", pady=(0, 4))
+            ctk.CTkLabel(f2, text=lbl, font=ctk.CTkFont(size=10), text_color=P["t2"]).pack(side="left")
+            ctk.CTkSwitch(f2, text="", variable=var, width=42, height=20,
+                          progress_color=clr, button_color=P["text"]).pack(side="right")
+
+        # ── Инструменты ──
+        ac = Sec(lp, "🛠 Инструменты", P["purple"]);
+        ac.pack(fill="x", pady=(0, 4))
+        ab = ctk.CTkFrame(ac.body, fg_color="transparent");
+        ab.pack(fill="x", padx=12, pady=6)
+
+        tools = [
+            ("🔍 Аналитика скриншота", P["purple"], "#C026D3",
+             "Детальный разбор одного скрина: что видит система, какие цвета, OCR текст",
+             s._open_analytics),
+            ("📚 Пакетное обучение локаций", P["gold"], "#FFE033",
+             "[PRO] Папка с подпапками ELSH/Sandy/Paleto — система выучит цвета каждой больницы",
+             s._batch_teach),
+            ("🏷 Разметить скриншоты", P["bodycam"], "#FF5555",
+             "[PRO] Показать скрин и указать категорию и больницу. Можно удалять примеры из базы",
+             s._open_label_window),
+            ("🖐 Ручная сортировка с запоминанием", P["orange"], P["oh"],
+             "[PRO] Смотрите скрины и кнопками раскидывайте по папкам. Система запоминает каждое действие",
+             s._open_quick_sort),
+            ("📂 Просмотр и исправление", P["blue"], "#2563EB",
+             "[PRO] Проверить отсортированные папки. Если скрин не туда — перекиньте и система запомнит",
+             s._open_folder_review),
+            ("🗂 Разложить виртуальную сортировку", P["purple"], "#C026D3",
+             "Разложить по папкам то, что виртуальная сортировка записала в базу выходной папки",
+             s._materialize),
+        ]
+
+        for text, fg, hover, tip, cmd in tools:
+            tf2 = ctk.CTkFrame(ab, fg_color="transparent");
+            tf2.pack(fill="x", pady=(0, 2))
+            ctk.CTkButton(tf2, text=text, height=34,
+                          fg_color=fg, hover_color=hover,
+                          text_color="#fff" if fg != P["gold"] else "#1a1a1a",
+                          font=ctk.CTkFont(size=11, weight="bold"),
+                          command=cmd).pack(fill="x")
+            ctk.CTkLabel(tf2, text=f"   {tip}",
+                         font=ctk.CTkFont(size=8), text_color=P["dim"],
+                         wraplength=380, justify="left").pack(anchor="w", padx=4)
+
+            # Оверлей скриншотера
+            overlay_frame = ctk.CTkFrame(ab, fg_color=P["entry"], corner_radius=8,
+                                         border_width=1, border_color=P["border"])
+            overlay_frame.pack(fill="x", pady=(6, 4))
+
+            ctk.CTkLabel(
+                overlay_frame, text="📸 Оверлей скриншотера",
+                font=ctk.CTkFont(size=11, weight="bold"),
+                text_color=P["gold"]
+            ).pack(padx=8, pady=(6, 2), anchor="w")
+
+            ctk.CTkLabel(
+                overlay_frame, text="Быстрые скрины поверх игры с автосортировкой",
+                font=ctk.CTkFont(size=8),
+                text_color=P["dim"]
+            ).pack(padx=8, anchor="w")
+
+            s._overlay_btn = ctk.CTkButton(
+                overlay_frame, text="📸 Запустить оверлей",
+                height=36,
+                fg_color=P["accent"], hover_color=P["ah"],
+                text_color="#fff",
+                font=ctk.CTkFont(size=11, weight="bold"),
+                command=s._start_overlay
+            )
+            s._overlay_btn.pack(fill="x", padx=8, pady=4)
+
+            s._overlay_status = ctk.CTkLabel(
+                overlay_frame, text="Оверлей: ⭕ Остановлен",
+                font=ctk.CTkFont(size=9),
+                text_color=P["dim"]
+            )
+            s._overlay_status.pack(padx=8, pady=(0, 6))
+
+            s.db_info = ctk.CTkLabel(ab, text="", font=ctk.CTkFont(size=9), text_color=P["dim"])
+
+        s.db_info = ctk.CTkLabel(ab, text="", font=ctk.CTkFont(size=9), text_color=P["dim"])
+        s._overlay_status.pack(padx=8, pady=(0, 6))
+        s.db_info.pack(anchor="w", pady=(6, 4));
+        s._update_db_info()
+        ctk.CTkButton(ab, text="🗑 Сбросить базу знаний", height=28,
+                      fg_color=P["entry"], hover_color=P["bh"],
+                      border_width=1, border_color=P["border"],
+                      text_color=P["err"], font=ctk.CTkFont(size=9),
+                      command=s._reset_db).pack(fill="x")
+
+        # ── Диагностика ──
+        dc = Sec(lp, "🔬 Диагностика", P["blue"]);
+        dc.pack(fill="x", pady=(0, 4))
+        dbb = ctk.CTkFrame(dc.body, fg_color="transparent");
+        dbb.pack(fill="x", padx=12, pady=6)
+        ctk.CTkButton(dbb, text="Анализ одного файла (подробный лог)",
+                      height=30, fg_color=P["blue"],
+                      hover_color="#2563EB", text_color="#fff",
+                      font=ctk.CTkFont(size=10), command=s._d1).pack(fill="x", pady=(0, 3))
+        ctk.CTkButton(dbb, text="Проверить боди-кам",
+                      height=30, fg_color=P["bodycam"],
+                      hover_color="#FF5555", text_color="#fff",
+                      font=ctk.CTkFont(size=10), command=s._dbc).pack(fill="x")
+
+        # ── Запуск ──
+        cc = Sec(lp, "🚀 Запуск");
+        cc.pack(fill="x", pady=(0, 4))
+        ci = ctk.CTkFrame(cc.body, fg_color="transparent");
+        ci.pack(fill="x", padx=12, pady=6)
+        pf = ctk.CTkFrame(ci, fg_color="transparent");
+        pf.pack(fill="x", pady=(0, 2))
+        s.pl = ctk.CTkLabel(pf, text="Готово к работе", font=ctk.CTkFont(size=10), text_color=P["dim"])
+        s.pl.pack(side="left")
+        s.pp = ctk.CTkLabel(pf, text="", font=ctk.CTkFont(size=10, weight="bold"),
+                            text_color=P["accent"])
+        s.pp.pack(side="right")
+        s.pb = ctk.CTkProgressBar(ci, height=6, progress_color=P["accent"], fg_color=P["entry"])
+        s.pb.pack(fill="x", pady=(0, 4));
+        s.pb.set(0)
+        s.sp = ctk.CTkLabel(ci, text="", font=ctk.CTkFont(size=9, family="Consolas"),
+                            text_color=P["dim"])
+        s.sp.pack(anchor="w", pady=(0, 4))
+        bf2 = ctk.CTkFrame(ci, fg_color="transparent");
+        bf2.pack(fill="x", pady=(0, 4))
+        s.cs = s._bd(bf2, "ОК", "0", P["ok"]);
+        s.ck = s._bd(bf2, "Пропуск", "0", P["warn"])
+        s.ce = s._bd(bf2, "Ошибка", "0", P["err"]);
+        s.ct_ = s._bd(bf2, "Всего", "0", P["info"])
+        s.cbc = s._bd(bf2, "БК", "0", P["bodycam"])
+        br2 = ctk.CTkFrame(ci, fg_color="transparent");
+        br2.pack(fill="x")
+        s.sb = ctk.CTkButton(br2, text="▶ СОРТИРОВАТЬ", height=40,
+                             font=ctk.CTkFont(size=12, weight="bold"),
+                             fg_color=P["accent"], hover_color=P["ah"], text_color="#fff",
+                             corner_radius=10, command=s._go)
+        s.sb.pack(side="left", fill="x", expand=True, padx=(0, 4))
+        Tooltip(s.sb,
+                "Запускает автоматическую сортировку всех\nскриншотов из входной папки.\nГорячая клавиша: Ctrl+Enter")
+        s.xb = ctk.CTkButton(br2, text="⏹", width=50, height=40,
+                             font=ctk.CTkFont(size=14, weight="bold"),
+                             fg_color=P["red"], hover_color=P["rh"], text_color="#fff",
+                             corner_radius=10, command=s._st, state="disabled")
+        s.xb.pack(side="left", padx=(0, 4))
+        Tooltip(s.xb, "Остановить текущую сортировку")
+        s.kb = ctk.CTkButton(br2, text="Пропущ.", width=70, height=40,
+                             fg_color=P["entry"], hover_color=P["bh"],
+                             border_width=1, border_color=P["border"], text_color=P["warn"],
+                             corner_radius=10, command=s._skp, state="disabled")
+        s.kb.pack(side="left", padx=(0, 4))
+        Tooltip(s.kb, "Открыть пропущенные скрины\nдля ручной сортировки")
+        s.wb = ctk.CTkButton(br2, text="👁", width=50, height=40,
+                             fg_color=P["entry"], hover_color=P["bh"],
+                             border_width=1, border_color=P["border"], text_color=P["info"],
+                             corner_radius=10, command=s._watch)
+        s.wb.pack(side="left", padx=(0, 4))
+        Tooltip(s.wb, "Слежение за входной папкой:\nновые скрины сортируются сразу,\nкак только игра их сохранит")
+        ctk.CTkButton(br2, text="📂", width=50, height=40,
+                      fg_color=P["entry"], hover_color=P["bh"],
+                      border_width=1, border_color=P["border"], text_color=P["blue"],
+                      corner_radius=10, command=s._oo).pack(side="right")
+
+        # ══ Лог ══
+        rp = ctk.CTkFrame(mn, fg_color=P["card"], corner_radius=12,
+                          border_width=1, border_color=P["border"])
+        rp.grid(row=0, column=1, sticky="nsew")
+        rp.rowconfigure(1, weight=1);
+        rp.columnconfigure(0, weight=1)
+        lh = ctk.CTkFrame(rp, fg_color="transparent", height=34)
+        lh.grid(row=0, column=0, sticky="ew", padx=10, pady=(6, 0));
+        lh.pack_propagate(False)
+        ctk.CTkLabel(lh, text="📋 Лог", font=ctk.CTkFont(size=11, weight="bold"),
+                     text_color=P["text"]).pack(side="left")
+        s._as = ctk.BooleanVar(value=True)
+        ctk.CTkSwitch(lh, text="Авто", variable=s._as, width=48, height=16,
+                      text_color=P["dim"], progress_color=P["accent"],
+                      button_color=P["text"], font=ctk.CTkFont(size=8)).pack(side="right")
+        for t2, cmd in [("Копир.", s._cl), ("Очист.", s._cr2), ("Сохран.", s._sl)]:
+            ctk.CTkButton(lh, text=t2, width=42, height=22, fg_color=P["entry"],
+                          hover_color=P["border"], text_color=P["dim"], corner_radius=4,
+                          font=ctk.CTkFont(size=9), command=cmd).pack(side="right", padx=(0, 3))
+        lf = ctk.CTkFrame(rp, fg_color=P["log"], corner_radius=8)
+        lf.grid(row=1, column=0, sticky="nsew", padx=6, pady=(4, 6))
+        lf.rowconfigure(0, weight=1);
+        lf.columnconfigure(0, weight=1)
+        s.log_t = Text(lf, font=("Consolas", 10), bg=P["log"], fg=P["text"],
+                       insertbackground=P["log"], selectbackground=P["accent"],
+                       selectforeground="#fff", relief="flat", borderwidth=0,
+                       padx=8, pady=6, wrap="word", state="normal", cursor="arrow",
+                       exportselection=True)
+        s.log_t.grid(row=0, column=0, sticky="nsew", padx=2, pady=2)
+
+        def _bl(e):
+            if e.state & 4 and e.keysym.lower() in ('c', 'a'): return
+            if e.keysym in ('Up', 'Down', 'Left', 'Right', 'Home', 'End',
+                            'Prior', 'Next', 'Shift_L', 'Shift_R',
+                            'Control_L', 'Control_R'): return
+            return "break"
+
+        s.log_t.bind("<Key>", _bl);
+        s.log_t.bind("<<Paste>>", lambda e: "break")
+        sb3 = tk.Scrollbar(lf, orient="vertical", command=s.log_t.yview,
+                           bg=P["card"], troughcolor=P["log"])
+        sb3.grid(row=0, column=1, sticky="ns", pady=2)
+        s.log_t.configure(yscrollcommand=sb3.set)
+        for tg, cl in [("success", P["ok"]), ("error", P["err"]), ("warning", P["warn"]),
+                       ("info", P["info"]), ("default", P["text"]), ("accent", P["accent"]),
+                       ("orange", P["orange"]), ("dim", P["dim"]), ("purple", P["purple"]),
+                       ("gold", P["gold"]), ("bodycam", P["bodycam"])]:
+            s.log_t.tag_config(tg, foreground=cl)
+        s._welcome();
+        s._check_for_updates()
+        s._ot()
+        s.bind_all("<Control-z>", lambda e: s._undo_last())
+
+    def _undo_last(s):
+        if not s._undo_history:
+            s._log("  Нечего отменять", "warning")
+            return
+        src, dst, how = s._undo_history.pop()
+        if not isinstance(dst, Path):
+            s._log(f"  ↩️ {Path(str(dst).split('!')[-1]).name}: уже в архиве — отмена недоступна", "warning")
+            return
+        try:
+            if how == "move":
+                # Перенесённый файл возвращаем на место, а не удаляем
+                if dst.exists() and not src.exists():
+                    shutil.move(str(dst), str(src))
+                    s._log(f"  ↩️ Отменено: {dst.name} возвращён в {src.parent.name}", "info")
+            elif dst.exists() or dst.is_symlink():
+                dst.unlink()
+                s._log(f"  ↩️ Отменено: {dst.name} удалён из {dst.parent.name}", "info")
+        except Exception as e:
+            s._log(f"  ❌ Ошибка отмены: {e}", "error")
+
+    # ══════════════════════════════════════
+    #  ВСПОМОГАТЕЛЬНЫЕ
+    # ══════════════════════════════════════
+    def _update_db_label(s):
+        total = len(s.location_db.get("samples", []))
+        s.db_l.configure(text=f"БД: {total} примеров")
+
+    def _update_db_info(s):
+        db = s.location_db;
+        total = len(db.get("samples", []))
+        by_loc = {}
+        for sample in db.get("samples", []):
+            loc = sample.get("location", "?")
+            by_loc[loc] = by_loc.get(loc, 0) + 1
+        lines = [f"База знаний: {total} примеров"]
+        for loc, cnt in sorted(by_loc.items(), key=lambda x: -x[1]):
+            lines.append(f"  {loc}: {cnt}")
+        if not by_loc: lines.append("  (пусто — обучите систему)")
+        s.db_info.configure(text="\n".join(lines))
+
+    def _start_overlay(s):
+        """Запускает оверлей скриншотера."""
+        if s._overlay and s._overlay.winfo_exists():
+            s._log("  📸 Оверлей уже запущен", "warning")
+            s._overlay.deiconify()
+            s._overlay.lift()
+            return
+
+        s._overlay = ScreenshotOverlay(s, s._log)
+        s._overlay_btn.configure(
+            text="⏹ Остановить оверлей",
+            fg_color=P["red"],
+            hover_color=P["rh"],
+            command=s._stop_overlay
+        )
+        s._overlay_status.configure(
+            text="Оверлей: ✅ Запущен",
+            text_color=P["ok"]
+        )
+
+    def _stop_overlay(s):
+        """Останавливает оверлей."""
+        if s._overlay and s._overlay.winfo_exists():
+            s._overlay._on_close()
+
+        s._overlay = None
+        s._overlay_btn.configure(
+            text="📸 Запустить оверлей",
+            fg_color=P["accent"],
+            hover_color=P["ah"],
+            command=s._start_overlay
+        )
+        s._overlay_status.configure(
+            text="Оверлей: ⭕ Остановлен",
+            text_color=P["dim"]
+        )
+
+    def _overlay_closed(s):
+        """Callback когда оверлей закрыт."""
+        s._overlay = None
+        s._overlay_btn.configure(
+            text="📸 Запустить оверлей",
+            fg_color=P["accent"],
+            hover_color=P["ah"],
+            command=s._start_overlay
+        )
+        s._overlay_status.configure(
+            text="Оверлей: ⭕ Остановлен",
+            text_color=P["dim"]
+        )
+
+    def _fr(s, p, l, ph, cmd):
+        f = ctk.CTkFrame(p, fg_color="transparent");
+        f.pack(fill="x", padx=12, pady=3)
+        ctk.CTkLabel(f, text=l, font=ctk.CTkFont(size=9), text_color=P["t2"]).pack(anchor="w")
+        r = ctk.CTkFrame(f, fg_color="transparent");
+        r.pack(fill="x")
+        e = ctk.CTkEntry(r, height=30, fg_color=P["entry"], border_color=P["border"],
+                         text_color=P["text"], placeholder_text=ph,
+                         placeholder_text_color=P["dim"], corner_radius=6,
+                         font=ctk.CTkFont(size=10))
+        e.pack(side="left", fill="x", expand=True, padx=(0, 4))
+        ctk.CTkButton(r, text="...", width=34, height=30, fg_color=P["entry"],
+                      hover_color=P["bh"], border_width=1, border_color=P["border"],
+                      text_color=P["t2"], corner_radius=6,
+                      font=ctk.CTkFont(size=10), command=cmd).pack(side="right")
+        return e
+
+    def _bd(s, p, l, v, c):
+        f = ctk.CTkFrame(p, fg_color=P["entry"], corner_radius=6,
+                         border_width=1, border_color=P["border"])
+        f.pack(side="left", padx=(0, 3), pady=(0, 2))
+        ctk.CTkLabel(f, text=l, font=ctk.CTkFont(size=8), text_color=P["dim"]).pack(padx=6, pady=(2, 0))
+        lb = ctk.CTkLabel(f, text=v, font=ctk.CTkFont(size=13, weight="bold"), text_color=c)
+        lb.pack(padx=6, pady=(0, 2));
+        return lb
+
+    def _ot(s):
+        if _ocr._ok:
+            s.ocr_l.configure(text=_ocr._n, text_color=P["ok"])
+        else:
+            s.after(400, s._ot)
+
+    def _ot(s):
+        if _ocr._ok:
+            s.ocr_l.configure(text=_ocr._n, text_color=P["ok"])
+        else:
+            s.after(400, s._ot)
+
+    def _check_for_updates(s):
+        pass
+
+    def _show_update_dialog(s, version, changelog):
+        dialog = ctk.CTkToplevel(s)
+        dialog.title("Доступно обновление")
+        dialog.configure(fg_color=P["bg"])
+        dialog.transient(s)
+        dialog.grab_set()
+
+        sw, sh = dialog.winfo_screenwidth(), dialog.winfo_screenheight()
+        dialog.geometry(f"400x280+{(sw - 400) // 2}+{(sh - 280) // 2}")
+        dialog.resizable(False, False)
+
+        ctk.CTkLabel(dialog, text="🔄 Доступно обновление!",
+                     font=ctk.CTkFont(size=16, weight="bold"),
+                     text_color=P["accent"]).pack(pady=(20, 10))
+
+        ctk.CTkLabel(dialog, text=f"Текущая версия: {APP_VERSION}",
+                     font=ctk.CTkFont(size=11),
+                     text_color=P["t2"]).pack()
+
+        ctk.CTkLabel(dialog, text=f"Новая версия: {version}",
+                     font=ctk.CTkFont(size=12, weight="bold"),
+                     text_color=P["gold"]).pack(pady=(0, 10))
+
+        if changelog:
+            ctk.CTkLabel(dialog, text="Что нового:",
+                         font=ctk.CTkFont(size=10, weight="bold"),
+                         text_color=P["text"]).pack(anchor="w", padx=30)
+
+            ctk.CTkLabel(dialog, text=changelog,
+                         font=ctk.CTkFont(size=10),
+                         text_color=P["t2"],
+                         justify="left",
+                         wraplength=340).pack(anchor="w", padx=30, pady=(0, 15))
+
+        btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        btn_frame.pack(fill="x", padx=30, pady=(0, 20))
+
+        def open_download():
+            import webbrowser
+            webbrowser.open(DOWNLOAD_URL)
+            dialog.destroy()
+
+        ctk.CTkButton(btn_frame, text="Позже", height=36,
+                      fg_color=P["entry"], hover_color=P["bh"],
+                      border_width=1, border_color=P["border"],
+                      text_color=P["t2"], font=ctk.CTkFont(size=11),
+                      command=dialog.destroy).pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        ctk.CTkButton(btn_frame, text="⬇️ Скачать", height=36,
+                      fg_color=P["accent"], hover_color=P["ah"],
+                      text_color="#fff", font=ctk.CTkFont(size=11, weight="bold"),
+                      command=open_download).pack(side="right", fill="x", expand=True, padx=(5, 0))
+
+    def _welcome(s):
+        s._log(f"Majestic RP Sorter v{APP_VERSION}", "accent")
+        s._log(f"by {APP_AUTHOR}", "orange")
+        engines = []
+        if PADDLEOCR_OK: engines.append("PaddleOCR")
+        if EASYOCR_OK: engines.append("EasyOCR")
+        if TESSERACT_OK: engines.append("Tesseract")
+        if RAPIDOCR_OK: engines.append("RapidOCR")
+        s._log(f"OCR движки: {', '.join(engines) if engines else 'не найдены'}", "info")
+        total_db = len(s.location_db.get("samples", []))
+        if total_db > 0:
+            s._log(f"База знаний: {total_db} примеров", "gold")
+        else:
+            s._log("⚠️ База знаний пуста — откройте 'Разметить скриншоты' или 'Пакетное обучение'", "warning")
+        s._log("", "default")
+
+        s._log("💡 Бесплатная версия", "dim")
+        s._log("💰 PRO версия: https://www.donationalerts.com/r/orange91323", "gold")
+
+    def _check_updates_background(s):
+        """Проверяет обновления в фоне при запуске."""
+        if not GITHUB_REPO:
+            return
+
+        time.sleep(3)
+        try:
+            has_update, version, url, description = check_for_updates()
+            if has_update and url:
+                s.after(0, lambda: s._show_update_dialog(version, url, description))
+        except Exception as e:
+            print(f"[UPDATE] Ошибка фоновой проверки: {e}")
+
+    def _check_updates_manual(s):
+        """Ручная проверка обновлений по кнопке."""
+        if not GITHUB_REPO:
+            s._log("⚠️ Проверка обновлений отключена", "warning")
+            return
+
+        s._log("🔄 Проверка обновлений...", "info")
+
+        def check():
+            try:
+                print(f"[DEBUG] Проверяю URL: {UPDATE_CHECK_URL}")
+                has_update, version, url, description = check_for_updates()
+                print(f"[DEBUG] Результат: has_update={has_update}, version={version}, url={url}")
+
+                if has_update and url:
+                    print(f"[DEBUG] Есть обновление! Открываю диалог...")
+                    s.after(0, lambda: s._show_update_dialog(version, url, description))
+                    s.after(0, lambda: s._log(f"✅ Доступна версия {version}", "success"))
+                elif version:
+                    print(f"[DEBUG] Обновлений нет, текущая версия актуальна")
+                    s.after(0, lambda: s._log(f"✅ У вас последняя версия ({APP_VERSION})", "success"))
+                else:
+                    print(f"[DEBUG] Не удалось получить версию")
+                    s.after(0, lambda: s._log("❌ Не удалось проверить обновления", "error"))
+            except Exception as e:
+                print(f"[DEBUG] Исключение: {e}")
+                s.after(0, lambda m=str(e): s._log(f"❌ Ошибка: {m}", "error"))
+
+        threading.Thread(target=check, daemon=True).start()
+
+    def _show_update_dialog(s, version, url, description):
+        """Показывает диалог обновления."""
+        print(f"[DEBUG] _show_update_dialog вызван: version={version}, url={url}")
+        try:
+            dialog = UpdateDialog(s, version, url, description)
+            print(f"[DEBUG] Диалог создан: {dialog}")
+        except Exception as e:
+            print(f"[DEBUG] Ошибка создания диалога: {e}")
+            import traceback
+            traceback.print_exc()
+
+    # ══════════════════════════════════════
+    #  КНОПКИ ЛОГ
+    # ══════════════════════════════════════
+    def _cr2(s):
+        s.log_t.delete("1.0", END)
+
+    def _sl(s):
+        fp = filedialog.asksaveasfilename(defaultextension=".txt")
+        if fp: Path(fp).write_text(s.log_t.get("1.0", END), encoding="utf-8")
+
+    def _cl(s):
+        try:
+            t = s.log_t.get(tk.SEL_FIRST, tk.SEL_LAST)
+            s.clipboard_clear();
+            s.clipboard_append(t)
+        except:
+            c = s.log_t.get("1.0", END).strip()
+            if c: s.clipboard_clear(); s.clipboard_append(c)
+
+    def _bi(s):
+        d = filedialog.askdirectory()
+        if d:
+            s.inp_e.delete(0, END);
+            s.inp_e.insert(0, d)
+            if not s.out_e.get():
+                s.out_e.delete(0, END);
+                s.out_e.insert(0, str(Path(d) / "Sorted"))
+
+    def _bo(s):
+        d = filedialog.askdirectory()
+        if d: s.out_e.delete(0, END); s.out_e.insert(0, d)
+
+    def _oo(s):
+        o = s.out_e.get().strip()
+        if o and Path(o).exists(): os.startfile(o)
+
+    # ══════════════════════════════════════
+    #  НОВЫЕ ОКНА
+    # ══════════════════════════════════════
+    def _open_label_window(s):
+        s._log("", "default")
+        s._log("  🔒 Разметка скриншотов — функция PRO версии", "warning")
+        s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+        s._log("  📦 Скачать PRO: https://github.com/Orange2-invalide/MadjesticRP_Sorter/releases", "info")
+
+    def _open_analytics(s):
+        fp = filedialog.askopenfilename(title="Выберите скриншот для анализа",
+                                        filetypes=[("Изображения", "*.png *.jpg *.jpeg *.bmp")])
+        if not fp: return
+        s._log(f"\n🔍 Аналитика: {Path(fp).name}", "purple")
+        az = Analyzer(s.cfg, require_bodycam=s.bc_var.get(), location_db=s.location_db)
+        AnalyticsWindow(s, Path(fp), az, s._log, s.location_db)
+
+    def _open_quick_sort(s):
+        s._log("", "default")
+        s._log("  🔒 Ручная сортировка — функция PRO версии", "warning")
+        s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+        s._log("  📦 Скачать PRO: https://github.com/Orange2-invalide/MadjesticRP_Sorter/releases", "info")
+
+    def _open_folder_review(s):
+        s._log("", "default")
+        s._log("  🔒 Просмотр и исправление — функция PRO версии", "warning")
+        s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+        s._log("  📦 Скачать PRO: https://github.com/Orange2-invalide/MadjesticRP_Sorter/releases", "info")
+
+        def _open_auto_learn(s):
+            s._log("", "default")
+            s._log("  🔒 Автообучение — функция PRO версии", "warning")
+            s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+
+    # ══════════════════════════════════════
+    #  ОБУЧЕНИЕ
+    # ══════════════════════════════════════
+    def _batch_teach(s):
+        s._log("", "default")
+        s._log("  🔒 Пакетное обучение — функция PRO версии", "warning")
+        s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+        s._log("  📦 Скачать PRO: https://github.com/Orange2-invalide/MadjesticRP_Sorter/releases", "info")
+
+    def _reset_db(s):
+        if LOCATION_DB_FILE.exists(): LOCATION_DB_FILE.unlink()
+        s.location_db.clear()
+        s.location_db.update({"samples": [], "feature_ranges": {}, "version": 1})
+        s._log("  🗑 База знаний сброшена", "warning")
+        s._update_db_info();
+        s._update_db_label()
+
+    # ══════════════════════════════════════
+    #  ДИАГНОСТИКА
+    # ══════════════════════════════════════
+    def _dbc(s):
+        fp = filedialog.askopenfilename(filetypes=[("Изображения", "*.png *.jpg *.jpeg *.bmp")])
+        if not fp: return
+        s._log(f"🔴 Проверка боди-кам: {Path(fp).name}", "bodycam")
+        threading.Thread(target=s._dbc2, args=(Path(fp),), daemon=True).start()
+
+    def _dbc2(s, fp):
+        img = s.az.images.get(fp)
+        if img is None: s._log("  ошибка загрузки", "error"); return
+        ctx = ImageContext(img, s.cfg)
+        s._log(f"  Размер: {ctx.w}x{ctx.h}", "info")
+        a, r = check_bodycam(ctx)
+        s._log(f"  Результат: {'🔴 ВКЛЮЧЕНА' if a else '⚪ НЕ НАЙДЕНА'} (сила={r:.6f})",
+               "success" if a else "error")
+
+    def _d1(s):
+        fp = filedialog.askopenfilename(filetypes=[("Изображения", "*.png *.jpg *.jpeg *.bmp")])
+        if not fp: return
+        s._log(f"\n🔍 Подробный анализ: {Path(fp).name}", "purple")
+        threading.Thread(target=s._dd, args=(Path(fp),), daemon=True).start()
+
+    def _dd(s, fp):
+        az = Analyzer(s.cfg, require_bodycam=s.bc_var.get(), location_db=s.location_db)
+        r = az.run(fp, wd=True)
+        for l in r.diag:
+            if "[признаки]" in l:
+                s._log(f"  {l}", "accent")
+            elif "[триг]" in l:
+                s._log(f"  {l}", "info")
+            elif "[результат]" in l:
+                s._log(f"  {l}", "success")
+            elif "[бд]" in l:
+                s._log(f"  {l}", "gold")
+            elif any(x in l for x in ["[E]", "[S]", "[P]", "[скоры]", "[классика]"]):
+                s._log(f"  {l}", "accent")
+            else:
+                s._log(f"  {l}", "dim")
+        if r.ok:
+            s._log(f"  ✅ {r.cat.value} | {r.hosp.value} | {r.method}", "success")
+        else:
+            s._log(f"  ❌ {r.err}", "error")
+
+    # ══════════════════════════════════════
+    #  СОРТИРОВКА
+    # ══════════════════════════════════════
+    def _up(s, st, t, el, eta=None):
+        qd = " · ".join(f"{nm} {n}" for nm, n in s.az.depths())
+        d, ok, sk, er, bc = st.done, st.ok, st.sk, st.er, st.bc
+
+        def _u():
+            v = d / t if t else 0;
+            s.pb.set(v);
+            s.pp.configure(text=f"{int(v * 100)}%")
+            s.pl.configure(text=f"({d}/{t})" if v < 1 else "Готово")
+            rem = eta if eta is not None else (t - d) * (el / d) if d > 0 and el > 0 else None
+            if v < 1 and rem is not None:
+                s.title(f"Majestic RP Sorter — {int(v * 100)}% ({d}/{t}) ~{int(rem)}с")
+            else:
+                s.title(f"Majestic RP Sorter v{APP_VERSION}")
+            s.ct_.configure(text=str(st.total))
+            s.cs.configure(text=str(ok));
+            s.ck.configure(text=str(sk))
+            s.ce.configure(text=str(er));
+            s.cbc.configure(text=str(bc))
+            if d > 0 and el > 0:
+                ms = el / d * 1000;
+                s.sp.configure(text=f"{ms:.0f}мс ~{rem or 0:.0f}с"
+                                    + (f" | очереди: {qd}" if qd else ""))
+
+        s.after(0, _u)
+
+    def _go(s):
+        if s.is_proc or s._wt is not None: return
+        inp = s.inp_e.get().strip();
+        out = s.out_e.get().strip()
+        if not inp or not (Path(inp).is_dir() or is_archive(inp)):
+            s._log("  ❌ Укажите правильную входную папку или ZIP-архив", "error");
+            return
+        if not out: s._log("  ❌ Укажите выходную папку", "error"); return
+        s._stop.clear();
+        s.is_proc = True
+        s.sb.configure(text="...", fg_color=P["dim"], state="disabled")
+        s.xb.configure(state="normal");
+        s.kb.configure(state="disabled", text="Пропущ.")
+        s.pb.set(0);
+        s.pp.configure(text="0%")
+        s.title(f"Majestic RP Sorter v{APP_VERSION} — Сортировка...")
+        for l in (s.cs, s.ck, s.ce, s.ct_, s.cbc): l.configure(text="0")
+        s._log(f"\n▶ Старт: {inp} → {out}", "info")
+        s.az.require_bodycam = s.bc_var.get()
+        so = s._sorter(inp, out, s._stop)
+        s.skipped = so.stats.skipped
+        threading.Thread(target=s._sort, args=(so,), daemon=True).start()
+
+    def _st(s):
+        if s.is_proc: s._stop.set(); s.xb.configure(state="disabled")
+
+    def _watch(s):
+        if s._wt is not None: s._watch_stop(); return
+        if s.is_proc: return
+        inp = s.inp_e.get().strip();
+        out = s.out_e.get().strip()
+        if not inp or not Path(inp).is_dir():
+            s._log("  ❌ Укажите правильную входную папку", "error");
+            return
+        if not out: s._log("  ❌ Укажите выходную папку", "error"); return
+        s.az.require_bodycam = s.bc_var.get()
+        s._wt = threading.Event()
+        so = s._sorter(inp, out, s._wt)
+        s.skipped = so.stats.skipped
+        threading.Thread(target=so.watch, name="watch-sort", daemon=True).start()
+        s.wb.configure(fg_color=P["ok"], text_color="#fff")
+        s.sb.configure(state="disabled")
+        for l in (s.cs, s.ck, s.ce, s.ct_, s.cbc): l.configure(text="0")
+        s._log(f"\n👁 Слежу за {inp} → {out}", "info")
+
+    def _watch_stop(s):
+        s._wt.set();
+        s._wt = None
+        s.wb.configure(fg_color=P["entry"], text_color=P["info"])
+        s.sb.configure(state="normal")
+        s._log("  👁 Слежение остановлено", "info")
+
+    def _sorter(s, inp, out, stop):
+        s.cfg.OUT_SHARD = s._out_shard()
+        return Sorter(s.az, inp, out, int(s.wk_var.get()), s.dry_var.get(), s.inc_var.get(),
+                      stop=stop, log=s._log,
+                      progress=lambda st, t, el, eta: s._up(st, t, el, eta),
+                      on_copy=lambda src, dst, how: s._undo_history.append((src, dst, how)),
+                      recursive=s.rec_var.get(), zip_out=s.zip_var.get(), mode=s._out_mode(),
+                      virtual=s.virt_var.get())
+
+    def _materialize(s):
+        out = s.out_e.get().strip()
+        if not out or not (Path(out) / INDEX_FILE).exists():
+            s._log("  ❌ В выходной папке нет базы виртуальной сортировки", "error");
+            return
+        # Как и сортировка: одна запись в выходную папку за раз, слежение тоже пишет туда
+        if s.is_proc or s._wt is not None:
+            s._log("  ⚠️ Дождитесь окончания сортировки или остановите слежение", "warning");
+            return
+        s._stop.clear();
+        s.is_proc = True
+        s.sb.configure(text="...", fg_color=P["dim"], state="disabled")
+        s.xb.configure(state="normal")
+
+        def run():
+            vx = ResultIndex(out)
+            try:
+                left = sum(1 for _, pl in vx.files() if pl is None)
+                s._log(f"\n🗂 Раскладываю {left} файлов в {len(vx.folders())} папок "
+                       f"({s.mode_var.get().lower()})", "info")
+                n, er = vx.materialize(
+                    s._out_mode(), stop=s._stop,
+                    on_done=lambda src, dst, how: s._undo_history.append((src, dst, how)),
+                    on_error=lambda src, e: s._log(f"  ❌ {Path(str(src)).name}: {str(e)[:60]}", "error"))
+                s._log(f"  ✅ Разложено: {n}, ошибок: {er}", "success" if not er else "warning")
+            finally:
+                vx.close()
+                s.after(0, s._done)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _out_mode(s):
+        nm = s.mode_var.get()
+        return next((k for k, v in _OUT_MODE_NAMES.items() if v == nm), "copy")
+
+    def _out_shard(s):
+        nm = s.shard_var.get()
+        return next((k for k, v in _OUT_SHARD_NAMES.items() if v == nm), "")
+
+    def _sort(s, so):
+        st = so.run()
+        if not st.total and not st.done:
+            s.after(0, s._done);
+            return
+        ok, sk, er, bc, total = st.ok, st.sk, st.er, st.bc, st.total
+        hc = st.hc;
+        dur = st.dur
+        s._log("", "default")
+        s._log(f"  ═══════════════════════════════", "accent")
+        s._log(f"  ✅ Готово! ОК:{ok} | Пропуск:{sk} | БК:{bc} | Ошибок:{er} | Всего:{total} ({dur:.1f}с)",
+               "success" if ok else "warning")
+        if hc:
+            s._log("  По папкам:", "info")
+            for h, c in sorted(hc.items(), key=lambda x: -x[1]):
+                s._log(f"    📁 {h}: {c}", "accent")
+        if total: s._log(f"  Скорость: {dur / total * 1000:.0f}мс/файл", "info")
+
+        # Подсказка про проверку
+        if ok > 0:
+            s._log("", "default")
+            s._log("  💡 Совет: откройте «Просмотр и исправление» чтобы проверить", "gold")
+            s._log("     что все скрины попали в правильные папки.", "gold")
+            s._log("     Если что-то не туда — перекиньте кнопкой и система запомнит.", "gold")
+
+        if s.skipped:
+            s._log("", "default")
+            s._log(f"  ⚡ {len(s.skipped)} скринов пропущено — нажмите «Пропущ.» для быстрой сортировки", "orange")
+
+        if PLYER_OK:
+            try:
+                _notify.notify(
+                    title="Сортировка завершена",
+                    message=f"ОК: {ok} | Пропуск: {sk} | БК: {bc} | Ошибок: {er}",
+                    timeout=5
+                )
+            except Exception:
+                pass
+        _play_done_sound()
+        s.after(0, s._done)
+
+    def _done(s):
+        s.is_proc = False
+        s.sb.configure(text="▶ СОРТИРОВАТЬ", fg_color=P["accent"], state="normal")
+        s.xb.configure(state="disabled")
+        s.title(f"Majestic RP Sorter v{APP_VERSION}")
+        if s.skipped:
+            s.kb.configure(state="normal", text=f"Пропущ.({len(s.skipped)})")
+
+    def _skp(s):
+        if not s.skipped:
+            return
+        s._log("", "default")
+        s._log("  🔒 Работа с пропущенными — функция PRO версии", "warning")
+        s._log(f"  📋 Пропущено файлов: {len(s.skipped)}", "info")
+        s._log("  💰 Купить PRO: https://www.donationalerts.com/r/orange91323", "gold")
+def main():
+    ctk.set_appearance_mode("dark")
+    ctk.set_default_color_theme("dark-blue")
+    App().mainloop()
+
+
+if __name__ == "__main__":
+    main()